@@ -0,0 +1,128 @@
+import re
+import threading
+from typing import NamedTuple, List, Dict, Optional
+
+from botocore import __version__ as botocore_version
+from botocore.exceptions import UnknownServiceError
+from botocore.loaders import Loader
+
+from provider.aws.all.naming import (
+    is_listing_operation,
+    build_resource_type,
+    _to_snake_case,
+)
+from shared.common import ResourceCache
+
+CATALOG_CACHE_EXPIRE = 30 * 86400
+# bumped when cached catalogs gain fields
+CATALOG_FORMAT = 4
+# EC2 documents tag:<key> filters in the Filters member of the operations accepting them
+TAG_FILTER_DOCUMENTATION = re.compile(r"tag key in the filter name|tag:&lt;key&gt;")
+
+
+class ListingOperation(NamedTuple):
+    name: str
+    snake_name: str
+    resource_type: str
+    has_paginator: bool
+    required_fields: Optional[List[str]] = None
+    input_members: Optional[List[str]] = None
+    supports_tag_filters: bool = False
+
+
+class ServiceCatalog(NamedTuple):
+    service_name: str
+    service_full_name: str
+    operations: Dict[str, ListingOperation]
+    endpoint_prefix: str = ""
+
+
+def build_service_catalog(boto_loader: Loader, aws_service: str) -> ServiceCatalog:
+    service_model = boto_loader.load_service_model(aws_service, "service-2")
+    try:
+        paginators_model = boto_loader.load_service_model(aws_service, "paginators-1")
+    except UnknownServiceError:
+        paginators_model = {"pagination": {}}
+
+    operations = dict()
+    for name, operation in service_model["operations"].items():
+        if not is_listing_operation(name):
+            continue
+        required_fields = []
+        input_members = []
+        supports_tag_filters = False
+        if "input" in operation:
+            input_model = service_model["shapes"][operation["input"]["shape"]]
+            required_fields = input_model.get("required", [])
+            input_members = list(input_model.get("members", {}).keys())
+            filters_model = input_model.get("members", {}).get("Filters", {})
+            supports_tag_filters = (
+                TAG_FILTER_DOCUMENTATION.search(filters_model.get("documentation", ""))
+                is not None
+            )
+        operations[name] = ListingOperation(
+            name=name,
+            snake_name=_to_snake_case(name),
+            resource_type=build_resource_type(aws_service, name),
+            has_paginator=name in paginators_model["pagination"],
+            required_fields=required_fields,
+            input_members=input_members,
+            supports_tag_filters=supports_tag_filters,
+        )
+
+    return ServiceCatalog(
+        service_name=aws_service,
+        service_full_name=service_model["metadata"]["serviceFullName"],
+        operations=operations,
+        endpoint_prefix=service_model["metadata"].get("endpointPrefix", ""),
+    )
+
+
+class OperationCatalog:
+    def __init__(self):
+        """
+        Process-wide catalog of listing operations per service
+
+        Service and paginator models are parsed once per botocore version: catalogs are kept in memory for
+        every region and stored on disk for the next runs.
+        """
+        self.boto_loader = Loader()
+        self.services: Dict[str, ServiceCatalog] = dict()
+        self.available_services: Optional[List[str]] = None
+        self.lock = threading.Lock()
+        self.cache: Optional[ResourceCache] = None
+
+    @staticmethod
+    def cache_key(aws_service: str) -> str:
+        return "aws_all_catalog_{}_{}_{}".format(
+            CATALOG_FORMAT, botocore_version, aws_service
+        )
+
+    def list_services(self) -> List[str]:
+        if self.available_services is None:
+            self.available_services = self.boto_loader.list_available_services(
+                type_name="service-2"
+            )
+        return self.available_services
+
+    def service(self, aws_service: str) -> ServiceCatalog:
+        service_catalog = self.services.get(aws_service)
+        if service_catalog is not None:
+            return service_catalog
+
+        if self.cache is None:
+            self.cache = ResourceCache()
+        cache_key = self.cache_key(aws_service)
+        service_catalog = self.cache.get_key(cache_key)
+        if service_catalog is None:
+            with self.lock:
+                # botocore loader is not meant to be shared across threads
+                service_catalog = build_service_catalog(self.boto_loader, aws_service)
+            self.cache.set_key(
+                key=cache_key, value=service_catalog, expire=CATALOG_CACHE_EXPIRE
+            )
+        self.services[aws_service] = service_catalog
+        return service_catalog
+
+
+OPERATION_CATALOG = OperationCatalog()
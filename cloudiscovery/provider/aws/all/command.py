@@ -1,21 +1,137 @@
-from typing import List
+from typing import List, Optional, Set
 
-from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
-from shared.common import Filterable, BaseOptions
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+
+from provider.aws.all.catalog import OPERATION_CATALOG
+from provider.aws.all.incremental import changed_event_sources
+from provider.aws.all.plan import (
+    DiscoveryPlan,
+    DEFAULT_PLAN_FILE,
+    load_run_plan,
+    load_plan,
+    save_plan,
+    build_plan,
+    diff_plans,
+    fetch_allowed_actions,
+)
+from provider.aws.common_aws import (
+    BaseAwsOptions,
+    BaseAwsCommand,
+    AwsCommandRunner,
+    DEFAULT_REGION_PARALLELISM,
+    ACCOUNT_ID_CACHE,
+    THROTTLING_ERROR_CODES,
+    get_client,
+)
+from shared.checkpoint import (
+    Checkpoint,
+    CHECKPOINT_OFF,
+    CHECKPOINT_SERVICES,
+    checkpoint_run_id,
+)
+from shared.command import THREADS_BACKEND
+from shared.common import Filterable, BaseOptions, BaseCommand, message_handler
 from shared.diagram import NoDiagram
+from shared.snapshot import Snapshot, SnapshotStore, snapshot_key
+
+DEFAULT_OPERATION_PARALLELISM = 8
+
+# credentials expiring during a long run
+EXPIRED_CREDENTIALS_ERROR_CODES = frozenset(
+    ["ExpiredToken", "ExpiredTokenException", "RequestExpired"]
+)
+
+
+def is_resumable_error(error: BaseException) -> bool:
+    """
+    Interruptions a run can be resumed from, other errors would fail again
+    """
+    if isinstance(error, (KeyboardInterrupt, BotoConnectionError)):
+        return True
+    if isinstance(error, ClientError):
+        error_code = error.response.get("Error", {}).get("Code")
+        return (
+            error_code in THROTTLING_ERROR_CODES
+            or error_code in EXPIRED_CREDENTIALS_ERROR_CODES
+        )
+    return False
 
 
 class AllOptions(BaseAwsOptions, BaseOptions):
     services: List[str]
+    plan: Optional[DiscoveryPlan]
+    operation_parallelism: int
+    snapshot: Optional[Snapshot]
+    event_sources: Optional[Set[str]]
+    checkpoint: Optional[Checkpoint]
 
     # pylint: disable=too-many-arguments
-    def __init__(self, verbose, filters, session, region_name, services: List[str]):
+    def __init__(
+        self,
+        verbose,
+        filters,
+        session,
+        region_name,
+        services: List[str],
+        plan: Optional[DiscoveryPlan] = None,
+        operation_parallelism: int = DEFAULT_OPERATION_PARALLELISM,
+        snapshot: Optional[Snapshot] = None,
+        event_sources: Optional[Set[str]] = None,
+        checkpoint: Optional[Checkpoint] = None,
+    ):
         BaseAwsOptions.__init__(self, session, region_name)
         BaseOptions.__init__(self, verbose, filters)
         self.services = services
+        self.plan = plan
+        self.operation_parallelism = operation_parallelism
+        self.snapshot = snapshot
+        self.event_sources = event_sources
+        self.checkpoint = checkpoint
 
 
 class All(BaseAwsCommand):
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        region_names,
+        session,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+        streaming=False,
+        plan_file=None,
+        operation_parallelism=DEFAULT_OPERATION_PARALLELISM,
+        backend=THREADS_BACKEND,
+        incremental=False,
+        resume=False,
+        checkpoint=None,
+    ):
+        """
+        All AWS resources
+
+        :param region_names:
+        :param session:
+        :param partition_code:
+        :param region_parallelism:
+        :param streaming:
+        :param plan_file:
+        :param operation_parallelism:
+        :param backend:
+        :param incremental: reuse the previous snapshot for services without changes and report a diff
+        :param resume: continue the interrupted run with the same options from its checkpoint
+        :param checkpoint: CHECKPOINT_OFF, CHECKPOINT_SERVICES or CHECKPOINT_OPERATIONS,
+            if None CHECKPOINT_SERVICES when resuming and CHECKPOINT_OFF otherwise
+        """
+        super().__init__(region_names, session, partition_code, region_parallelism)
+        self.streaming = streaming
+        self.plan = load_run_plan(plan_file)
+        self.operation_parallelism = operation_parallelism
+        self.backend = backend
+        self.incremental = incremental
+        self.resume = resume
+        if checkpoint is None:
+            checkpoint = CHECKPOINT_SERVICES if resume else CHECKPOINT_OFF
+        self.checkpoint = checkpoint
+
     def run(
         self,
         diagram: bool,
@@ -23,22 +139,214 @@ class All(BaseAwsCommand):
         services: List[str],
         filters: List[Filterable],
     ):
-        for region in self.region_names:
-            self.init_region_cache(region)
-            options = AllOptions(
-                verbose=verbose,
-                filters=filters,
-                session=self.session,
-                region_name=region,
-                services=services,
+        checkpoint = self.open_checkpoint(services, filters)
+        try:
+            self.run_regions(
+                lambda region: self.run_region(
+                    region, verbose, services, filters, checkpoint
+                )
             )
+            if checkpoint is not None:
+                checkpoint.clear()
+        except (Exception, KeyboardInterrupt) as error:
+            if checkpoint is not None and is_resumable_error(error):
+                message_handler(
+                    "Run interrupted, completed work is checkpointed. "
+                    "Run the same command with --resume to continue from there",
+                    "WARNING",
+                )
+            raise
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
 
-            command_runner = AwsCommandRunner(filters=filters)
-            command_runner.run(
-                provider="all",
-                options=options,
-                diagram_builder=NoDiagram(),
-                title="AWS Resources - Region {}".format(region),
-                # pylint: disable=no-member
-                filename=options.resulting_file_name("all"),
+    def open_checkpoint(
+        self, services: List[str], filters: List[Filterable]
+    ) -> Optional[Checkpoint]:
+        if self.checkpoint == CHECKPOINT_OFF:
+            return None
+        run_id = checkpoint_run_id(
+            "aws-all",
+            ACCOUNT_ID_CACHE.account_id(self.session, self.region_names[0]),
+            sorted(self.region_names),
+            sorted(services or []),
+            [repr(resource_filter) for resource_filter in filters or []],
+        )
+        checkpoint = Checkpoint(run_id, resume=self.resume, level=self.checkpoint)
+        if self.resume:
+            message_handler(
+                "Resuming run {} with {} completed units".format(
+                    run_id, len(checkpoint)
+                ),
+                "HEADER",
+            )
+        return checkpoint
+
+    # pylint: disable=too-many-arguments
+    def run_region(
+        self,
+        region: str,
+        verbose: bool,
+        services: List[str],
+        filters: List[Filterable],
+        checkpoint: Optional[Checkpoint] = None,
+    ):
+        if checkpoint is not None and checkpoint.completed("region", region):
+            message_handler(
+                "Region {} was completed by the interrupted run... Skipping".format(
+                    region
+                ),
+                "OKBLUE",
             )
+            return
+        self.init_region_cache(region)
+        options = AllOptions(
+            verbose=verbose,
+            filters=filters,
+            session=self.session,
+            region_name=region,
+            services=services,
+            plan=self.plan,
+            operation_parallelism=self.operation_parallelism,
+            checkpoint=checkpoint,
+        )
+        if self.incremental:
+            self.prepare_snapshot(options, filters)
+
+        command_runner = AwsCommandRunner(
+            filters=filters,
+            streaming=self.streaming,
+            backend=self.backend,
+            snapshot=options.snapshot,
+        )
+        command_runner.run(
+            provider="all",
+            options=options,
+            diagram_builder=NoDiagram(),
+            title="AWS Resources - Region {}".format(region),
+            # pylint: disable=no-member
+            filename=options.resulting_file_name("all"),
+        )
+        if checkpoint is not None:
+            checkpoint.complete("region", region)
+
+    def prepare_snapshot(self, options: AllOptions, filters: List[Filterable]):
+        # pylint: disable=no-member
+        snapshot = Snapshot(
+            SnapshotStore(), snapshot_key(options.resulting_file_name("all"), filters)
+        )
+        options.snapshot = snapshot
+        if snapshot.previous_taken_at is not None:
+            options.event_sources = changed_event_sources(
+                self.session, options.region_name, snapshot.previous_taken_at
+            )
+
+
+class AllPlan(BaseCommand):
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self, session, region_name, plan_file=None, diff_file=None, show=False
+    ):
+        """
+        Generates, shows or compares the discovery plan used by aws-all
+
+        :param session:
+        :param region_name:
+        :param plan_file:
+        :param diff_file:
+        :param show:
+        """
+        self.session = session
+        self.region_name = region_name
+        self.plan_file = plan_file or DEFAULT_PLAN_FILE
+        self.diff_file = diff_file
+        self.show = show
+
+    def run(
+        self,
+        diagram: bool,
+        verbose: bool,
+        services: List[str],
+        filters: List[Filterable],
+    ):
+        if self.diff_file is not None:
+            self.print_diff()
+        elif self.show:
+            self.print_plan(verbose)
+        else:
+            self.generate(verbose, services)
+
+    def generate(self, verbose: bool, services: List[str]):
+        if verbose:
+            message_handler("Fetching allowed actions...", "HEADER")
+        allowed_actions = fetch_allowed_actions(
+            get_client(self.session, "iam", self.region_name)
+        )
+        aws_services = services or OPERATION_CATALOG.list_services()
+        plan = build_plan(allowed_actions, aws_services)
+        save_plan(plan, self.plan_file)
+        message_handler(
+            "Discovery plan with {} operations across {} services saved to {}".format(
+                sum(len(service.operations) for service in plan.services.values()),
+                len(plan.services),
+                self.plan_file,
+            ),
+            "HEADER",
+        )
+
+    def print_plan(self, verbose: bool):
+        plan = load_plan(self.plan_file)
+        message_handler(
+            "Discovery plan {} (botocore {}, policies {})".format(
+                self.plan_file, plan.botocore_version, plan.policies_digest[:12]
+            ),
+            "HEADER",
+        )
+        for service_name, service_plan in sorted(plan.services.items()):
+            message_handler(
+                "{}: {} operations".format(service_name, len(service_plan.operations)),
+                "OKBLUE",
+            )
+            if not verbose:
+                continue
+            for planned_operation in service_plan.operations.values():
+                dependency = ""
+                if planned_operation.parent_operation is not None:
+                    dependency = " ({} from {})".format(
+                        planned_operation.required_field,
+                        planned_operation.parent_operation,
+                    )
+                message_handler(
+                    "    {} -> {}{}".format(
+                        planned_operation.name,
+                        planned_operation.resource_type,
+                        dependency,
+                    ),
+                    "OKBLUE",
+                )
+
+    def print_diff(self):
+        old_plan = load_plan(self.diff_file)
+        new_plan = load_plan(self.plan_file)
+        message_handler(
+            "Comparing {} (botocore {}) with {} (botocore {})".format(
+                self.diff_file,
+                old_plan.botocore_version,
+                self.plan_file,
+                new_plan.botocore_version,
+            ),
+            "HEADER",
+        )
+        plan_diff = diff_plans(old_plan, new_plan)
+        if plan_diff.is_empty():
+            message_handler("Plans are equivalent", "OKGREEN")
+            return
+        for sign, items, position in [
+            ("+ service", plan_diff.added_services, "OKGREEN"),
+            ("- service", plan_diff.removed_services, "FAIL"),
+            ("+", plan_diff.added_operations, "OKGREEN"),
+            ("-", plan_diff.removed_operations, "FAIL"),
+            ("~", plan_diff.changed_operations, "WARNING"),
+        ]:
+            for item in items:
+                message_handler("{} {}".format(sign, item), position)
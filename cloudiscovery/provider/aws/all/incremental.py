@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from typing import Optional, Set
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from provider.aws.all.catalog import OPERATION_CATALOG
+from provider.aws.common_aws import get_client
+from shared.common import message_handler
+
+# CloudTrail delivers events up to 15 minutes after the call
+CLOUDTRAIL_DELIVERY_DELAY = 15 * 60
+MAX_LOOKUP_PAGES = 200
+GLOBAL_EVENTS_REGION = "us-east-1"
+# write events of global services are only recorded in us-east-1
+GLOBAL_EVENT_SOURCES = frozenset(
+    [
+        "iam",
+        "sts",
+        "organizations",
+        "route53",
+        "route53domains",
+        "cloudfront",
+        "globalaccelerator",
+        "waf",
+        "shield",
+    ]
+)
+
+
+def changed_event_sources(
+    session, region_name: str, since: float
+) -> Optional[Set[str]]:
+    """
+    Event sources (e.g. ec2) with write events in region since the given time, None if CloudTrail can't tell
+    """
+    client = get_client(session, "cloudtrail", region_name)
+    start_time = datetime.fromtimestamp(since - CLOUDTRAIL_DELIVERY_DELAY, timezone.utc)
+    event_sources = set()
+    try:
+        pages = client.get_paginator("lookup_events").paginate(
+            LookupAttributes=[{"AttributeKey": "ReadOnly", "AttributeValue": "false"}],
+            StartTime=start_time,
+        )
+        for page_number, page in enumerate(pages):
+            if page_number >= MAX_LOOKUP_PAGES:
+                message_handler(
+                    "Too many changes in region {}, relisting every service".format(
+                        region_name
+                    ),
+                    "WARNING",
+                )
+                return None
+            for event in page["Events"]:
+                event_sources.add(event["EventSource"].split(".", 1)[0])
+    except (BotoCoreError, ClientError) as e:
+        message_handler(
+            "Can't look up CloudTrail events in region {} ({}), relisting every service".format(
+                region_name, str(e)
+            ),
+            "WARNING",
+        )
+        return None
+    return event_sources
+
+
+def service_event_source(aws_service: str) -> str:
+    endpoint_prefix = OPERATION_CATALOG.service(aws_service).endpoint_prefix
+    return endpoint_prefix or aws_service
+
+
+def service_unchanged(
+    aws_service: str, region_name: str, event_sources: Optional[Set[str]]
+) -> bool:
+    if event_sources is None:
+        return False
+    event_source = service_event_source(aws_service)
+    if event_source in GLOBAL_EVENT_SOURCES and region_name != GLOBAL_EVENTS_REGION:
+        return False
+    return event_source not in event_sources
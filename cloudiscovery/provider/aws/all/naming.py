@@ -0,0 +1,80 @@
+import functools
+import re
+
+PLURAL_TO_SINGULAR = {
+    "ies": "y",
+    "status": "status",
+    "ches": "ch",
+    "ses": "s",
+}
+
+LISTING_PREFIXES = ["List", "Get", "Describe"]
+
+UPPER_CASE_REGEX = re.compile("(?!^)([A-Z]+)")
+NAME_ELEMENT_REGEX = re.compile("[A-Z][^A-Z]*")
+LISTING_PREFIX_REGEX = re.compile(r"^(?:List)?(?:Get)?(?:Describe)?")
+
+
+@functools.lru_cache(maxsize=None)
+def _to_snake_case(camel_case):
+    return (
+        UPPER_CASE_REGEX.sub(r"_\1", camel_case)
+        .lower()
+        .replace("open_idconnect", "open_id_connect")
+        .replace("samlproviders", "saml_providers")
+        .replace("sshpublic_keys", "ssh_public_keys")
+        .replace("mfadevices", "mfa_devices")
+        .replace("cacertificates", "ca_certificates")
+        .replace("awsservice", "aws_service")
+        .replace("dbinstances", "db_instances")
+        .replace("drtaccess", "drt_access")
+        .replace("ipsets", "ip_sets")
+        .replace("mljobs", "ml_jobs")
+        .replace("dbcluster", "db_cluster")
+        .replace("dbengine", "db_engine")
+        .replace("dbsecurity", "db_security")
+        .replace("dbsubnet", "db_subnet")
+        .replace("dbsnapshot", "db_snapshot")
+        .replace("dbproxies", "db_proxies")
+        .replace("dbparameter", "db_parameter")
+        .replace("dbinstance", "db_instance")
+        .replace("d_bparameter", "db_parameter")
+        .replace("s_amlproviders", "saml_providers")
+        .replace("a_wsservice", "aws_service")
+    )
+
+
+def singular_from_plural(name: str) -> str:
+    if name.endswith("s"):
+        for plural_suffix, singular_suffix in PLURAL_TO_SINGULAR.items():
+            if name.endswith(plural_suffix):
+                name = name[: -len(plural_suffix)] + singular_suffix
+                return name
+        if not name.endswith("ss"):
+            name = name[:-1]
+    return name
+
+
+def is_listing_operation(operation_name: str) -> bool:
+    return (
+        operation_name.startswith("List")
+        or operation_name.startswith("Get")
+        or operation_name.startswith("Describe")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def last_singular_name_element(operation_name):
+    last_name = NAME_ELEMENT_REGEX.findall(operation_name)[-1]
+    return singular_from_plural(last_name)
+
+
+@functools.lru_cache(maxsize=None)
+def build_resource_type(aws_service, name):
+    resource_name = LISTING_PREFIX_REGEX.sub("", name)
+    return singular_from_plural(
+        "aws_{}_{}".format(
+            aws_service.replace("-", "_"),
+            _to_snake_case(resource_name),
+        )
+    )
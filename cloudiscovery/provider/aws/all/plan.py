@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+from typing import NamedTuple, Optional, Dict, List
+
+from botocore import __version__ as botocore_version
+from botocore.exceptions import UnknownServiceError
+
+from provider.aws.all.catalog import (
+    OPERATION_CATALOG,
+    ListingOperation,
+    ServiceCatalog,
+)
+from provider.aws.all.data.omitted_resources import OMITTED_RESOURCES
+from provider.aws.all.data.on_top_policies import ON_TOP_POLICIES
+from provider.aws.all.data.required_params_override import REQUIRED_PARAMS_OVERRIDE
+from shared.common import message_handler
+
+PATH_PLAN_OUTPUT = "./assets/plan/"
+DEFAULT_PLAN_FILE = PATH_PLAN_OUTPUT + "aws_all_plan.json"
+PLAN_FORMAT = 2
+
+POLICY_ARNS = [
+    "arn:aws:iam::aws:policy/job-function/ViewOnlyAccess",
+    "arn:aws:iam::aws:policy/SecurityAudit",
+]
+
+
+class PlannedOperation(NamedTuple):
+    name: str
+    snake_name: str
+    resource_type: str
+    has_paginator: bool
+    supports_tag_filters: bool = False
+    required_field: Optional[str] = None
+    parent_operation: Optional[str] = None
+
+
+class ServicePlan(NamedTuple):
+    service_name: str
+    service_full_name: str
+    operations: Dict[str, PlannedOperation]
+
+
+class DiscoveryPlan(NamedTuple):
+    botocore_version: str
+    policies_digest: str
+    services: Dict[str, ServicePlan]
+
+
+class PlanDiff(NamedTuple):
+    added_services: List[str]
+    removed_services: List[str]
+    added_operations: List[str]
+    removed_operations: List[str]
+    changed_operations: List[str]
+
+    def is_empty(self) -> bool:
+        return not (
+            self.added_services
+            or self.removed_services
+            or self.added_operations
+            or self.removed_operations
+            or self.changed_operations
+        )
+
+
+def operation_allowed(
+    allowed_actions: List[str], aws_service: str, operation_name: str
+):
+    evaluation_result = False
+    for action in allowed_actions:
+        if action == "*":
+            evaluation_result = True
+            break
+        action_service = action.split(":", 1)[0]
+        if not action_service == aws_service:
+            continue
+        action_operation = action.split(":", 1)[1]
+        if action_operation.endswith("*") and operation_name.startswith(
+            action_operation[:-1]
+        ):
+            evaluation_result = True
+            break
+        if operation_name == action_operation:
+            evaluation_result = True
+            break
+    return evaluation_result
+
+
+def operation_required_fields(aws_service, listing_operation: ListingOperation):
+    required_fields = listing_operation.required_fields or []
+    if (
+        aws_service in REQUIRED_PARAMS_OVERRIDE
+        and listing_operation.name in REQUIRED_PARAMS_OVERRIDE[aws_service]
+    ):
+        required_fields = REQUIRED_PARAMS_OVERRIDE[aws_service][listing_operation.name]
+    return required_fields
+
+
+def get_policy_allowed_calls(iam_client, policy_arn):
+    policy_version_id = iam_client.get_policy(PolicyArn=policy_arn)["Policy"][
+        "DefaultVersionId"
+    ]
+    policy_document = iam_client.get_policy_version(
+        PolicyArn=policy_arn, VersionId=policy_version_id
+    )["PolicyVersion"]["Document"]
+
+    return policy_document
+
+
+def fetch_allowed_actions(iam_client) -> List[str]:
+    allowed_actions = {}
+    for policy_arn in POLICY_ARNS:
+        policy_document = get_policy_allowed_calls(iam_client, policy_arn)
+        for action in policy_document["Statement"][0]["Action"]:
+            allowed_actions[action] = True
+    for action in ON_TOP_POLICIES:
+        allowed_actions[action] = True
+    return list(allowed_actions.keys())
+
+
+def policies_digest(allowed_actions: List[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(allowed_actions)).encode()).hexdigest()
+
+
+def find_parent_operation(
+    service_catalog: ServiceCatalog, required_field: str
+) -> Optional[ListingOperation]:
+    parent_operation = None
+    for operation_name, listing_operation in service_catalog.operations.items():
+        if operation_name.lower().startswith("list" + required_field[:-1].lower()):
+            parent_operation = listing_operation
+    return parent_operation
+
+
+def plan_service(service_catalog: ServiceCatalog, allowed_actions) -> ServicePlan:
+    """
+    Listing operations of a service that a run will call, with the operation listing their required field
+
+    Operations whose required values can't be listed are left out, they would never be called.
+    """
+    aws_service = service_catalog.service_name
+
+    def runnable(listing_operation: ListingOperation) -> bool:
+        return listing_operation.resource_type not in OMITTED_RESOURCES and (
+            operation_allowed(allowed_actions, aws_service, listing_operation.name)
+        )
+
+    operations = dict()
+    for listing_operation in service_catalog.operations.values():
+        if not runnable(listing_operation):
+            continue
+        required_fields = operation_required_fields(aws_service, listing_operation)
+        required_field = None
+        parent_name = None
+        if len(required_fields) > 1:
+            continue
+        if len(required_fields) == 1:
+            required_field = required_fields[0]
+            parent_operation = find_parent_operation(service_catalog, required_field)
+            if (
+                parent_operation is None
+                or not runnable(parent_operation)
+                or operation_required_fields(aws_service, parent_operation)
+            ):
+                continue
+            parent_name = parent_operation.name
+        operations[listing_operation.name] = PlannedOperation(
+            name=listing_operation.name,
+            snake_name=listing_operation.snake_name,
+            resource_type=listing_operation.resource_type,
+            has_paginator=listing_operation.has_paginator,
+            supports_tag_filters=listing_operation.supports_tag_filters
+            and "Filters" not in required_fields,
+            required_field=required_field,
+            parent_operation=parent_name,
+        )
+
+    return ServicePlan(
+        service_name=aws_service,
+        service_full_name=service_catalog.service_full_name,
+        operations=operations,
+    )
+
+
+def build_plan(allowed_actions: List[str], aws_services: List[str]) -> DiscoveryPlan:
+    services = dict()
+    for aws_service in aws_services:
+        try:
+            service_catalog = OPERATION_CATALOG.service(aws_service)
+        except UnknownServiceError:
+            message_handler(
+                "Unknown service {}... Skipping".format(aws_service), "WARNING"
+            )
+            continue
+        services[aws_service] = plan_service(service_catalog, allowed_actions)
+
+    return DiscoveryPlan(
+        botocore_version=botocore_version,
+        policies_digest=policies_digest(allowed_actions),
+        services=services,
+    )
+
+
+def plan_to_dict(plan: DiscoveryPlan) -> dict:
+    return {
+        "format": PLAN_FORMAT,
+        "botocore_version": plan.botocore_version,
+        "policies_digest": plan.policies_digest,
+        "services": {
+            service_name: {
+                "service_full_name": service_plan.service_full_name,
+                "operations": {
+                    name: planned_operation._asdict()
+                    for name, planned_operation in service_plan.operations.items()
+                },
+            }
+            for service_name, service_plan in plan.services.items()
+        },
+    }
+
+
+def plan_from_dict(plan_data: dict) -> DiscoveryPlan:
+    if plan_data.get("format") != PLAN_FORMAT:
+        raise ValueError(
+            "Unsupported discovery plan format {}".format(plan_data.get("format"))
+        )
+    services = dict()
+    for service_name, service_data in plan_data["services"].items():
+        services[service_name] = ServicePlan(
+            service_name=service_name,
+            service_full_name=service_data["service_full_name"],
+            operations={
+                name: PlannedOperation(**operation_data)
+                for name, operation_data in service_data["operations"].items()
+            },
+        )
+    return DiscoveryPlan(
+        botocore_version=plan_data["botocore_version"],
+        policies_digest=plan_data["policies_digest"],
+        services=services,
+    )
+
+
+def save_plan(plan: DiscoveryPlan, plan_file: str):
+    plan_directory = os.path.dirname(plan_file)
+    if plan_directory:
+        os.makedirs(plan_directory, exist_ok=True)
+    with open(plan_file, "w", encoding="utf-8") as plan_output:
+        json.dump(plan_to_dict(plan), plan_output, indent=2, sort_keys=True)
+
+
+def load_plan(plan_file: str) -> DiscoveryPlan:
+    with open(plan_file, "r", encoding="utf-8") as plan_input:
+        return plan_from_dict(json.load(plan_input))
+
+
+def load_run_plan(plan_file: Optional[str]) -> Optional[DiscoveryPlan]:
+    """
+    Plan used by an aws-all run, None when there is no plan or it doesn't match the installed botocore
+    """
+    if plan_file is None:
+        if not os.path.exists(DEFAULT_PLAN_FILE):
+            return None
+        plan_file = DEFAULT_PLAN_FILE
+    plan = load_plan(plan_file)
+    if plan.botocore_version != botocore_version:
+        message_handler(
+            "Discovery plan {} was generated with botocore {}, installed version is {}. "
+            "Ignoring it, please generate it again with aws-all-plan".format(
+                plan_file, plan.botocore_version, botocore_version
+            ),
+            "WARNING",
+        )
+        return None
+    message_handler("Using discovery plan {}".format(plan_file), "HEADER")
+    return plan
+
+
+def diff_plans(old_plan: DiscoveryPlan, new_plan: DiscoveryPlan) -> PlanDiff:
+    added_operations = []
+    removed_operations = []
+    changed_operations = []
+    for service_name in sorted(set(old_plan.services) & set(new_plan.services)):
+        old_operations = old_plan.services[service_name].operations
+        new_operations = new_plan.services[service_name].operations
+        for name in sorted(set(old_operations) | set(new_operations)):
+            operation_key = "{}:{}".format(service_name, name)
+            if name not in old_operations:
+                added_operations.append(operation_key)
+            elif name not in new_operations:
+                removed_operations.append(operation_key)
+            elif old_operations[name] != new_operations[name]:
+                changed_operations.append(operation_key)
+
+    return PlanDiff(
+        added_services=sorted(set(new_plan.services) - set(old_plan.services)),
+        removed_services=sorted(set(old_plan.services) - set(new_plan.services)),
+        added_operations=added_operations,
+        removed_operations=removed_operations,
+        changed_operations=changed_operations,
+    )
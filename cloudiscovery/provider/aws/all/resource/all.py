@@ -1,24 +1,37 @@
-import collections
+import asyncio
+import collections.abc
+import functools
 import itertools
-import re
+import threading
+import time
+from concurrent.futures import as_completed, Future
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import List, Optional
+from typing import List, Optional, FrozenSet, Dict, Iterator, Tuple
 
-from botocore.exceptions import UnknownServiceError
-from botocore.loaders import Loader
+from botocore.exceptions import ClientError
 
+from provider.aws.all.catalog import OPERATION_CATALOG
 from provider.aws.all.command import AllOptions
-from provider.aws.all.data.omitted_resources import OMITTED_RESOURCES
-from provider.aws.all.data.on_top_policies import ON_TOP_POLICIES
-from provider.aws.all.data.required_params_override import REQUIRED_PARAMS_OVERRIDE
 from provider.aws.all.exception import all_exception
+from provider.aws.all.incremental import service_unchanged
+from provider.aws.all.naming import _to_snake_case, last_singular_name_element
+from provider.aws.all.plan import (
+    PlannedOperation,
+    ServicePlan,
+    plan_service,
+    fetch_allowed_actions,
+)
 from provider.aws.common_aws import get_paginator, resource_tags
+from shared.checkpoint import MISSING
 from shared.common import (
     ResourceProvider,
     Resource,
     ResourceDigest,
     message_handler,
     ResourceAvailable,
+    LazyMapping,
+    CompiledFilters,
+    compile_filters,
 )
 
 SKIPPED_SERVICES = [
@@ -26,157 +39,124 @@ SKIPPED_SERVICES = [
 ]  # those services have too unreliable API to make use of it
 
 PARALLEL_SERVICE_CALLS = 80
+PARALLEL_OPERATION_CALLS = 80
 
-PLURAL_TO_SINGULAR = {
-    "ies": "y",
-    "status": "status",
-    "ches": "ch",
-    "ses": "s",
-}
-
-LISTING_PREFIXES = ["List", "Get", "Describe"]
-
-
-def _to_snake_case(camel_case):
-    return (
-        re.sub("(?!^)([A-Z]+)", r"_\1", camel_case)
-        .lower()
-        .replace("open_idconnect", "open_id_connect")
-        .replace("samlproviders", "saml_providers")
-        .replace("sshpublic_keys", "ssh_public_keys")
-        .replace("mfadevices", "mfa_devices")
-        .replace("cacertificates", "ca_certificates")
-        .replace("awsservice", "aws_service")
-        .replace("dbinstances", "db_instances")
-        .replace("drtaccess", "drt_access")
-        .replace("ipsets", "ip_sets")
-        .replace("mljobs", "ml_jobs")
-        .replace("dbcluster", "db_cluster")
-        .replace("dbengine", "db_engine")
-        .replace("dbsecurity", "db_security")
-        .replace("dbsubnet", "db_subnet")
-        .replace("dbsnapshot", "db_snapshot")
-        .replace("dbproxies", "db_proxies")
-        .replace("dbparameter", "db_parameter")
-        .replace("dbinstance", "db_instance")
-        .replace("d_bparameter", "db_parameter")
-        .replace("s_amlproviders", "saml_providers")
-        .replace("a_wsservice", "aws_service")
-    )
+# error codes of EC2 operations rejecting a filter name
+INVALID_FILTER_ERRORS = frozenset(["InvalidParameterValue", "InvalidFilter"])
 
+# resolved name and id keys, per item shape
+KEY_RESOLUTION_CACHE_SIZE = 4096
 
-def singular_from_plural(name: str) -> str:
-    if name.endswith("s"):
-        for plural_suffix, singular_suffix in PLURAL_TO_SINGULAR.items():
-            if name.endswith(plural_suffix):
-                name = name[: -len(plural_suffix)] + singular_suffix
-                return name
-        if not name.endswith("ss"):
-            name = name[:-1]
-    return name
 
+def retrieve_resource_name(resource, operation_name, last_name=None):
+    if isinstance(resource, str):
+        return resource
+    if last_name is None:
+        last_name = last_singular_name_element(operation_name)
+    name_keys, _ = resolve_keys(last_name, frozenset(resource.keys()))
+    return resolved_value(resource, name_keys)
+
+
+def only_one_suffix_key(keys, suffix) -> Optional[str]:
+    suffix = suffix.lower()
+    suffix_keys = [
+        key
+        for key in keys
+        if key.lower().endswith(suffix)
+        and not key.lower().endswith("display" + suffix)
+    ]
+    if len(suffix_keys) == 1:
+        return suffix_keys[0]
+    return None
 
-def is_listing_operation(operation_name: str) -> bool:
-    return (
-        operation_name.startswith("List")
-        or operation_name.startswith("Get")
-        or operation_name.startswith("Describe")
-    )
 
+def only_one_suffix(resource, suffix):
+    key = only_one_suffix_key(resource.keys(), suffix)
+    if key is None:
+        return None
+    return resource[key]
 
-def last_singular_name_element(operation_name):
-    last_name = re.findall("[A-Z][^A-Z]*", operation_name)[-1]
-    return singular_from_plural(last_name)
 
+# (key, found when present or only when its value is truthy)
+ResolvedKeys = Tuple[Tuple[str, bool], ...]
 
-def retrieve_resource_name(resource, operation_name):
-    resource_name = None
-    last_name = last_singular_name_element(operation_name)
-    if isinstance(resource, str):
-        resource_name = resource
-    elif "name" in resource:
-        resource_name = resource["name"]
-    elif "Name" in resource:
-        resource_name = resource["Name"]
-    elif last_name + "Name" in resource:
-        resource_name = resource[last_name + "Name"]
-    elif only_one_suffix(resource, "name"):
-        resource_name = only_one_suffix(resource, "name")
 
-    return resource_name
+@functools.lru_cache(maxsize=KEY_RESOLUTION_CACHE_SIZE)
+def resolve_keys(
+    last_name: str, keys: FrozenSet[str]
+) -> Tuple[ResolvedKeys, ResolvedKeys]:
+    """
+    Keys holding the name and the id of items of an operation, in lookup order
 
+    Items listed by the same operation share their keys, so they are resolved once per item shape.
+    """
 
-# pylint: disable=inconsistent-return-statements
-def only_one_suffix(resource, suffix):
-    id_keys = []
-    last_id_val = None
-    for key, val in resource.items():
-        if key.lower().endswith(suffix.lower()) and not key.lower().endswith(
-            "display" + suffix.lower()
-        ):
-            id_keys.append(key)
-            last_id_val = val
-    if len(id_keys) == 1:
-        return last_id_val
-    return None
+    def candidates(lookups) -> ResolvedKeys:
+        resolved = []
+        for key, present in lookups:
+            if key is None:
+                continue
+            if present:
+                if key in keys:
+                    resolved.append((key, False))
+                    break
+            else:
+                resolved.append((key, True))
+        return tuple(resolved)
+
+    name_keys = candidates(
+        [
+            ("name", True),
+            ("Name", True),
+            (last_name + "Name", True),
+            (only_one_suffix_key(keys, "name"), False),
+        ]
+    )
+    id_keys = candidates(
+        [
+            ("id", True),
+            (last_name + "Id", True),
+            (only_one_suffix_key(keys, "id"), False),
+            ("arn", True),
+            (only_one_suffix_key(keys, last_name + "arn"), False),
+            (only_one_suffix_key(keys, "arn"), False),
+        ]
+    )
+    return name_keys, id_keys
 
 
-def retrieve_resource_id(resource, operation_name, resource_name):
-    resource_id = resource_name
-    last_name = last_singular_name_element(operation_name)
+def resolved_value(resource, resolved_keys: ResolvedKeys, default=None):
+    for key, truthy_only in resolved_keys:
+        value = resource[key]
+        if value or not truthy_only:
+            return value
+    return default
+
+
+def retrieve_resource_id(resource, operation_name, resource_name, last_name=None):
     if isinstance(resource, str):
-        resource_id = resource
-    elif "id" in resource:
-        resource_id = resource["id"]
-    elif last_name + "Id" in resource:
-        resource_id = resource[last_name + "Id"]
-    elif only_one_suffix(resource, "id"):
-        resource_id = only_one_suffix(resource, "id")
-    elif "arn" in resource:
-        resource_id = resource["arn"]
-    elif only_one_suffix(resource, last_name + "arn"):
-        resource_id = only_one_suffix(resource, last_name + "arn")
-    elif only_one_suffix(resource, "arn"):
-        resource_id = only_one_suffix(resource, "arn")
-
-    return resource_id
-
-
-def operation_allowed(
-    allowed_actions: List[str], aws_service: str, operation_name: str
-):
-    evaluation_result = False
-    for action in allowed_actions:
-        if action == "*":
-            evaluation_result = True
-            break
-        action_service = action.split(":", 1)[0]
-        if not action_service == aws_service:
-            continue
-        action_operation = action.split(":", 1)[1]
-        if action_operation.endswith("*") and operation_name.startswith(
-            action_operation[:-1]
-        ):
-            evaluation_result = True
-            break
-        if operation_name == action_operation:
-            evaluation_result = True
-            break
-    return evaluation_result
+        return resource
+    if last_name is None:
+        last_name = last_singular_name_element(operation_name)
+    _, id_keys = resolve_keys(last_name, frozenset(resource.keys()))
+    return resolved_value(resource, id_keys, resource_name)
 
 
 def build_resource(
-    base_resource, operation_name, resource_type, group
+    base_resource, operation_name, resource_type, group, last_name=None
 ) -> Optional[Resource]:
-    resource_name = retrieve_resource_name(base_resource, operation_name)
-    resource_id = retrieve_resource_id(base_resource, operation_name, resource_name)
+    resource_name = retrieve_resource_name(base_resource, operation_name, last_name)
+    resource_id = retrieve_resource_id(
+        base_resource, operation_name, resource_name, last_name
+    )
 
     if resource_name is None and resource_id is not None:
         resource_name = resource_id
 
     if resource_id is None or resource_name is None:
         return None
-    attributes = flatten(base_resource)
+    # flattened only when attributes are read, e.g. by reports
+    attributes = LazyMapping(base_resource, flatten)
     return Resource(
         digest=ResourceDigest(id=resource_id, type=resource_type),
         group=group,
@@ -186,15 +166,21 @@ def build_resource(
     )
 
 
-def build_resource_type(aws_service, name):
-    resource_name = re.sub(r"^List", "", name)
-    resource_name = re.sub(r"^Get", "", resource_name)
-    resource_name = re.sub(r"^Describe", "", resource_name)
-    return singular_from_plural(
-        "aws_{}_{}".format(
-            aws_service.replace("-", "_"), _to_snake_case(resource_name),
+def build_resources(
+    base_resources, operation_name, resource_type, group
+) -> List[Resource]:
+    """
+    Batch version of build_resource, operation-level work is done once for the whole batch
+    """
+    last_name = last_singular_name_element(operation_name)
+    resources = []
+    for base_resource in base_resources:
+        resource = build_resource(
+            base_resource, operation_name, resource_type, group, last_name
         )
-    )
+        if resource is not None:
+            resources.append(resource)
+    return resources
 
 
 def flatten(d, parent_key="", sep="."):
@@ -203,34 +189,42 @@ def flatten(d, parent_key="", sep="."):
         return {}
     for k, v in d.items():
         new_key = parent_key + sep + k if parent_key else k
-        if isinstance(v, collections.MutableMapping):
+        if isinstance(v, collections.abc.MutableMapping):
             items.extend(flatten(v, new_key, sep=sep).items())
         else:
             items.append((new_key, v))
     return dict(items)
 
 
-def operation_required_fields(aws_service, input_model, operation):
-    required_fields = []
-    if "required" in input_model and input_model["required"]:
-        required_fields = input_model["required"]
-    if (
-        aws_service in REQUIRED_PARAMS_OVERRIDE
-        and operation["name"] in REQUIRED_PARAMS_OVERRIDE[aws_service]
-    ):
-        required_fields = REQUIRED_PARAMS_OVERRIDE[aws_service][operation["name"]]
-    return required_fields
+def service_may_produce_types(aws_service: str, resource_types: FrozenSet[str]):
+    service_prefix = "aws_{}_".format(aws_service.replace("-", "_"))
+    for resource_type in resource_types:
+        if resource_type.startswith(service_prefix):
+            return True
+    return False
 
 
-def get_policy_allowed_calls(iam_client, policy_arn):
-    policy_version_id = iam_client.get_policy(PolicyArn=policy_arn)["Policy"][
-        "DefaultVersionId"
-    ]
-    policy_document = iam_client.get_policy_version(
-        PolicyArn=policy_arn, VersionId=policy_version_id
-    )["PolicyVersion"]["Document"]
+def type_pushdown(compiled_filters: CompiledFilters) -> Optional[FrozenSet[str]]:
+    """
+    Resource types that are worth listing, None when every type must be listed
+
+    Filters are alternatives, so a tag filter can match any type and disables type pushdown.
+    """
+    if compiled_filters.types and not compiled_filters.tags:
+        return compiled_filters.types
+    return None
+
 
-    return policy_document
+def ec2_tag_pushdown(compiled_filters: CompiledFilters) -> Optional[List[Dict]]:
+    """
+    EC2 server-side filters equivalent to the tag filters, None when they can't be expressed
+
+    EC2 filters with different names are combined with AND, so only a single tag key (any of its values) is pushed.
+    """
+    if compiled_filters.types or len(compiled_filters.tags) != 1:
+        return None
+    key, values = next(iter(compiled_filters.tags.items()))
+    return [{"Name": "tag:" + key, "Values": sorted(values)}]
 
 
 def permutate_parameters(operation_parameters):
@@ -246,6 +240,24 @@ def permutate_parameters(operation_parameters):
     return parameters_permutation
 
 
+class OperationScheduler:
+    def __init__(self, executor: ThreadPoolExecutor, service_parallelism: int):
+        """
+        Submits listing operations of one service to the executor shared by all services
+
+        :param executor:
+        :param service_parallelism: operations of the service in flight at the same time
+        """
+        self.executor = executor
+        self.slots = threading.BoundedSemaphore(max(1, service_parallelism))
+
+    def submit(self, fn, *args) -> Future:
+        self.slots.acquire()
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
 class AllResources(ResourceProvider):
     def __init__(self, options: AllOptions):
         """
@@ -256,16 +268,83 @@ class AllResources(ResourceProvider):
         super().__init__()
         self.options = options
         self.availabilityCheck = ResourceAvailable("")
+        compiled_filters = compile_filters(options.filters)
+        self.type_pushdown = type_pushdown(compiled_filters)
+        self.ec2_tag_pushdown = ec2_tag_pushdown(compiled_filters)
+        self.service_durations: Dict[str, float] = dict()
 
     @all_exception
     def get_resources(self) -> List[Resource]:
-        boto_loader = Loader()
+        return list(self.iter_resources())
+
+    def iter_resources(self) -> Iterator[Resource]:
+        """
+        Yields resources of each service as soon as the service is analyzed
+        """
+        services_plan = self.prepare_services()
+        if services_plan is None:
+            return
+        aws_services, allowed_actions = services_plan
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(
+            PARALLEL_OPERATION_CALLS
+        ) as operation_executor, ThreadPoolExecutor(PARALLEL_SERVICE_CALLS) as executor:
+            futures = [
+                executor.submit(
+                    self.analyze_service,
+                    aws_service,
+                    allowed_actions,
+                    operation_executor,
+                )
+                for aws_service in aws_services
+            ]
+            for future in as_completed(futures):
+                service_resources = future.result()
+                if service_resources is not None:
+                    yield from service_resources
+        self.report_critical_path(time.perf_counter() - started)
+
+    def critical_path_service(self) -> Optional[str]:
+        if not self.service_durations:
+            return None
+        return max(self.service_durations, key=self.service_durations.get)
+
+    def report_critical_path(self, duration: float):
+        service = self.critical_path_service()
+        if service is None:
+            return
+        message_handler(
+            "Region {}: {} services analyzed in {:.1f}s, longest service {} took {:.1f}s".format(
+                self.options.region_name,
+                len(self.service_durations),
+                duration,
+                service,
+                self.service_durations[service],
+            ),
+            "HEADER",
+        )
+
+    @all_exception
+    def prepare_services(self):
+        plan = self.options.plan
         if self.options.services:
             aws_services = self.options.services
+        elif plan is not None:
+            aws_services = list(plan.services.keys())
         else:
-            aws_services = boto_loader.list_available_services(type_name="service-2")
-        resources = []
-        allowed_actions = self.get_policies_allowed_actions()
+            aws_services = OPERATION_CATALOG.list_services()
+        if self.type_pushdown is not None:
+            aws_services = [
+                aws_service
+                for aws_service in aws_services
+                if service_may_produce_types(aws_service, self.type_pushdown)
+            ]
+        allowed_actions = None
+        if plan is None or any(
+            aws_service not in plan.services for aws_service in aws_services
+        ):
+            allowed_actions = self.get_policies_allowed_actions()
 
         if self.options.verbose:
             message_handler(
@@ -274,32 +353,13 @@ class AllResources(ResourceProvider):
                 ),
                 "HEADER",
             )
-        with ThreadPoolExecutor(PARALLEL_SERVICE_CALLS) as executor:
-            results = executor.map(
-                lambda aws_service: self.analyze_service(
-                    aws_service, boto_loader, allowed_actions
-                ),
-                aws_services,
-            )
-        for service_resources in results:
-            if service_resources is not None:
-                resources.extend(service_resources)
+        return aws_services, allowed_actions
 
-        return resources
-
-    # pylint: disable=too-many-locals
     @all_exception
-    def analyze_service(self, aws_service, boto_loader, allowed_actions):
-        resources = []
+    def prepare_service(self, aws_service, allowed_actions):
         client = self.options.client(aws_service)
-        service_model = boto_loader.load_service_model(aws_service, "service-2")
-        try:
-            paginators_model = boto_loader.load_service_model(
-                aws_service, "paginators-1"
-            )
-        except UnknownServiceError:
-            paginators_model = {"pagination": {}}
-        service_full_name = service_model["metadata"]["serviceFullName"]
+        service_plan = self.service_plan(aws_service, allowed_actions)
+        service_full_name = service_plan.service_full_name
         if self.options.verbose:
             message_handler(
                 "Collecting data from {}...".format(service_full_name), "HEADER"
@@ -317,24 +377,155 @@ class AllResources(ResourceProvider):
                 "WARNING",
             )
             return None
-        for name, operation in service_model["operations"].items():
-            if is_listing_operation(name):
-                operation_resources = self.analyze_listing_operation(
-                    name,
-                    paginators_model,
-                    aws_service,
-                    allowed_actions,
-                    operation,
-                    service_model,
+        return service_plan, client
+
+    def reused_resources(self, aws_service) -> Optional[List[Resource]]:
+        """
+        Resources of the previous snapshot when CloudTrail shows no write to the service since then
+        """
+        snapshot = self.options.snapshot
+        if (
+            snapshot is None
+            or not snapshot.reusable(aws_service)
+            or not service_unchanged(
+                aws_service, self.options.region_name, self.options.event_sources
+            )
+        ):
+            return None
+        if self.options.verbose:
+            message_handler(
+                "No changes to {} since previous snapshot, reusing it".format(
+                    aws_service
+                ),
+                "OKBLUE",
+            )
+        return snapshot.reuse(aws_service)
+
+    def resumed_resources(self, aws_service) -> Optional[List[Resource]]:
+        checkpoint = self.options.checkpoint
+        if checkpoint is None:
+            return None
+        service_resources = checkpoint.result(
+            "service", self.options.region_name, aws_service
+        )
+        if service_resources is MISSING:
+            return None
+        if self.options.snapshot is not None:
+            self.options.snapshot.add_group(aws_service)
+        return service_resources
+
+    def known_resources(self, aws_service) -> Optional[List[Resource]]:
+        """
+        Resources of a service found without listing it, from the checkpoint or the previous snapshot
+        """
+        service_resources = self.resumed_resources(aws_service)
+        if service_resources is None:
+            service_resources = self.reused_resources(aws_service)
+        return service_resources
+
+    def service_analyzed(self, aws_service, service_resources):
+        if service_resources is None:
+            return None
+        if self.options.snapshot is not None:
+            self.options.snapshot.add_group(aws_service)
+        if self.options.checkpoint is not None and self.options.checkpoint.services:
+            self.options.checkpoint.complete(
+                "service",
+                self.options.region_name,
+                aws_service,
+                result=service_resources,
+            )
+        return service_resources
+
+    @all_exception
+    def analyze_service(self, aws_service, allowed_actions, operation_executor):
+        known_resources = self.known_resources(aws_service)
+        if known_resources is not None:
+            return known_resources
+        prepared_service = self.prepare_service(aws_service, allowed_actions)
+        if prepared_service is None:
+            return None
+        service_plan, client = prepared_service
+
+        started = time.perf_counter()
+        try:
+            return self.service_analyzed(
+                aws_service,
+                self.run_service_plan(
+                    service_plan,
                     client,
-                    service_full_name,
-                )
-                resources.extend(operation_resources)
+                    OperationScheduler(
+                        operation_executor, self.options.operation_parallelism
+                    ),
+                ),
+            )
+        finally:
+            self.service_durations[aws_service] = time.perf_counter() - started
+
+    @all_exception
+    async def get_resources_async(self) -> List[Resource]:
+        """
+        asyncio backend: services and operations are coroutines on one event loop, bounded by semaphores
 
+        Blocking SDK calls run in the default executor of the loop.
+        """
+        loop = asyncio.get_running_loop()
+        services_plan = await loop.run_in_executor(None, self.prepare_services)
+        if services_plan is None:
+            return []
+        aws_services, allowed_actions = services_plan
+
+        started = time.perf_counter()
+        service_slots = asyncio.Semaphore(PARALLEL_SERVICE_CALLS)
+        services_resources = await asyncio.gather(
+            *[
+                self.analyze_service_async(aws_service, allowed_actions, service_slots)
+                for aws_service in aws_services
+            ]
+        )
+        self.report_critical_path(time.perf_counter() - started)
+
+        resources = []
+        for service_resources in services_resources:
+            if service_resources is not None:
+                resources.extend(service_resources)
         return resources
 
     @all_exception
-    # pylint: disable=too-many-locals,too-many-arguments
+    async def analyze_service_async(
+        self, aws_service, allowed_actions, service_slots: asyncio.Semaphore
+    ):
+        async with service_slots:
+            loop = asyncio.get_running_loop()
+            known_resources = await loop.run_in_executor(
+                None, self.known_resources, aws_service
+            )
+            if known_resources is not None:
+                return known_resources
+            prepared_service = await loop.run_in_executor(
+                None, self.prepare_service, aws_service, allowed_actions
+            )
+            if prepared_service is None:
+                return None
+            service_plan, client = prepared_service
+
+            started = time.perf_counter()
+            try:
+                return self.service_analyzed(
+                    aws_service,
+                    await self.run_service_plan_async(service_plan, client),
+                )
+            finally:
+                self.service_durations[aws_service] = time.perf_counter() - started
+
+    def service_plan(self, aws_service, allowed_actions) -> ServicePlan:
+        plan = self.options.plan
+        if plan is not None and aws_service in plan.services:
+            return plan.services[aws_service]
+        return plan_service(OPERATION_CATALOG.service(aws_service), allowed_actions)
+
+    @all_exception
+    # pylint: disable=too-many-arguments
     def retrieve_operation_resources(
         self,
         resource_type,
@@ -347,6 +538,46 @@ class AllResources(ResourceProvider):
     ) -> List[Resource]:
         if operation_parameters is None:
             operation_parameters = {}
+        try:
+            return self.list_operation_resources(
+                resource_type,
+                operation_name,
+                has_paginator,
+                client,
+                service_full_name,
+                aws_service,
+                operation_parameters,
+            )
+        except ClientError as e:
+            if (
+                "Filters" not in operation_parameters
+                or e.response.get("Error", {}).get("Code") not in INVALID_FILTER_ERRORS
+            ):
+                raise
+        # operation rejects the pushed down tag filters, list everything and filter afterwards
+        operation_parameters = dict(operation_parameters)
+        del operation_parameters["Filters"]
+        return self.list_operation_resources(
+            resource_type,
+            operation_name,
+            has_paginator,
+            client,
+            service_full_name,
+            aws_service,
+            operation_parameters,
+        )
+
+    # pylint: disable=too-many-locals,too-many-arguments
+    def list_operation_resources(
+        self,
+        resource_type,
+        operation_name,
+        has_paginator,
+        client,
+        service_full_name,
+        aws_service,
+        operation_parameters,
+    ) -> List[Resource]:
         resources = []
         snake_operation_name = _to_snake_case(operation_name)
         # pylint: disable=too-many-nested-blocks
@@ -377,38 +608,36 @@ class AllResources(ResourceProvider):
                 return []
             for page in pages:
                 if result_key == "Reservations":  # hack for EC2 instances
-                    for page_reservation in page["Reservations"]:
-                        for instance in page_reservation["Instances"]:
-                            resource = build_resource(
-                                instance, operation_name, resource_type, aws_service
-                            )
-                            if resource is not None:
-                                resources.append(resource)
+                    instances = [
+                        instance
+                        for page_reservation in page["Reservations"]
+                        for instance in page_reservation["Instances"]
+                    ]
+                    resources.extend(
+                        build_resources(
+                            instances, operation_name, resource_type, aws_service
+                        )
+                    )
                 if result_key is not None:
                     page_resources = page[result_key]
                 elif result_child in page[result_parent]:
                     page_resources = page[result_parent][result_child]
                 else:
                     page_resources = []
-                for page_resource in page_resources:
-                    resource = build_resource(
-                        page_resource, operation_name, resource_type, aws_service
+                resources.extend(
+                    build_resources(
+                        page_resources, operation_name, resource_type, aws_service
                     )
-                    if resource is not None:
-                        resources.append(resource)
+                )
         else:
             response = getattr(client, snake_operation_name)(**operation_parameters)
             for response_field, response_elem in response.items():
                 if isinstance(response_elem, list):
-                    for response_resource in response_elem:
-                        resource = build_resource(
-                            response_resource,
-                            operation_name,
-                            resource_type,
-                            aws_service,
+                    resources.extend(
+                        build_resources(
+                            response_elem, operation_name, resource_type, aws_service
                         )
-                        if resource is not None:
-                            resources.append(resource)
+                    )
                 elif response_field != "ResponseMetadata":
                     resource = build_resource(
                         response_elem, operation_name, resource_type, aws_service,
@@ -420,133 +649,233 @@ class AllResources(ResourceProvider):
     def get_policies_allowed_actions(self):
         if self.options.verbose:
             message_handler("Fetching allowed actions...", "HEADER")
-        iam_client = self.options.client("iam")
-        view_only_document = get_policy_allowed_calls(
-            iam_client, "arn:aws:iam::aws:policy/job-function/ViewOnlyAccess"
-        )
-        sec_audit_document = get_policy_allowed_calls(
-            iam_client, "arn:aws:iam::aws:policy/SecurityAudit"
-        )
-
-        allowed_actions = {}
-        for action in view_only_document["Statement"][0]["Action"]:
-            allowed_actions[action] = True
-        for action in sec_audit_document["Statement"][0]["Action"]:
-            allowed_actions[action] = True
-        for action in ON_TOP_POLICIES:
-            allowed_actions[action] = True
+        allowed_actions = fetch_allowed_actions(self.options.client("iam"))
         if self.options.verbose:
             message_handler(
                 "Found {} allowed actions".format(len(allowed_actions)), "HEADER"
             )
 
-        return allowed_actions.keys()
+        return allowed_actions
 
-    # pylint: disable=too-many-arguments
-    def check_required_field(
+    def operation_wanted(self, planned_operation: PlannedOperation) -> bool:
+        return (
+            self.type_pushdown is None
+            or planned_operation.resource_type in self.type_pushdown
+        )
+
+    def operation_parameters(
+        self, planned_operation: PlannedOperation, service_plan: ServicePlan
+    ) -> Dict:
+        operation_parameters = dict()
+        if (
+            service_plan.service_name == "ec2"
+            and self.ec2_tag_pushdown is not None
+            and planned_operation.supports_tag_filters
+        ):
+            operation_parameters["Filters"] = self.ec2_tag_pushdown
+        return operation_parameters
+
+    def list_permutation(
         self,
-        required_field,
-        service_model,
-        pagination_model,
-        aws_service,
-        allowed_actions,
+        planned_operation: PlannedOperation,
+        service_plan: ServicePlan,
         client,
-        service_full_name,
-    ):
-        method = None
-        operation = None
-        for operation_name, service_operation in service_model["operations"].items():
-            if operation_name.lower().startswith("list" + required_field[:-1].lower()):
-                method = operation_name
-                operation = service_operation
-        if method is None:
+        parameter_permutation: Dict,
+    ) -> List[Resource]:
+        checkpoint = self.options.checkpoint
+        unit = (
+            "operation",
+            self.options.region_name,
+            service_plan.service_name,
+            planned_operation.name,
+            repr(sorted(parameter_permutation.items())),
+        )
+        if checkpoint is not None:
+            permutation_resources = checkpoint.result(*unit)
+            if permutation_resources is not MISSING:
+                return permutation_resources
+
+        permutation_resources = self.retrieve_operation_resources(
+            planned_operation.resource_type,
+            planned_operation.name,
+            planned_operation.has_paginator,
+            client,
+            service_plan.service_full_name,
+            service_plan.service_name,
+            parameter_permutation,
+        )
+        if permutation_resources is None:
             return []
+        if checkpoint is not None and checkpoint.operations:
+            checkpoint.complete(*unit, result=permutation_resources)
+        return permutation_resources
 
-        has_paginator = method in pagination_model
-        resource_type = build_resource_type(aws_service, method)
-        if resource_type in OMITTED_RESOURCES:
-            return []
-        if not operation_allowed(allowed_actions, aws_service, method):
-            return []
+    def dependent_permutations(
+        self,
+        planned_operation: PlannedOperation,
+        service_plan: ServicePlan,
+        parent_resources: List[Resource],
+    ) -> List[Dict]:
+        operation_parameters = {
+            parameter_name: [parameter_value]
+            for parameter_name, parameter_value in self.operation_parameters(
+                planned_operation, service_plan
+            ).items()
+        }
+        operation_parameters[planned_operation.required_field] = [
+            resource.digest.id for resource in parent_resources
+        ]
+        return permutate_parameters(operation_parameters)
+
+    def shares_root_listing(
+        self, parent_operation: PlannedOperation, service_plan: ServicePlan, root_names
+    ) -> bool:
+        # the parent is listed anyway and unfiltered, its listing can be shared
+        return parent_operation.name in root_names and not self.operation_parameters(
+            parent_operation, service_plan
+        )
 
-        if "input" in operation:
-            input_model = service_model["shapes"][operation["input"]["shape"]]
-            required_fields = operation_required_fields(
-                aws_service, input_model, operation
-            )
-            if required_fields:
-                return []
+    def run_service_plan(
+        self, service_plan: ServicePlan, client, scheduler: OperationScheduler
+    ) -> List[Resource]:
+        """
+        Runs the operations of a service as a dependency graph
 
-        operation_resources = self.retrieve_operation_resources(
-            resource_type,
-            method,
-            has_paginator,
-            client,
-            service_full_name,
-            aws_service,
-        )
-        required_field_ids = []
+        Every parent operation is listed once, its ids are shared by all operations requiring them, and the
+        permutations of dependent operations are listed concurrently.
+        """
+        operations = service_plan.operations
+        parent_names = {
+            planned_operation.parent_operation
+            for planned_operation in operations.values()
+            if planned_operation.parent_operation is not None
+            and self.operation_wanted(planned_operation)
+        }
+        resources = []
 
-        for resource in operation_resources:
-            required_field_ids.append(resource.digest.id)
+        root_listings = dict()
+        for planned_operation in operations.values():
+            if planned_operation.required_field is None and (
+                self.operation_wanted(planned_operation)
+            ):
+                root_listings[planned_operation.name] = scheduler.submit(
+                    self.list_permutation,
+                    planned_operation,
+                    service_plan,
+                    client,
+                    self.operation_parameters(planned_operation, service_plan),
+                )
 
-        return required_field_ids
+        parent_listings = dict()
+        for parent_name in parent_names:
+            parent_operation = operations[parent_name]
+            if self.shares_root_listing(parent_operation, service_plan, root_listings):
+                parent_listings[parent_name] = root_listings[parent_name]
+            else:
+                parent_listings[parent_name] = scheduler.submit(
+                    self.list_permutation,
+                    parent_operation,
+                    service_plan,
+                    client,
+                    dict(),
+                )
 
-    # pylint: disable=too-many-locals,too-many-arguments
-    def analyze_listing_operation(
-        self,
-        name,
-        paginators_model,
-        aws_service,
-        allowed_actions,
-        operation,
-        service_model,
-        client,
-        service_full_name,
-    ) -> List[Resource]:
-        operation_resources: List[Resource] = []
+        dependent_listings = []
+        for planned_operation in operations.values():
+            if planned_operation.required_field is None or not (
+                self.operation_wanted(planned_operation)
+            ):
+                continue
+            for parameter_permutation in self.dependent_permutations(
+                planned_operation,
+                service_plan,
+                parent_listings[planned_operation.parent_operation].result(),
+            ):
+                dependent_listings.append(
+                    scheduler.submit(
+                        self.list_permutation,
+                        planned_operation,
+                        service_plan,
+                        client,
+                        parameter_permutation,
+                    )
+                )
 
-        has_paginator = name in paginators_model["pagination"]
-        resource_type = build_resource_type(aws_service, name)
-        if resource_type in OMITTED_RESOURCES:
-            return operation_resources
-        if not operation_allowed(allowed_actions, aws_service, name):
-            return operation_resources
+        for listing in itertools.chain(root_listings.values(), dependent_listings):
+            resources.extend(listing.result())
 
-        operation_parameters = dict()
-        if "input" in operation:
-            input_model = service_model["shapes"][operation["input"]["shape"]]
-            required_fields = operation_required_fields(
-                aws_service, input_model, operation
-            )
+        return resources
 
-            if len(required_fields) == 1:
-                required_field = required_fields[0]
-                required_field_values = self.check_required_field(
-                    required_field,
-                    service_model,
-                    paginators_model["pagination"],
-                    aws_service,
-                    allowed_actions,
+    async def run_service_plan_async(
+        self, service_plan: ServicePlan, client
+    ) -> List[Resource]:
+        """
+        Same dependency graph as run_service_plan, with tasks instead of futures
+        """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max(1, self.options.operation_parallelism))
+        operations = service_plan.operations
+
+        async def list_permutation(planned_operation, parameter_permutation):
+            async with slots:
+                return await loop.run_in_executor(
+                    None,
+                    self.list_permutation,
+                    planned_operation,
+                    service_plan,
                     client,
-                    service_full_name,
+                    parameter_permutation,
                 )
-                operation_parameters[required_field] = required_field_values
-            elif len(required_fields) != 0:
-                return operation_resources
 
-        parameters_permutation = permutate_parameters(operation_parameters)
+        root_listings = dict()
+        for planned_operation in operations.values():
+            if planned_operation.required_field is None and (
+                self.operation_wanted(planned_operation)
+            ):
+                root_listings[planned_operation.name] = asyncio.ensure_future(
+                    list_permutation(
+                        planned_operation,
+                        self.operation_parameters(planned_operation, service_plan),
+                    )
+                )
 
-        for parameter_permutation in parameters_permutation:
-            permutation_resources = self.retrieve_operation_resources(
-                resource_type,
-                name,
-                has_paginator,
-                client,
-                service_full_name,
-                aws_service,
-                parameter_permutation,
+        dependent_operations = [
+            planned_operation
+            for planned_operation in operations.values()
+            if planned_operation.required_field is not None
+            and self.operation_wanted(planned_operation)
+        ]
+
+        parent_listings = dict()
+        for planned_operation in dependent_operations:
+            parent_name = planned_operation.parent_operation
+            if parent_name in parent_listings:
+                continue
+            parent_operation = operations[parent_name]
+            if self.shares_root_listing(parent_operation, service_plan, root_listings):
+                parent_listings[parent_name] = root_listings[parent_name]
+            else:
+                parent_listings[parent_name] = asyncio.ensure_future(
+                    list_permutation(parent_operation, dict())
+                )
+
+        async def list_dependent(planned_operation):
+            parent_resources = await parent_listings[planned_operation.parent_operation]
+            permutations_resources = await asyncio.gather(
+                *[
+                    list_permutation(planned_operation, parameter_permutation)
+                    for parameter_permutation in self.dependent_permutations(
+                        planned_operation, service_plan, parent_resources
+                    )
+                ]
             )
-            if permutation_resources is not None:
-                operation_resources.extend(permutation_resources)
-        return operation_resources
+            return list(itertools.chain.from_iterable(permutations_resources))
+
+        listings = await asyncio.gather(
+            *root_listings.values(),
+            *[
+                list_dependent(planned_operation)
+                for planned_operation in dependent_operations
+            ],
+        )
+        return list(itertools.chain.from_iterable(listings))
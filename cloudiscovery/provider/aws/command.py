@@ -1,10 +1,23 @@
-from provider.aws.all.command import All
-from provider.aws.common_aws import generate_session, aws_verbose
+from provider.aws.all.command import All, AllPlan, DEFAULT_OPERATION_PARALLELISM
+from provider.aws.common_aws import (
+    generate_session,
+    aws_verbose,
+    DEFAULT_REGION_PARALLELISM,
+    get_client,
+)
 from provider.aws.iot.command import Iot
-from provider.aws.limit.command import Limit
+from provider.aws.limit.command import Limit, DEFAULT_LIMIT_PARALLELISM
+from provider.aws.limit.monitor import (
+    MonitorOptions,
+    DEFAULT_METRICS_ADDRESS,
+    DEFAULT_METRICS_PORT,
+    DEFAULT_MONITOR_INTERVAL,
+)
 from provider.aws.policy.command import Policy
 from provider.aws.security.command import Security
 from provider.aws.vpc.command import Vpc
+from shared.checkpoint import CHECKPOINT_OFF
+from shared.command import ASYNCIO_BACKEND
 from shared.common import (
     exit_critical,
     message_handler,
@@ -51,7 +64,7 @@ def check_region(region_parameter, region_name, session, partition_code):
     if partition_code != "aws":
         return [region_name]
 
-    client = session.client("ec2", region_name=DEFAULT_REGION)
+    client = get_client(session, "ec2", DEFAULT_REGION)
 
     valid_region_names = [
         region["RegionName"]
@@ -107,6 +120,10 @@ def aws_main(args) -> BaseCommand:
             partition_code=partition_code,
         )
 
+    region_parallelism = parse_count_option(
+        args, "region_parallelism", DEFAULT_REGION_PARALLELISM, 1, "Region parallelism"
+    )
+
     if "threshold" in args:
         if args.threshold is not None:
             if args.threshold.isdigit() is False:
@@ -121,10 +138,14 @@ def aws_main(args) -> BaseCommand:
             region_names=region_names,
             session=session,
             partition_code=partition_code,
+            region_parallelism=region_parallelism,
         )
     elif args.command == "aws-policy":
         command = Policy(
-            region_names=region_names, session=session, partition_code=partition_code
+            region_names=region_names,
+            session=session,
+            partition_code=partition_code,
+            region_parallelism=region_parallelism,
         )
     elif args.command == "aws-iot":
         command = Iot(
@@ -132,17 +153,23 @@ def aws_main(args) -> BaseCommand:
             region_names=region_names,
             session=session,
             partition_code=partition_code,
+            region_parallelism=region_parallelism,
         )
     elif args.command == "aws-all":
-        command = All(
-            region_names=region_names, session=session, partition_code=partition_code
+        command = all_command(
+            args, region_names, session, partition_code, region_parallelism
         )
-    elif args.command == "aws-limit":
-        command = Limit(
-            region_names=region_names,
+    elif args.command == "aws-all-plan":
+        command = AllPlan(
             session=session,
-            threshold=args.threshold,
-            partition_code=partition_code,
+            region_name=region_names[0],
+            plan_file=args.plan_file,
+            diff_file=args.diff,
+            show=args.show,
+        )
+    elif args.command == "aws-limit":
+        command = limit_command(
+            args, region_names, session, partition_code, region_parallelism
         )
     elif args.command == "aws-security":
         command = Security(
@@ -150,7 +177,97 @@ def aws_main(args) -> BaseCommand:
             session=session,
             commands=args.commands,
             partition_code=partition_code,
+            region_parallelism=region_parallelism,
         )
     else:
         raise NotImplementedError("Unknown command")
     return command
+
+
+def parse_count_option(args, option: str, default: int, minimum: int, name: str) -> int:
+    if option not in args or getattr(args, option) is None:
+        return default
+    if getattr(args, option) < minimum:
+        exit_critical("{} must be {} or higher".format(name, minimum))
+    return getattr(args, option)
+
+
+def all_command(args, region_names, session, partition_code, region_parallelism) -> All:
+    if args.backend == ASYNCIO_BACKEND and args.streaming:
+        exit_critical("The asyncio backend can't be used with --streaming")
+    if args.resume and args.checkpoint == CHECKPOINT_OFF:
+        exit_critical("--resume can't be used with --checkpoint off")
+
+    return All(
+        region_names=region_names,
+        session=session,
+        partition_code=partition_code,
+        region_parallelism=region_parallelism,
+        streaming=args.streaming,
+        plan_file=args.plan,
+        operation_parallelism=parse_count_option(
+            args,
+            "operation_parallelism",
+            DEFAULT_OPERATION_PARALLELISM,
+            1,
+            "Operation parallelism",
+        ),
+        backend=args.backend,
+        incremental=args.incremental,
+        resume=args.resume,
+        checkpoint=args.checkpoint,
+    )
+
+
+def limit_command(
+    args, region_names, session, partition_code, region_parallelism
+) -> Limit:
+    monitor_options = None
+    if args.monitor:
+        monitor_options = parse_monitor_options(args)
+
+    return Limit(
+        region_names=region_names,
+        session=session,
+        threshold=args.threshold,
+        partition_code=partition_code,
+        region_parallelism=region_parallelism,
+        parallelism=parse_count_option(
+            args,
+            "quota_parallelism",
+            DEFAULT_LIMIT_PARALLELISM,
+            1,
+            "Quota parallelism",
+        ),
+        monitor_options=monitor_options,
+    )
+
+
+def parse_monitor_options(args) -> MonitorOptions:
+    interval = DEFAULT_MONITOR_INTERVAL
+    if args.interval is not None:
+        if args.interval < 1:
+            exit_critical("Interval must be 1 second or higher")
+        interval = args.interval
+
+    port = DEFAULT_METRICS_PORT
+    if args.metrics_port is not None:
+        if args.metrics_port < 0 or args.metrics_port > 65535:
+            exit_critical("Metrics port must be between 0 and 65535")
+        port = args.metrics_port
+
+    quota_intervals = dict()
+    for quota_interval in args.quota_interval or []:
+        quota_code, _, seconds = quota_interval.partition("=")
+        if not quota_code or not seconds.isdigit() or int(seconds) < 1:
+            exit_critical(
+                "Quota interval must be QUOTA_CODE=SECONDS, e.g. L-1216C47A=60"
+            )
+        quota_intervals[quota_code] = int(seconds)
+
+    return MonitorOptions(
+        address=args.metrics_address or DEFAULT_METRICS_ADDRESS,
+        port=port,
+        interval=interval,
+        quota_intervals=quota_intervals,
+    )
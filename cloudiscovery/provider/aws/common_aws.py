@@ -1,11 +1,18 @@
-from typing import List, Dict, Optional
+import functools
+import json
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable, Tuple
 
 import boto3
 import botocore.exceptions
 from boto3 import Session
+from botocore.config import Config
 from cachetools import TTLCache
 
-from shared.command import CommandRunner
+from shared.command import CommandRunner, THREADS_BACKEND
+from shared.snapshot import Snapshot
 from shared.common import (
     ResourceCache,
     message_handler,
@@ -16,6 +23,34 @@ from shared.common import (
 
 SUBNET_CACHE = TTLCache(maxsize=1024, ttl=60)
 
+DEFAULT_REGION_PARALLELISM = 4
+MAX_API_CALLS_IN_FLIGHT = 80
+
+CLIENT_MAX_ATTEMPTS = 10
+INITIAL_CALL_RATE = 20.0
+MIN_CALL_RATE = 1.0
+MAX_CALL_RATE = 200.0
+CALL_RATE_INCREASE = 0.5
+CALL_RATE_DECREASE = 0.5
+THROTTLING_ERROR_CODES = frozenset(
+    [
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestThrottledException",
+        "TooManyRequestsException",
+        "ProvisionedThroughputExceededException",
+        "TransactionInProgressException",
+        "RequestLimitExceeded",
+        "BandwidthLimitExceeded",
+        "LimitExceededException",
+        "RequestThrottled",
+        "SlowDown",
+        "PriorRequestNotComplete",
+        "EC2ThrottledException",
+    ]
+)
+
 
 def describe_subnet(vpc_options, subnet_ids):
     if not isinstance(subnet_ids, list):
@@ -33,6 +68,266 @@ def describe_subnet(vpc_options, subnet_ids):
         return None
 
 
+class ClientPool:
+    def __init__(self):
+        """
+        Process-wide pool with one boto3 client per (service, region, session)
+
+        Building a client loads the service model and endpoint resolver, so clients are created once and shared.
+        Clients are thread-safe, sessions are not, so creation happens under a lock.
+        """
+        self.clients = dict()
+        self.lock = threading.Lock()
+        self.clients_created = 0
+
+    def client(self, session: boto3.Session, service_name: str, region_name: str):
+        # session identifies the credentials, refreshable credentials are handled by the client itself
+        key = (service_name, region_name, session)
+        client = self.clients.get(key)
+        if client is not None:
+            return client
+
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = session.client(
+                    service_name,
+                    region_name=region_name,
+                    # max_attempts counts retries only
+                    config=Config(
+                        retries={
+                            "max_attempts": CLIENT_MAX_ATTEMPTS - 1,
+                            "mode": "standard",
+                        }
+                    ),
+                )
+                RATE_LIMITERS.limiter(service_name, region_name).register(client)
+                API_CALL_BUDGET.guard(client)
+                self.clients[key] = client
+                self.clients_created = self.clients_created + 1
+        return client
+
+    def clear(self):
+        with self.lock:
+            self.clients = dict()
+            self.clients_created = 0
+
+
+CLIENT_POOL = ClientPool()
+
+
+def get_client(session: boto3.Session, service_name: str, region_name: str):
+    return CLIENT_POOL.client(session, service_name, region_name)
+
+
+class AccountIdCache:
+    def __init__(self):
+        """
+        Caller identity resolved once per session, every region and provider reuses it
+        """
+        self.account_ids = dict()
+        self.lock = threading.Lock()
+
+    def account_id(self, session: boto3.Session, region_name: str) -> str:
+        account_id = self.account_ids.get(session)
+        if account_id is not None:
+            return account_id
+
+        # lock held during the call, so parallel regions wait for one STS round trip
+        with self.lock:
+            account_id = self.account_ids.get(session)
+            if account_id is None:
+                client = get_client(session, "sts", region_name)
+                account_id = client.get_caller_identity()["Account"]
+                self.account_ids[session] = account_id
+        return account_id
+
+
+ACCOUNT_ID_CACHE = AccountIdCache()
+
+INVENTORY_OPERATION_PREFIXES = ("describe_", "list_", "get_")
+
+
+class RegionInventory:
+    def __init__(self):
+        """
+        Region-scoped store of read-only API responses
+
+        Identical calls (e.g. describe_instances, list_buckets, get_bucket_policy) are made once per region and
+        every VPC analyzed in that region filters the shared result, instead of listing the region again.
+        Calls of VPC_PARTITIONED_OPERATIONS filtered by a single VPC are served from one region-wide listing
+        split by VPC. Client errors are stored as well, so e.g. buckets without a policy are not asked again.
+        """
+        self.responses = dict()
+        self.key_locks = dict()
+        self.lock = threading.Lock()
+        self.calls_made = 0
+        self.calls_reused = 0
+
+    def call(self, key, fetch):
+        if key not in self.responses:
+            with self.lock:
+                key_lock = self.key_locks.setdefault(key, threading.Lock())
+            # concurrent providers asking for the same listing wait for the first call
+            with key_lock:
+                if key not in self.responses:
+                    try:
+                        self.responses[key] = (fetch(), None)
+                    except botocore.exceptions.ClientError as e:
+                        self.responses[key] = (None, e)
+                    with self.lock:
+                        self.calls_made = self.calls_made + 1
+                else:
+                    with self.lock:
+                        self.calls_reused = self.calls_reused + 1
+        else:
+            with self.lock:
+                self.calls_reused = self.calls_reused + 1
+
+        response, error = self.responses[key]
+        if error is not None:
+            raise error
+        return response
+
+
+def item_vpc_ids(item) -> List[str]:
+    return [item["VpcId"]] if "VpcId" in item else []
+
+
+def attachment_vpc_ids(item) -> List[str]:
+    return [
+        attachment["VpcId"]
+        for attachment in item.get("Attachments", [])
+        if "VpcId" in attachment
+    ]
+
+
+# listings filtered by VPC: operation -> (VPC filter name, result key, VPC ids of a listed item)
+VPC_PARTITIONED_OPERATIONS = {
+    "describe_internet_gateways": (
+        "attachment.vpc-id",
+        "InternetGateways",
+        attachment_vpc_ids,
+    ),
+    "describe_nat_gateways": ("vpc-id", "NatGateways", item_vpc_ids),
+    "describe_network_acls": ("vpc-id", "NetworkAcls", item_vpc_ids),
+    "describe_route_tables": ("vpc-id", "RouteTables", item_vpc_ids),
+    "describe_security_groups": ("vpc-id", "SecurityGroups", item_vpc_ids),
+    "describe_subnets": ("vpc-id", "Subnets", item_vpc_ids),
+    "describe_vpc_endpoints": ("vpc-id", "VpcEndpoints", item_vpc_ids),
+}
+
+
+def filtered_vpc_id(operation_name: str, kwargs) -> Optional[str]:
+    """
+    VPC of a call filtered by nothing but a single VPC, None if the call can't be served from a partition
+    """
+    if operation_name not in VPC_PARTITIONED_OPERATIONS or list(kwargs) != ["Filters"]:
+        return None
+    filters = kwargs["Filters"]
+    if (
+        len(filters) != 1
+        or filters[0].get("Name") != VPC_PARTITIONED_OPERATIONS[operation_name][0]
+        or len(filters[0].get("Values", [])) != 1
+    ):
+        return None
+    return filters[0]["Values"][0]
+
+
+def partition_by_vpc(items, vpc_ids) -> Dict[str, List]:
+    partitions = dict()
+    for item in items:
+        for vpc_id in vpc_ids(item):
+            partitions.setdefault(vpc_id, []).append(item)
+    return partitions
+
+
+def inventory_key(service_name, operation_name, kwargs):
+    return (
+        service_name,
+        operation_name,
+        json.dumps(kwargs, sort_keys=True, default=str),
+    )
+
+
+class InventoryPaginator:
+    def __init__(self, paginator, service_name, operation_name, inventory):
+        self.paginator = paginator
+        self.service_name = service_name
+        self.operation_name = operation_name
+        self.inventory = inventory
+
+    def paginate(self, **kwargs):
+        return self.inventory.call(
+            inventory_key(self.service_name, "paginate_" + self.operation_name, kwargs),
+            lambda: list(self.paginator.paginate(**kwargs)),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.paginator, name)
+
+
+class InventoryClient:
+    def __init__(self, client, service_name: str, inventory: RegionInventory):
+        """
+        Client proxy that serves read-only operations from a RegionInventory
+
+        :param client:
+        :param service_name:
+        :param inventory:
+        """
+        self.client = client
+        self.service_name = service_name
+        self.inventory = inventory
+
+    def get_paginator(self, operation_name):
+        return InventoryPaginator(
+            self.client.get_paginator(operation_name),
+            self.service_name,
+            operation_name,
+            self.inventory,
+        )
+
+    def vpc_partition(self, operation_name: str, vpc_id: str):
+        _, result_key, vpc_ids = VPC_PARTITIONED_OPERATIONS[operation_name]
+        partitions = self.inventory.call(
+            inventory_key(self.service_name, operation_name, {"partition": "vpc"}),
+            lambda: partition_by_vpc(
+                self.list_region(operation_name, result_key), vpc_ids
+            ),
+        )
+        return {result_key: list(partitions.get(vpc_id, []))}
+
+    def list_region(self, operation_name: str, result_key: str) -> List:
+        if self.client.can_paginate(operation_name):
+            pages = self.client.get_paginator(operation_name).paginate()
+            return [item for page in pages for item in page[result_key]]
+        return getattr(self.client, operation_name)()[result_key]
+
+    def is_inventory_operation(self, name: str) -> bool:
+        # only API operations, not helpers such get_waiter or generate_presigned_url
+        return (
+            name.startswith(INVENTORY_OPERATION_PREFIXES)
+            and name in self.client.meta.method_to_api_mapping
+        )
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not self.is_inventory_operation(name):
+            return attribute
+
+        def inventory_call(**kwargs):
+            vpc_id = filtered_vpc_id(name, kwargs)
+            if vpc_id is not None:
+                return self.vpc_partition(name, vpc_id)
+            return self.inventory.call(
+                inventory_key(self.service_name, name, kwargs),
+                lambda: attribute(**kwargs),
+            )
+
+        return inventory_call
+
+
 def aws_verbose():
     """
     Boto3 only provides usable information in DEBUG mode
@@ -45,27 +340,35 @@ def aws_verbose():
 class BaseAwsOptions:
     session: boto3.Session
     region_name: str
+    inventory: Optional[RegionInventory]
 
-    def __init__(self, session, region_name):
+    def __init__(self, session, region_name, inventory=None):
         """
         Base AWS options
 
         :param session:
         :param region_name:
+        :param inventory: shared region inventory, read-only calls are served from it when informed
         """
         self.session = session
         self.region_name = region_name
+        self.inventory = inventory
 
     def client(self, service_name: str):
-        return self.session.client(service_name, region_name=self.region_name)
+        client = get_client(self.session, service_name, self.region_name)
+        if self.inventory is None:
+            return client
+        return InventoryClient(client, service_name, self.inventory)
+
+    @property
+    def account_id(self) -> str:
+        return ACCOUNT_ID_CACHE.account_id(self.session, self.region_name)
 
     def resulting_file_name(self, suffix):
-        return "{}_{}_{}".format(self.account_number(), self.region_name, suffix)
+        return "{}_{}_{}".format(self.account_id, self.region_name, suffix)
 
     def account_number(self):
-        client = self.session.client("sts", region_name=self.region_name)
-        account_id = client.get_caller_identity()["Account"]
-        return account_id
+        return self.account_id
 
 
 class GlobalParameters:
@@ -93,7 +396,7 @@ class GlobalParameters:
                 ),
                 "HEADER",
             )
-            self.client = self.session.client("ssm", region_name="us-east-1")
+            self.client = get_client(self.session, "ssm", "us-east-1")
             paths = self.parameters()
             for path in paths:
                 paths_found.append(path["Value"])
@@ -138,18 +441,250 @@ class GlobalParameters:
         return self.client.get_parameters_by_path(**params)
 
 
+class ApiCallBudget:
+    def __init__(self, size: int):
+        """
+        Bounded number of AWS API calls in flight, shared by every region worker
+
+        A slot is held while a request is on the wire: it is taken after the endpoint rate limiter gave its token and
+        released after every attempt, so calls waiting for their token or a retry backoff don't hold one.
+        Nested calls made by a thread that already holds a slot are not counted again.
+
+        :param size:
+        """
+        self.size = size
+        self.semaphore = threading.BoundedSemaphore(size)
+        self.local = threading.local()
+
+    # pylint: disable=unused-argument
+    def acquire(self, **kwargs):
+        depth = getattr(self.local, "depth", 0)
+        if depth == 0:
+            self.semaphore.acquire()
+        self.local.depth = depth + 1
+
+    # pylint: disable=unused-argument
+    def release(self, **kwargs):
+        depth = getattr(self.local, "depth", 0)
+        if depth == 0:
+            return
+        self.local.depth = depth - 1
+        if depth == 1:
+            self.semaphore.release()
+
+    def unwind(self, depth: int):
+        """
+        Releases what a call acquired and did not release, e.g. when it failed between before-call and after-call
+        """
+        while getattr(self.local, "depth", 0) > depth:
+            self.release()
+
+    def guard(self, client):
+        make_api_call = client._make_api_call  # pylint: disable=protected-access
+
+        @functools.wraps(make_api_call)
+        def guarded_api_call(operation_name, api_params):
+            depth = getattr(self.local, "depth", 0)
+            try:
+                return make_api_call(operation_name, api_params)
+            finally:
+                self.unwind(depth)
+
+        client._make_api_call = guarded_api_call  # pylint: disable=protected-access
+
+    def register(self, session: boto3.Session):
+        # Clients copy session handlers when created, so register before any provider builds a client.
+        # Rate limiters are registered first on before-send, the slot is taken once their token is available.
+        session.events.register(
+            "before-send", self.acquire, unique_id="cloudiscovery-budget-acquire"
+        )
+        # needs-retry is emitted after every attempt, before the retry backoff
+        session.events.register(
+            "needs-retry", self.release, unique_id="cloudiscovery-budget-release"
+        )
+
+
+API_CALL_BUDGET = ApiCallBudget(MAX_API_CALLS_IN_FLIGHT)
+
+
+def is_throttling_response(response) -> bool:
+    if response is None:
+        return False
+    http_response, parsed_response = response
+    if http_response is not None and http_response.status_code == 429:
+        return True
+    error_code = parsed_response.get("Error", {}).get("Code")
+    return error_code in THROTTLING_ERROR_CODES
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        rate: float = INITIAL_CALL_RATE,
+        min_rate: float = MIN_CALL_RATE,
+        max_rate: float = MAX_CALL_RATE,
+    ):
+        """
+        Token bucket for the calls to one service endpoint, adapted to throttling (AIMD)
+
+        Every successful call adds CALL_RATE_INCREASE calls per second, a throttled call halves the rate.
+        Callers reserve their token and sleep outside of the lock until it is available.
+
+        :param rate: calls per second
+        :param min_rate:
+        :param max_rate:
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.retried = 0
+        self.failed = 0
+
+    def delay(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = self.tokens - 1
+            self.calls = self.calls + 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    # pylint: disable=unused-argument
+    def acquire(self, **kwargs):
+        wait = self.delay()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + CALL_RATE_INCREASE)
+
+    def on_throttle(self, attempts: int):
+        with self.lock:
+            self.throttled = self.throttled + 1
+            if attempts < CLIENT_MAX_ATTEMPTS:
+                self.retried = self.retried + 1
+            else:
+                self.failed = self.failed + 1
+            now = time.monotonic()
+            # concurrent calls are throttled together, decrease once per second
+            if now - self.last_decrease >= 1:
+                self.rate = max(self.min_rate, self.rate * CALL_RATE_DECREASE)
+                self.last_decrease = now
+
+    # pylint: disable=unused-argument
+    def observe(self, response=None, attempts=1, **kwargs):
+        if is_throttling_response(response):
+            self.on_throttle(attempts)
+        elif response is not None:
+            self.on_success()
+
+    def register(self, client):
+        # before-send is emitted for every attempt, so retries take their token too
+        client.meta.events.register_first(
+            "before-send", self.acquire, unique_id="cloudiscovery-rate-acquire"
+        )
+        # first, so every attempt is observed before the retry handler answers
+        client.meta.events.register_first(
+            "needs-retry", self.observe, unique_id="cloudiscovery-rate-observe"
+        )
+
+
+class RateLimiterRegistry:
+    def __init__(self):
+        """
+        One AdaptiveRateLimiter per (service, region), shared by every client of that endpoint
+        """
+        self.limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = dict()
+        self.lock = threading.Lock()
+
+    def limiter(self, service_name: str, region_name: str) -> AdaptiveRateLimiter:
+        key = (service_name, region_name)
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveRateLimiter()
+                self.limiters[key] = limiter
+        return limiter
+
+    def throttled_endpoints(self) -> List[Tuple[Tuple[str, str], AdaptiveRateLimiter]]:
+        with self.lock:
+            return sorted(
+                [
+                    (key, limiter)
+                    for key, limiter in self.limiters.items()
+                    if limiter.throttled > 0
+                ],
+                key=lambda item: -item[1].throttled,
+            )
+
+    def report(self):
+        for (service_name, region_name), limiter in self.throttled_endpoints():
+            message_handler(
+                "Throttling on {} in {}: {} calls, {} throttled, {} retried, {} given up, "
+                "rate adapted to {:.1f} calls/s".format(
+                    service_name,
+                    region_name,
+                    limiter.calls,
+                    limiter.throttled,
+                    limiter.retried,
+                    limiter.failed,
+                    limiter.rate,
+                ),
+                "WARNING" if limiter.failed > 0 else "OKBLUE",
+            )
+
+
+RATE_LIMITERS = RateLimiterRegistry()
+
+
 class BaseAwsCommand(BaseCommand):
-    def __init__(self, region_names, session, partition_code):
+    def __init__(
+        self,
+        region_names,
+        session,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+    ):
         """
         Base class for discovery command
 
         :param region_names:
         :param session:
         :param partition_code:
+        :param region_parallelism:
         """
         self.region_names: List[str] = region_names
         self.session: Session = session
         self.partition_code: str = partition_code
+        self.region_parallelism: int = max(1, region_parallelism)
+        API_CALL_BUDGET.register(session)
+
+    def run_regions(self, region_runner: Callable[[str], None]):
+        """
+        Runs region_runner for every region, fanning regions out over a bounded worker pool.
+
+        All workers share API_CALL_BUDGET, so more regions don't multiply the calls in flight.
+        Throttled endpoints are reported once all regions are done.
+        """
+        workers = min(self.region_parallelism, len(self.region_names))
+        if workers <= 1:
+            for region in self.region_names:
+                region_runner(region)
+        else:
+            with ThreadPoolExecutor(workers) as executor:
+                # consume results to propagate exceptions raised by any region
+                for _ in executor.map(region_runner, self.region_names):
+                    pass
+        RATE_LIMITERS.report()
 
     def run(
         self,
@@ -252,7 +787,9 @@ def get_tag(d, tag_name) -> Optional[str]:
 
 def generate_session(profile_name, region_name):
     try:
-        return boto3.Session(profile_name=profile_name, region_name=region_name)
+        session = boto3.Session(profile_name=profile_name, region_name=region_name)
+        API_CALL_BUDGET.register(session)
+        return session
     # pylint: disable=broad-except
     except Exception as e:
         message = "You must configure awscli before use this script.\nError: {0}".format(
@@ -281,10 +818,19 @@ def get_paginator(client, operation_name, resource_type, filters=None):
 
 
 class AwsCommandRunner(CommandRunner):
-    def __init__(self, filters: List[Filterable] = None):
+    def __init__(
+        self,
+        filters: List[Filterable] = None,
+        streaming: bool = False,
+        backend: str = THREADS_BACKEND,
+        snapshot: Optional[Snapshot] = None,
+    ):
         """
         AWS command execution
 
         :param filters:
+        :param streaming:
+        :param backend:
+        :param snapshot:
         """
-        super().__init__("aws", filters)
+        super().__init__("aws", filters, streaming, backend, snapshot)
@@ -1,6 +1,12 @@
 from typing import List
 
-from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
+from provider.aws.common_aws import (
+    BaseAwsOptions,
+    BaseAwsCommand,
+    AwsCommandRunner,
+    DEFAULT_REGION_PARALLELISM,
+    get_client,
+)
 from provider.aws.iot.diagram import IoTDiagram
 from shared.common import ResourceDigest, Filterable, BaseOptions
 from shared.diagram import NoDiagram, BaseDiagram
@@ -21,7 +27,14 @@ class IotOptions(BaseAwsOptions, BaseOptions):
 
 class Iot(BaseAwsCommand):
     # pylint: disable=too-many-arguments
-    def __init__(self, thing_name, region_names, session, partition_code):
+    def __init__(
+        self,
+        thing_name,
+        region_names,
+        session,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+    ):
         """
         Iot command
 
@@ -29,8 +42,9 @@ class Iot(BaseAwsCommand):
         :param region_names:
         :param session:
         :param partition_code:
+        :param region_parallelism:
         """
-        super().__init__(region_names, session, partition_code)
+        super().__init__(region_names, session, partition_code, region_parallelism)
         self.thing_name = thing_name
 
     def run(
@@ -42,56 +56,68 @@ class Iot(BaseAwsCommand):
     ):
         command_runner = AwsCommandRunner(filters)
 
-        for region_name in self.region_names:
-            self.init_region_cache(region_name)
+        self.run_regions(
+            lambda region: self.run_region(
+                region, diagram, verbose, filters, command_runner
+            )
+        )
+
+    # pylint: disable=too-many-arguments
+    def run_region(
+        self,
+        region_name: str,
+        diagram: bool,
+        verbose: bool,
+        filters: List[Filterable],
+        command_runner: AwsCommandRunner,
+    ):
+        self.init_region_cache(region_name)
 
-            # if thing_name is none, get all things and check
-            if self.thing_name is None:
-                client = self.session.client("iot", region_name=region_name)
-                things = client.list_things()
-                thing_options = IotOptions(
-                    verbose=verbose,
-                    filters=filters,
-                    session=self.session,
-                    region_name=region_name,
-                    thing_name=things,
-                )
-                diagram_builder: BaseDiagram
-                if diagram:
-                    diagram_builder = IoTDiagram(thing_name="")
-                else:
-                    diagram_builder = NoDiagram()
-                command_runner.run(
-                    provider="iot",
-                    options=thing_options,
-                    diagram_builder=diagram_builder,
-                    title="AWS IoT Resources - Region {}".format(region_name),
-                    filename=thing_options.resulting_file_name("iot"),
-                )
+        # if thing_name is none, get all things and check
+        if self.thing_name is None:
+            client = get_client(self.session, "iot", region_name)
+            things = client.list_things()
+            thing_options = IotOptions(
+                verbose=verbose,
+                filters=filters,
+                session=self.session,
+                region_name=region_name,
+                thing_name=things,
+            )
+            diagram_builder: BaseDiagram
+            if diagram:
+                diagram_builder = IoTDiagram(thing_name="")
             else:
-                things = dict()
-                things["things"] = [{"thingName": self.thing_name}]
-                thing_options = IotOptions(
-                    verbose=verbose,
-                    filters=filters,
-                    session=self.session,
-                    region_name=region_name,
-                    thing_name=things,
-                )
+                diagram_builder = NoDiagram()
+            command_runner.run(
+                provider="iot",
+                options=thing_options,
+                diagram_builder=diagram_builder,
+                title="AWS IoT Resources - Region {}".format(region_name),
+                filename=thing_options.resulting_file_name("iot"),
+            )
+        else:
+            things = dict()
+            things["things"] = [{"thingName": self.thing_name}]
+            thing_options = IotOptions(
+                verbose=verbose,
+                filters=filters,
+                session=self.session,
+                region_name=region_name,
+                thing_name=things,
+            )
 
-                if diagram:
-                    diagram_builder = IoTDiagram(thing_name=self.thing_name)
-                else:
-                    diagram_builder = NoDiagram()
+            if diagram:
+                diagram_builder = IoTDiagram(thing_name=self.thing_name)
+            else:
+                diagram_builder = NoDiagram()
 
-                command_runner.run(
-                    provider="iot",
-                    options=thing_options,
-                    diagram_builder=diagram_builder,
-                    title="AWS IoT {} Resources - Region {}".format(
-                        self.thing_name, region_name
-                    ),
-                    filename=thing_options.resulting_file_name(
-                        self.thing_name + "_iot"
-                    ),
-                )
+            command_runner.run(
+                provider="iot",
+                options=thing_options,
+                diagram_builder=diagram_builder,
+                title="AWS IoT {} Resources - Region {}".format(
+                    self.thing_name, region_name
+                ),
+                filename=thing_options.resulting_file_name(self.thing_name + "_iot"),
+            )
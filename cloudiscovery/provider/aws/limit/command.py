@@ -1,6 +1,13 @@
-from typing import List
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import List, Optional, Dict, Set
 
-from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
+from provider.aws.common_aws import (
+    BaseAwsOptions,
+    BaseAwsCommand,
+    AwsCommandRunner,
+    DEFAULT_REGION_PARALLELISM,
+    get_client,
+)
 from provider.aws.limit.data.allowed_resources import (
     ALLOWED_SERVICES_CODES,
     SPECIAL_RESOURCES,
@@ -14,10 +21,20 @@ from shared.common import (
 )
 from shared.diagram import NoDiagram
 
+# 15 days
+LIMITS_CACHE_EXPIRE = 1296000
+DEFAULT_LIMIT_PARALLELISM = 16
+
+
+def limits_cache_key(service_code: str, region: str) -> str:
+    return "aws_limits_" + service_code + "_" + region
+
 
 class LimitOptions(BaseAwsOptions, BaseOptions):
     services: List[str]
     threshold: str
+    parallelism: int
+    quota_codes: Optional[Set[str]]
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -28,11 +45,16 @@ class LimitOptions(BaseAwsOptions, BaseOptions):
         region_name,
         services,
         threshold,
+        parallelism: int = DEFAULT_LIMIT_PARALLELISM,
+        quota_codes: Optional[Set[str]] = None,
     ):
         BaseAwsOptions.__init__(self, session, region_name)
         BaseOptions.__init__(self, verbose, filters)
         self.services = services
         self.threshold = threshold
+        self.parallelism = parallelism
+        # None checks every quota of the services
+        self.quota_codes = quota_codes
 
 
 class LimitParameters:
@@ -56,80 +78,101 @@ class LimitParameters:
         AWS has global limit that can be adjustable and others that can't be adjustable
         This method make cache for 15 days for aws cache global parameters. AWS don't update limit every time.
         Services has differents limit, depending on region.
+        Default quotas of a service are listed in one pass, services are fetched in parallel.
         """
-        for service_code in self.services:
-            if service_code in ALLOWED_SERVICES_CODES:
-                cache_key = "aws_limits_" + service_code + "_" + self.region
+        service_codes = [
+            service_code
+            for service_code in self.services
+            if service_code in ALLOWED_SERVICES_CODES
+            and self.cache.get_key(limits_cache_key(service_code, self.region)) is None
+        ]
+        with ThreadPoolExecutor(self.options.parallelism) as executor:
+            # consume results to propagate exceptions
+            for _ in executor.map(self.cache_service_quotas, service_codes):
+                pass
 
-                cache = self.cache.get_key(cache_key)
-                if cache is not None:
-                    continue
+        return True
 
-                if self.options.verbose:
-                    message_handler(
-                        "Fetching aws global limit to service {} in region {} to cache...".format(
-                            service_code, self.region
-                        ),
-                        "HEADER",
-                    )
+    def cache_service_quotas(self, service_code):
+        if self.options.verbose:
+            message_handler(
+                "Fetching aws global limit to service {} in region {} to cache...".format(
+                    service_code, self.region
+                ),
+                "HEADER",
+            )
 
-                cache_codes = dict()
-                for quota_code in ALLOWED_SERVICES_CODES[service_code]:
-
-                    if quota_code != "global":
-                        """
-                        Impossible to instance once at __init__ method.
-                        Global services such route53 MUST USE us-east-1 region
-                        """
-                        if ALLOWED_SERVICES_CODES[service_code]["global"]:
-                            service_quota = self.session.client(
-                                "service-quotas", region_name="us-east-1"
-                            )
-                        else:
-                            service_quota = self.session.client(
-                                "service-quotas", region_name=self.region
-                            )
-
-                        item_to_add = self.get_quota(
-                            quota_code, service_code, service_quota
-                        )
-                        if item_to_add is None:
-                            continue
+        # Global services such route53 MUST USE us-east-1 region
+        if ALLOWED_SERVICES_CODES[service_code]["global"]:
+            service_quota = get_client(self.session, "service-quotas", "us-east-1")
+        else:
+            service_quota = get_client(self.session, "service-quotas", self.region)
 
-                        if service_code in cache_codes:
-                            cache_codes[service_code].append(item_to_add)
-                        else:
-                            cache_codes[service_code] = [item_to_add]
+        default_quotas = self.list_default_quotas(service_code, service_quota)
+        if default_quotas is None:
+            return
 
-                self.cache.set_key(key=cache_key, value=cache_codes, expire=1296000)
+        cache_codes = dict()
+        for quota_code in ALLOWED_SERVICES_CODES[service_code]:
+            if quota_code == "global":
+                continue
+            if quota_code not in default_quotas:
+                if self.options.verbose:
+                    log_critical(
+                        "\nCannot take quota {} for {}: not listed by AWS".format(
+                            quota_code, service_code
+                        )
+                    )
+                continue
+            quota = default_quotas[quota_code]
+            item_to_add = {
+                "value": quota["Value"],
+                "adjustable": quota["Adjustable"],
+                "quota_code": quota_code,
+                "quota_name": quota["QuotaName"],
+            }
+            if service_code in cache_codes:
+                cache_codes[service_code].append(item_to_add)
+            else:
+                cache_codes[service_code] = [item_to_add]
 
-        return True
+        self.cache.set_key(
+            key=limits_cache_key(service_code, self.region),
+            value=cache_codes,
+            expire=LIMITS_CACHE_EXPIRE,
+        )
 
-    def get_quota(self, quota_code, service_code, service_quota):
+    def list_default_quotas(self, service_code, service_quota) -> Optional[Dict]:
+        quotas = dict()
         try:
-            response = service_quota.get_aws_default_service_quota(
-                ServiceCode=service_code, QuotaCode=quota_code
-            )
+            pages = service_quota.get_paginator(
+                "list_aws_default_service_quotas"
+            ).paginate(ServiceCode=service_code)
+            for page in pages:
+                for quota in page["Quotas"]:
+                    quotas[quota["QuotaCode"]] = quota
         # pylint: disable=broad-except
         except Exception as e:
             if self.options.verbose:
                 log_critical(
-                    "\nCannot take quota {} for {}: {}".format(
-                        quota_code, service_code, str(e)
-                    )
+                    "\nCannot list quotas for {}: {}".format(service_code, str(e))
                 )
             return None
-        item_to_add = {
-            "value": response["Quota"]["Value"],
-            "adjustable": response["Quota"]["Adjustable"],
-            "quota_code": quota_code,
-            "quota_name": response["Quota"]["QuotaName"],
-        }
-        return item_to_add
+        return quotas
 
 
 class Limit(BaseAwsCommand):
-    def __init__(self, region_names, session, threshold, partition_code):
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        region_names,
+        session,
+        threshold,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+        parallelism=DEFAULT_LIMIT_PARALLELISM,
+        monitor_options=None,
+    ):
         """
         All AWS resources
 
@@ -137,9 +180,14 @@ class Limit(BaseAwsCommand):
         :param session:
         :param threshold:
         :param partition_code:
+        :param region_parallelism:
+        :param parallelism: quota listings of a region running at the same time
+        :param monitor_options: MonitorOptions to keep monitoring quotas instead of reporting them once
         """
-        super().__init__(region_names, session, partition_code)
+        super().__init__(region_names, session, partition_code, region_parallelism)
         self.threshold = threshold
+        self.parallelism = parallelism
+        self.monitor_options = monitor_options
 
     def init_globalaws_limits_cache(self, region, services, options: LimitOptions):
         # Cache services global and local services
@@ -161,25 +209,49 @@ class Limit(BaseAwsCommand):
             for service in SPECIAL_RESOURCES:
                 services.append(service)
 
-        for region in self.region_names:
-            limit_options = LimitOptions(
+        if self.monitor_options is not None:
+            # pylint: disable=import-outside-toplevel,cyclic-import
+            from provider.aws.limit.monitor import LimitMonitor
+
+            LimitMonitor(
+                command=self,
                 verbose=verbose,
-                filters=filters,
-                session=self.session,
-                region_name=region,
                 services=services,
-                threshold=self.threshold,
-            )
-            self.init_globalaws_limits_cache(
-                region=region, services=services, options=limit_options
-            )
+                filters=filters,
+                options=self.monitor_options,
+            ).run()
+            return
 
-            command_runner = AwsCommandRunner()
-            command_runner.run(
-                provider="limit",
-                options=limit_options,
-                diagram_builder=NoDiagram(),
-                title="AWS Limits - Region {}".format(region),
-                # pylint: disable=no-member
-                filename=limit_options.resulting_file_name("limit"),
-            )
+        self.run_regions(
+            lambda region: self.run_region(region, verbose, services, filters)
+        )
+
+    def run_region(
+        self,
+        region: str,
+        verbose: bool,
+        services: List[str],
+        filters: List[Filterable],
+    ):
+        limit_options = LimitOptions(
+            verbose=verbose,
+            filters=filters,
+            session=self.session,
+            region_name=region,
+            services=services,
+            threshold=self.threshold,
+            parallelism=self.parallelism,
+        )
+        self.init_globalaws_limits_cache(
+            region=region, services=services, options=limit_options
+        )
+
+        command_runner = AwsCommandRunner()
+        command_runner.run(
+            provider="limit",
+            options=limit_options,
+            diagram_builder=NoDiagram(),
+            title="AWS Limits - Region {}".format(region),
+            # pylint: disable=no-member
+            filename=limit_options.resulting_file_name("limit"),
+        )
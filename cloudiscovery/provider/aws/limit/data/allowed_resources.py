@@ -8,6 +8,7 @@ JSON Format to check quota
             "fields": "xxx",
             "divisor": xxx,
             "filter": {xxx},
+            "interval": xxx,
         },
         "global": True|False,
     }
@@ -40,10 +41,54 @@ filter:
     - Example: "filter": {"Filters": [{"Name": "", "Values": [],}]},
     - Example: "filter": {"Type": "PullRequest"},
 
+additional_filters:
+    - Filters of more listings counted by the quota, e.g. when a filter needs more than 200 values
+    - Listings with the same method and filter run once for every quota counting them
+
+interval:
+    - Seconds between two evaluations of the quota by aws-limit --monitor, if not the --interval
+    - For quotas whose usage changes fast, such running instances
+
 global:
     - Global parameter determines if this is an AWS Global Service such IAM, Route53, others.
 """
 
+FILTER_EC2_BIGFAMILY = {
+    "filter": {
+        "Filters": [
+            {
+                "Name": "instance-type",
+                "Values": [
+                    "a1.medium",
+                    "a1.large",
+                    "a1.xlarge",
+                    "a1.2xlarge",
+                    "a1.4xlarge",
+                    "a1.metal",
+                    "c6g.medium",
+                    "c6g.large",
+                    "c6g.xlarge",
+                    "c6g.2xlarge",
+                    "c6g.4xlarge",
+                    "c6g.8xlarge",
+                    "c6g.12xlarge",
+                    "c6g.16xlarge",
+                    "c6g.metal",
+                    "c5.large",
+                    "c5.xlarge",
+                    "c5.2xlarge",
+                    "c5.4xlarge",
+                    "c5.9xlarge",
+                    "c5.12xlarge",
+                    "c5.18xlarge",
+                    "c5.24xlarge",
+                    "c5.metal",
+                ],
+            }
+        ]
+    },
+}
+
 ALLOWED_SERVICES_CODES = {
     "acm": {
         "L-F141DD1D": {
@@ -557,6 +602,10 @@ ALLOWED_SERVICES_CODES = {
                     }
                 ]
             },
+            # boto3 filters take at most 200 values, big family instance types are counted by a second listing
+            "additional_filters": [FILTER_EC2_BIGFAMILY["filter"]],
+            # running instances come and go with autoscaling, monitored more often than the other quotas
+            "interval": 60,
         },
         "L-7295265B": {
             "method": "describe_instances",
@@ -1164,39 +1213,3 @@ ALLOWED_SERVICES_CODES = {
 
 # These resources are not covered by services-quota, than we must use "manual" checks
 SPECIAL_RESOURCES = ["ses"]
-
-FILTER_EC2_BIGFAMILY = {
-    "filter": {
-        "Filters": [
-            {
-                "Name": "instance-type",
-                "Values": [
-                    "a1.medium",
-                    "a1.large",
-                    "a1.xlarge",
-                    "a1.2xlarge",
-                    "a1.4xlarge",
-                    "a1.metal",
-                    "c6g.medium",
-                    "c6g.large",
-                    "c6g.xlarge",
-                    "c6g.2xlarge",
-                    "c6g.4xlarge",
-                    "c6g.8xlarge",
-                    "c6g.12xlarge",
-                    "c6g.16xlarge",
-                    "c6g.metal",
-                    "c5.large",
-                    "c5.xlarge",
-                    "c5.2xlarge",
-                    "c5.4xlarge",
-                    "c5.9xlarge",
-                    "c5.12xlarge",
-                    "c5.18xlarge",
-                    "c5.24xlarge",
-                    "c5.metal",
-                ],
-            }
-        ]
-    },
-}
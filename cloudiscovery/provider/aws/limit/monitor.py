@@ -0,0 +1,340 @@
+import collections
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Dict, List, Optional, Set, Tuple
+
+from provider.aws.limit.command import Limit, LimitOptions
+from provider.aws.limit.data.allowed_resources import (
+    ALLOWED_SERVICES_CODES,
+    SPECIAL_RESOURCES,
+)
+from provider.aws.limit.resource.all import LimitResources
+from provider.aws.limit.resource.ses import SesResources
+from shared.common import Resource, LimitsValues, Filterable, message_handler
+from shared.error_handler import exception
+
+DEFAULT_METRICS_ADDRESS = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9464
+# 5 minutes
+DEFAULT_MONITOR_INTERVAL = 300
+# shortest sleep between two evaluations, so a failing region doesn't spin
+MIN_MONITOR_WAIT = 1
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRICS_PREFIX = "cloudiscovery_limit_"
+
+# quota codes of the resources reported by SPECIAL_RESOURCES
+SPECIAL_QUOTA_CODES = {"ses": "ses-send-quota"}
+
+# metric name, help, LimitsValues field
+QUOTA_METRICS = [
+    ("usage", "Resources counted against the quota.", "usage"),
+    ("usage_percent", "Usage in percent of the applied quota.", "percent"),
+    ("applied", "Quota applied to the account.", "local_limit"),
+    ("default", "AWS default quota.", "aws_limit"),
+]
+
+
+class MonitorOptions(NamedTuple):
+    address: str
+    port: int
+    interval: int
+    quota_intervals: Dict[str, int]
+
+
+def service_quota_codes(service: str) -> List[str]:
+    if service in SPECIAL_RESOURCES:
+        return [SPECIAL_QUOTA_CODES.get(service, service)]
+    return [
+        quota_code
+        for quota_code in ALLOWED_SERVICES_CODES.get(service, {})
+        if quota_code != "global"
+    ]
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value) -> str:
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class QuotaSchedule:
+    def __init__(self, default_interval: int, quota_intervals: Dict[str, int]):
+        """
+        Next evaluation of every quota of every region
+
+        A quota is evaluated every quota_intervals[quota_code] seconds, else every "interval" of its
+        definition in ALLOWED_SERVICES_CODES, else every default_interval. Quotas not evaluated yet are due.
+
+        :param default_interval:
+        :param quota_intervals:
+        """
+        self.default_interval = default_interval
+        self.quota_intervals = quota_intervals
+        self.next_evaluations: Dict[Tuple[str, str], float] = dict()
+        self.lock = threading.Lock()
+
+    def interval(self, service: str, quota_code: str) -> int:
+        if quota_code in self.quota_intervals:
+            return self.quota_intervals[quota_code]
+        quota_data = ALLOWED_SERVICES_CODES.get(service, {}).get(quota_code)
+        if isinstance(quota_data, dict) and "interval" in quota_data:
+            return quota_data["interval"]
+        return self.default_interval
+
+    def due(self, region: str, services: List[str], now: float) -> Dict[str, Set[str]]:
+        """
+        Quota codes of each service due in region at now
+        """
+        due_quotas: Dict[str, Set[str]] = collections.defaultdict(set)
+        with self.lock:
+            for service in services:
+                for quota_code in service_quota_codes(service):
+                    if self.next_evaluations.get((region, quota_code), 0) <= now:
+                        due_quotas[service].add(quota_code)
+        return dict(due_quotas)
+
+    def evaluated(self, region: str, due_quotas: Dict[str, Set[str]], now: float):
+        with self.lock:
+            for service, quota_codes in due_quotas.items():
+                for quota_code in quota_codes:
+                    self.next_evaluations[(region, quota_code)] = now + self.interval(
+                        service, quota_code
+                    )
+
+    def next_evaluation(self) -> Optional[float]:
+        with self.lock:
+            if not self.next_evaluations:
+                return None
+            return min(self.next_evaluations.values())
+
+
+class LimitMetrics:
+    def __init__(self):
+        """
+        Last LimitsValues of every quota of every region, rendered as OpenMetrics
+        """
+        self.values: Dict[Tuple[str, str], LimitsValues] = dict()
+        self.evaluated_at: Dict[Tuple[str, str], float] = dict()
+        self.evaluation_seconds: Dict[str, float] = dict()
+        self.lock = threading.Lock()
+
+    # pylint: disable=too-many-arguments
+    def update(
+        self,
+        region: str,
+        due_quotas: Dict[str, Set[str]],
+        resources: List[Resource],
+        evaluated_at: float,
+        duration: float,
+    ):
+        """
+        Replaces the values of the evaluated quotas of region, quotas under the threshold are dropped
+        """
+        quota_codes = set().union(*due_quotas.values())
+        with self.lock:
+            for key in [key for key in self.values if key[0] == region]:
+                if key[1] in quota_codes:
+                    del self.values[key]
+                    del self.evaluated_at[key]
+            for resource in resources:
+                if resource.limits is None:
+                    continue
+                key = (region, resource.limits.quota_code)
+                self.values[key] = resource.limits
+                self.evaluated_at[key] = evaluated_at
+            self.evaluation_seconds[region] = duration
+
+    def render(self) -> str:
+        with self.lock:
+            values = sorted(self.values.items())
+            evaluated_at = dict(self.evaluated_at)
+            evaluation_seconds = sorted(self.evaluation_seconds.items())
+
+        lines = []
+        for metric, help_text, field in QUOTA_METRICS:
+            name = METRICS_PREFIX + metric
+            lines.append("# TYPE {} gauge".format(name))
+            lines.append("# HELP {} {}".format(name, help_text))
+            for (region, _), limits in values:
+                lines.append(
+                    "{}{{{}}} {}".format(
+                        name,
+                        self.quota_labels(region, limits),
+                        format_value(getattr(limits, field)),
+                    )
+                )
+
+        name = METRICS_PREFIX + "last_evaluation_timestamp_seconds"
+        lines.append("# TYPE {} gauge".format(name))
+        lines.append("# HELP {} Time the quota was last evaluated.".format(name))
+        for key, limits in values:
+            lines.append(
+                "{}{{{}}} {}".format(
+                    name,
+                    self.quota_labels(key[0], limits),
+                    format_value(evaluated_at[key]),
+                )
+            )
+
+        name = METRICS_PREFIX + "evaluation_duration_seconds"
+        lines.append("# TYPE {} gauge".format(name))
+        lines.append(
+            "# HELP {} Duration of the last evaluation of a region.".format(name)
+        )
+        for region, duration in evaluation_seconds:
+            lines.append(
+                '{}{{region="{}"}} {}'.format(
+                    name, escape_label(region), format_value(duration)
+                )
+            )
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def quota_labels(region: str, limits: LimitsValues) -> str:
+        return ",".join(
+            '{}="{}"'.format(label, escape_label(value))
+            for label, value in [
+                ("region", region),
+                ("service", limits.service),
+                ("quota_code", limits.quota_code),
+                ("quota_name", limits.quota_name),
+            ]
+        )
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format, *args):
+        # scrapes every few seconds would flood the output
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    def __init__(self, address: str, port: int, metrics: LimitMetrics):
+        """
+        Serves metrics on http://address:port/metrics
+
+        :param address:
+        :param port:
+        :param metrics:
+        """
+        super().__init__((address, port), MetricsHandler)
+        self.metrics = metrics
+
+
+class LimitMonitor:
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        command: Limit,
+        verbose: bool,
+        services: List[str],
+        filters: List[Filterable],
+        options: MonitorOptions,
+    ):
+        """
+        Re-evaluates quotas of all regions on schedule and exports them as OpenMetrics
+
+        The process keeps sessions, client pools and the cached default quotas between evaluations,
+        only usages and applied quotas are listed again.
+
+        :param command:
+        :param verbose:
+        :param services:
+        :param filters:
+        :param options:
+        """
+        self.command = command
+        self.verbose = verbose
+        self.services = services
+        self.filters = filters
+        self.options = options
+        self.schedule = QuotaSchedule(options.interval, options.quota_intervals)
+        self.metrics = LimitMetrics()
+
+    @exception
+    def evaluate_region(self, region: str):
+        due_quotas = self.schedule.due(region, self.services, time.time())
+        if not due_quotas:
+            return
+
+        services = list(due_quotas)
+        limit_options = LimitOptions(
+            verbose=self.verbose,
+            filters=self.filters,
+            session=self.command.session,
+            region_name=region,
+            services=services,
+            threshold=self.command.threshold,
+            parallelism=self.command.parallelism,
+            quota_codes=set().union(*due_quotas.values()),
+        )
+        started = time.perf_counter()
+        try:
+            self.command.init_globalaws_limits_cache(
+                region=region, services=services, options=limit_options
+            )
+            resources = []
+            for provider in [
+                LimitResources(limit_options),
+                SesResources(limit_options),
+            ]:
+                provider_resources = provider.get_resources()
+                if provider_resources is not None:
+                    resources.extend(provider_resources)
+            self.metrics.update(
+                region=region,
+                due_quotas=due_quotas,
+                resources=resources,
+                evaluated_at=time.time(),
+                duration=time.perf_counter() - started,
+            )
+        finally:
+            # failed evaluations are retried next interval, last values stay exported
+            self.schedule.evaluated(region, due_quotas, time.time())
+
+    def wait_time(self) -> float:
+        next_evaluation = self.schedule.next_evaluation()
+        if next_evaluation is None:
+            return self.options.interval
+        return max(MIN_MONITOR_WAIT, next_evaluation - time.time())
+
+    def run(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        server = MetricsServer(self.options.address, self.options.port, self.metrics)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        message_handler(
+            "Serving limit metrics on http://{}:{}/metrics".format(
+                self.options.address, server.server_address[1]
+            ),
+            "HEADER",
+        )
+        try:
+            while not stop.is_set():
+                self.command.run_regions(self.evaluate_region)
+                stop.wait(self.wait_time())
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -1,20 +1,29 @@
+import time
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import List
+from typing import List, Dict
 
-from provider.aws.common_aws import get_paginator
-from provider.aws.limit.command import LimitOptions
+from botocore.exceptions import ClientError
+
+from provider.aws.common_aws import get_client
+from provider.aws.limit.command import LimitOptions, limits_cache_key
 from provider.aws.limit.data.allowed_resources import (
     ALLOWED_SERVICES_CODES,
-    FILTER_EC2_BIGFAMILY,
     SPECIAL_RESOURCES,
 )
+from provider.aws.limit.scheduler import ServiceScheduler
+from provider.aws.limit.usage import (
+    QuotaUsage,
+    SharedListing,
+    UsageListing,
+    group_listings,
+    collect_listing,
+)
 from shared.common import (
     ResourceProvider,
     Resource,
-    ResourceDigest,
     message_handler,
     ResourceCache,
-    LimitsValues,
+    log_critical,
 )
 from shared.error_handler import exception
 
@@ -27,7 +36,9 @@ SERVICEQUOTA_TO_BOTO3 = {
     "ebs": "ec2",
 }
 
-MAX_EXECUTION_PARALLEL = 2
+# tasks of a single service running at the same time
+SERVICE_PARALLELISM = 4
+REPORTED_SLOWEST_SERVICES = 3
 
 
 class LimitResources(ResourceProvider):
@@ -42,7 +53,6 @@ class LimitResources(ResourceProvider):
         self.cache = ResourceCache()
 
     @exception
-    # pylint: disable=too-many-locals
     def get_resources(self) -> List[Resource]:
 
         threshold_requested = (
@@ -51,36 +61,80 @@ class LimitResources(ResourceProvider):
 
         client_quota = self.options.client("service-quotas")
 
-        resources_found = []
+        quota_usages: List[QuotaUsage] = []
 
         services = self.options.services
 
-        with ThreadPoolExecutor(MAX_EXECUTION_PARALLEL) as executor:
-            results = executor.map(
-                lambda service_name: self.analyze_service(
-                    service_name=service_name,
-                    client_quota=client_quota,
-                    threshold_requested=int(threshold_requested),
-                ),
-                services,
-            )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.options.parallelism) as executor:
+            scheduler = ServiceScheduler(executor, SERVICE_PARALLELISM)
+            futures = [
+                scheduler.submit(
+                    service_name, self.analyze_service, service_name, client_quota
+                )
+                for service_name in services
+            ]
+            for future in futures:
+                result = future.result()
+                if result is not None:
+                    quota_usages.extend(result)
+
+            # quotas counting the same listing share a single execution of it,
+            # scheduled under the quota service code as analyze_service, e.g. ebs and not ec2
+            futures = [
+                scheduler.submit(
+                    shared_listing.quota_service,
+                    self.collect_usage,
+                    listing,
+                    shared_listing,
+                )
+                for listing, shared_listing in group_listings(quota_usages).items()
+            ]
+            for future in futures:
+                future.result()
+        self.report_durations(scheduler, time.perf_counter() - started)
 
-        for result in results:
-            if result is not None:
-                resources_found.extend(result)
+        resources_found = []
+        for quota_usage in quota_usages:
+            resource_found = quota_usage.resource(int(threshold_requested))
+            if resource_found is not None:
+                resources_found.append(resource_found)
 
         return resources_found
 
+    def report_durations(self, scheduler: ServiceScheduler, duration: float):
+        slowest_services = scheduler.slowest_services(len(scheduler.durations))
+        if not slowest_services:
+            return
+        message_handler(
+            "Region {}: quotas checked in {:.1f}s, slowest services {}".format(
+                self.options.region_name,
+                duration,
+                ", ".join(
+                    "{} {:.1f}s".format(service, service_duration)
+                    for service, service_duration in slowest_services[
+                        :REPORTED_SLOWEST_SERVICES
+                    ]
+                ),
+            ),
+            "HEADER",
+        )
+        if self.options.verbose:
+            for service, service_duration in slowest_services:
+                message_handler(
+                    "{}: {:.1f}s".format(service, service_duration), "OKBLUE"
+                )
+
     @exception
-    def analyze_service(self, service_name, client_quota, threshold_requested):
+    def analyze_service(self, service_name, client_quota):
 
         if service_name in SPECIAL_RESOURCES:
             return []
 
-        cache_key = "aws_limits_" + service_name + "_" + self.options.region_name
+        cache_key = limits_cache_key(service_name, self.options.region_name)
         cache = self.cache.get_key(cache_key)
-        resources_found = []
-        if service_name not in cache:
+        quota_usages = []
+        if cache is None or service_name not in cache:
             return []
 
         """
@@ -96,41 +150,69 @@ class LimitResources(ResourceProvider):
                 "WARNING",
             )
 
+        applied_quotas = dict()
+        if any(
+            bool(data_quota_code["adjustable"])
+            for data_quota_code in cache[service_name]
+            if data_quota_code is not None
+        ):
+            applied_quotas = self.applied_quotas(service_name, client_quota)
+
         for data_quota_code in cache[service_name]:
             if data_quota_code is None:
                 continue
-            resource_found = self.analyze_quota(
-                client_quota=client_quota,
+            if (
+                self.options.quota_codes is not None
+                and data_quota_code["quota_code"] not in self.options.quota_codes
+            ):
+                continue
+            quota_usage = self.analyze_quota(
+                applied_quotas=applied_quotas,
                 data_quota_code=data_quota_code,
                 service=service_name,
-                threshold_requested=threshold_requested,
             )
-            if resource_found is not None:
-                resources_found.append(resource_found)
-        return resources_found
+            if quota_usage is not None:
+                quota_usages.append(quota_usage)
+        return quota_usages
+
+    @staticmethod
+    def applied_quotas(service_name, client_quota) -> Dict[str, float]:
+        """
+        Applied values of the quotas of a service, listed in one pass
+
+        When they can't be listed, e.g. throttling or access denied, default values are used.
+        """
+        applied_quotas = dict()
+        try:
+            pages = client_quota.get_paginator("list_service_quotas").paginate(
+                ServiceCode=service_name
+            )
+            for page in pages:
+                for quota in page["Quotas"]:
+                    if "Value" in quota:
+                        applied_quotas[quota["QuotaCode"]] = quota["Value"]
+        except client_quota.exceptions.NoSuchResourceException:
+            pass
+        except ClientError as e:
+            log_critical(
+                "\nCannot list applied quotas for {}, using default values: {}".format(
+                    service_name, str(e)
+                )
+            )
+            return dict()
+        return applied_quotas
 
     @exception
-    # pylint: disable=too-many-locals,too-many-statements
-    def analyze_quota(
-        self, client_quota, data_quota_code, service, threshold_requested
-    ):
-        resource_found = None
+    def analyze_quota(self, applied_quotas, data_quota_code, service) -> QuotaUsage:
         quota_data = ALLOWED_SERVICES_CODES[service][data_quota_code["quota_code"]]
 
         value_aws = value = data_quota_code["value"]
 
         # Quota is adjustable by ticket request, then must override this values.
         if bool(data_quota_code["adjustable"]) is True:
-            try:
-                response_quota = client_quota.get_service_quota(
-                    ServiceCode=service, QuotaCode=data_quota_code["quota_code"]
-                )
-                if "Value" in response_quota["Quota"]:
-                    value = response_quota["Quota"]["Value"]
-                else:
-                    value = data_quota_code["value"]
-            except client_quota.exceptions.NoSuchResourceException:
-                value = data_quota_code["value"]
+            value = applied_quotas.get(
+                data_quota_code["quota_code"], data_quota_code["value"]
+            )
 
         if self.options.verbose:
             message_handler(
@@ -142,6 +224,7 @@ class LimitResources(ResourceProvider):
                 "HEADER",
             )
 
+        quota_service = service
         # Need to convert some quota-services endpoint
         if service in SERVICEQUOTA_TO_BOTO3:
             service = SERVICEQUOTA_TO_BOTO3.get(service)
@@ -156,88 +239,17 @@ class LimitResources(ResourceProvider):
         else:
             region_boto3 = self.options.region_name
 
-        client = self.options.session.client(service, region_name=region_boto3)
-
-        usage = 0
-
-        # Check filters by resource
-        if "filter" in quota_data:
-            filters = quota_data["filter"]
-        else:
-            filters = None
-
-        pages = get_paginator(
-            client=client,
-            operation_name=quota_data["method"],
-            resource_type="aws_limit",
-            filters=filters,
+        return QuotaUsage(
+            data_quota_code=data_quota_code,
+            quota_data=quota_data,
+            service=service,
+            region=region_boto3,
+            value_aws=value_aws,
+            value=value,
+            quota_service=quota_service,
         )
 
-        if not pages:
-            if filters:
-                response = getattr(client, quota_data["method"])(**filters)
-            else:
-                response = getattr(client, quota_data["method"])()
-
-            # If fields element is not empty, sum values instead list len
-            if quota_data["fields"]:
-                for item in response[quota_data["method"]]:
-                    usage = usage + item[quota_data["fields"]]
-            else:
-                usage = len(response[quota_data["key"]])
-        else:
-            for page in pages:
-                if quota_data["fields"]:
-                    if len(page[quota_data["key"]]) > 0:
-                        usage = usage + page[quota_data["key"]][0][quota_data["fields"]]
-                else:
-                    usage = usage + len(page[quota_data["key"]])
-
-        # Value for division
-        if "divisor" in quota_data:
-            usage = usage / quota_data["divisor"]
-
-        """
-        Hack to workaround boto3 limits of 200 items per filter.
-        Quota L-1216C47A needs more than 200 items. Not happy with this code
-        TODO: Refactor this piece of terrible code.
-        """
-        if data_quota_code["quota_code"] == "L-1216C47A":
-            filters = FILTER_EC2_BIGFAMILY["filter"]
-            pages = get_paginator(
-                client=client,
-                operation_name=quota_data["method"],
-                resource_type="aws_limit",
-                filters=filters,
-            )
-            if not pages:
-                response = getattr(client, quota_data["method"])(**filters)
-                usage = len(response[quota_data["key"]])
-            else:
-                for page in pages:
-                    usage = usage + len(page[quota_data["key"]])
-
-        try:
-            percent = round((usage / value) * 100, 2)
-        except ZeroDivisionError:
-            percent = 0
-
-        if percent >= threshold_requested:
-            resource_found = Resource(
-                digest=ResourceDigest(
-                    id=data_quota_code["quota_code"], type="aws_limit"
-                ),
-                name="",
-                group="",
-                limits=LimitsValues(
-                    quota_name=data_quota_code["quota_name"],
-                    quota_code=data_quota_code["quota_code"],
-                    aws_limit=int(value_aws),
-                    local_limit=int(value),
-                    usage=int(usage),
-                    service=service,
-                    percent=percent,
-                ),
-            )
-
-        return resource_found
+    @exception
+    def collect_usage(self, listing: UsageListing, shared_listing: SharedListing):
+        client = get_client(self.options.session, listing.service, listing.region)
+        collect_listing(client, listing, shared_listing)
@@ -0,0 +1,69 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Dict, Deque, List, Tuple
+
+
+class ServiceScheduler:
+    def __init__(self, executor: ThreadPoolExecutor, service_parallelism: int):
+        """
+        Runs tasks on a shared executor, at most service_parallelism tasks of the same service at a time
+
+        Tasks over the cap wait in a queue of their service instead of holding the submitter or a worker,
+        so a slow or throttled service doesn't hold back the others. Time spent by each service is kept.
+
+        :param executor:
+        :param service_parallelism:
+        """
+        self.executor = executor
+        self.service_parallelism = max(1, service_parallelism)
+        self.running: Dict[str, int] = collections.defaultdict(int)
+        self.pending: Dict[str, Deque[Tuple]] = collections.defaultdict(
+            collections.deque
+        )
+        self.durations: Dict[str, float] = collections.defaultdict(float)
+        self.lock = threading.Lock()
+
+    def submit(self, service: str, fn, *args) -> Future:
+        future = Future()
+        with self.lock:
+            start = self.running[service] < self.service_parallelism
+            if start:
+                self.running[service] = self.running[service] + 1
+            else:
+                self.pending[service].append((future, fn, args))
+        if start:
+            self.executor.submit(self.run, service, future, fn, args)
+        return future
+
+    def run(self, service: str, future: Future, fn, args):
+        started = time.perf_counter()
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                # pylint: disable=broad-except
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            next_task = None
+            with self.lock:
+                self.durations[service] = (
+                    self.durations[service] + time.perf_counter() - started
+                )
+                if self.pending[service]:
+                    next_task = self.pending[service].popleft()
+                else:
+                    self.running[service] = self.running[service] - 1
+            if next_task is not None:
+                next_future, next_fn, next_args = next_task
+                self.executor.submit(self.run, service, next_future, next_fn, next_args)
+
+    def slowest_services(self, count: int) -> List[Tuple[str, float]]:
+        with self.lock:
+            durations = sorted(
+                self.durations.items(), key=lambda item: item[1], reverse=True
+            )
+        return durations[:count]
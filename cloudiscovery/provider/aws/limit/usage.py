@@ -0,0 +1,222 @@
+import collections
+import math
+import threading
+from array import array
+from typing import NamedTuple, List, Dict, Optional, Iterable, Set, Tuple
+
+from provider.aws.common_aws import get_paginator
+from shared.common import Resource, ResourceDigest, LimitsValues
+
+
+class UsageListing(NamedTuple):
+    service: str
+    region: str
+    method: str
+    filters_key: str
+
+
+def usage_listing(service: str, region: str, method: str, filters) -> UsageListing:
+    return UsageListing(
+        service=service, region=region, method=method, filters_key=repr(filters)
+    )
+
+
+class QuotaUsage:
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        data_quota_code: dict,
+        quota_data: dict,
+        service: str,
+        region: str,
+        value_aws,
+        value,
+        quota_service: Optional[str] = None,
+    ):
+        """
+        Usage of a quota, accumulated from the listings it needs
+
+        :param data_quota_code: cached quota, with its code and name
+        :param quota_data: quota definition from ALLOWED_SERVICES_CODES
+        :param service: boto3 service listing the usage
+        :param region: region of the boto3 client
+        :param value_aws: AWS default quota value
+        :param value: applied quota value
+        :param quota_service: Service Quotas code of the quota, e.g. ebs for a quota listed by ec2, service if None
+        """
+        self.data_quota_code = data_quota_code
+        self.quota_data = quota_data
+        self.service = service
+        self.quota_service = quota_service or service
+        self.region = region
+        self.value_aws = value_aws
+        self.value = value
+        self.usage = 0
+        self.collected_listings = 0
+        self.lock = threading.Lock()
+
+    def listings(self) -> Dict[UsageListing, Optional[dict]]:
+        """
+        Listings counted by this quota, for its filter and its additional_filters
+        """
+        listings = dict()
+        for filters in [self.quota_data.get("filter")] + self.quota_data.get(
+            "additional_filters", []
+        ):
+            listing = usage_listing(
+                self.service, self.region, self.quota_data["method"], filters
+            )
+            listings[listing] = filters
+        return listings
+
+    def add_usage(self, usage):
+        with self.lock:
+            self.usage = self.usage + usage
+
+    def usage_key(self) -> Tuple[str, Optional[str]]:
+        """
+        Listed key and field summed by this quota, without field the quota counts the items
+        """
+        # If fields element is not empty, sum values instead list len
+        return self.quota_data["key"], self.quota_data["fields"] or None
+
+    def listing_collected(self):
+        with self.lock:
+            self.collected_listings = self.collected_listings + 1
+
+    def completed(self) -> bool:
+        return self.collected_listings == len(self.listings())
+
+    def total_usage(self):
+        # Value for division
+        if "divisor" in self.quota_data:
+            return self.usage / self.quota_data["divisor"]
+        return self.usage
+
+    def resource(self, threshold_requested) -> Optional[Resource]:
+        if not self.completed():
+            return None
+
+        usage = self.total_usage()
+        try:
+            percent = round((usage / self.value) * 100, 2)
+        except ZeroDivisionError:
+            percent = 0
+
+        if percent < threshold_requested:
+            return None
+
+        return Resource(
+            digest=ResourceDigest(
+                id=self.data_quota_code["quota_code"], type="aws_limit"
+            ),
+            name="",
+            group="",
+            limits=LimitsValues(
+                quota_name=self.data_quota_code["quota_name"],
+                quota_code=self.data_quota_code["quota_code"],
+                aws_limit=int(self.value_aws),
+                local_limit=int(self.value),
+                usage=int(usage),
+                service=self.service,
+                percent=percent,
+            ),
+        )
+
+
+def field_values(items: Iterable[dict], field: str) -> Iterable[float]:
+    for item in items:
+        value = item.get(field)
+        yield 0 if value is None else value
+
+
+class FieldAggregator:
+    def __init__(self):
+        """
+        Usage of listed pages, for each (key, field) counted by the quotas of a listing
+
+        Values of a field are extracted from every item of every page into a compact array of
+        doubles and summed in one pass once the listing is complete.
+        """
+        self.values: Dict[Tuple[str, str], array] = dict()
+        self.counts: Dict[str, int] = collections.defaultdict(int)
+
+    def add_page(self, page: dict, usage_keys: Set[Tuple[str, Optional[str]]]):
+        for key, field in usage_keys:
+            items = page.get(key) or []
+            if field is None:
+                self.counts[key] = self.counts[key] + len(items)
+            else:
+                if (key, field) not in self.values:
+                    self.values[(key, field)] = array("d")
+                self.values[(key, field)].extend(field_values(items, field))
+
+    def total(self, key: str, field: Optional[str]) -> float:
+        if field is None:
+            return self.counts[key]
+        # fsum keeps the sum exact, whatever the number of items
+        return math.fsum(self.values.get((key, field), ()))
+
+
+class SharedListing:
+    def __init__(self, filters: Optional[dict]):
+        """
+        A listing executed once for every quota counting it
+
+        :param filters:
+        """
+        self.filters = filters
+        self.quota_usages: List[QuotaUsage] = []
+
+    @property
+    def quota_service(self) -> str:
+        """
+        Service Quotas code the listing is scheduled and timed under, the one of its first quota
+        """
+        return self.quota_usages[0].quota_service
+
+
+def group_listings(
+    quota_usages: List[QuotaUsage],
+) -> Dict[UsageListing, SharedListing]:
+    """
+    Groups quotas by (boto3 service, region, method, filter), so each listing runs once per region
+    """
+    shared_listings: Dict[UsageListing, SharedListing] = dict()
+    for quota_usage in quota_usages:
+        for listing, filters in quota_usage.listings().items():
+            if listing not in shared_listings:
+                shared_listings[listing] = SharedListing(filters)
+            shared_listings[listing].quota_usages.append(quota_usage)
+    return shared_listings
+
+
+def collect_listing(client, listing: UsageListing, shared_listing: SharedListing):
+    """
+    Runs a listing once and adds the usage of all pages to all quotas counting it
+    """
+    filters = shared_listing.filters
+    usage_keys = {
+        quota_usage.usage_key() for quota_usage in shared_listing.quota_usages
+    }
+    aggregator = FieldAggregator()
+    pages = get_paginator(
+        client=client,
+        operation_name=listing.method,
+        resource_type="aws_limit",
+        filters=filters,
+    )
+
+    if not pages:
+        if filters:
+            response = getattr(client, listing.method)(**filters)
+        else:
+            response = getattr(client, listing.method)()
+        aggregator.add_page(response, usage_keys)
+    else:
+        for page in pages:
+            aggregator.add_page(page, usage_keys)
+
+    for quota_usage in shared_listing.quota_usages:
+        quota_usage.add_usage(aggregator.total(*quota_usage.usage_key()))
+        quota_usage.listing_collected()
@@ -3,7 +3,7 @@ from typing import List
 from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
 from provider.aws.policy.diagram import PolicyDiagram
 from shared.common import Filterable, BaseOptions
-from shared.diagram import NoDiagram
+from shared.diagram import NoDiagram, BaseDiagram
 
 
 class PolicyOptions(BaseAwsOptions, BaseOptions):
@@ -20,24 +20,35 @@ class Policy(BaseAwsCommand):
         services: List[str],
         filters: List[Filterable],
     ):
-        for region in self.region_names:
-            self.init_region_cache(region)
-            options = PolicyOptions(
-                verbose=verbose,
-                filters=filters,
-                session=self.session,
-                region_name=region,
-            )
+        self.run_regions(
+            lambda region: self.run_region(region, diagram, verbose, filters)
+        )
 
-            command_runner = AwsCommandRunner(filters)
-            if diagram:
-                diagram = PolicyDiagram()
-            else:
-                diagram = NoDiagram()
-            command_runner.run(
-                provider="policy",
-                options=options,
-                diagram_builder=diagram,
-                title="AWS IAM Policies - Region {}".format(region),
-                filename=options.resulting_file_name("policy"),
-            )
+    def run_region(
+        self,
+        region: str,
+        diagram: bool,
+        verbose: bool,
+        filters: List[Filterable],
+    ):
+        self.init_region_cache(region)
+        options = PolicyOptions(
+            verbose=verbose,
+            filters=filters,
+            session=self.session,
+            region_name=region,
+        )
+
+        command_runner = AwsCommandRunner(filters)
+        diagram_builder: BaseDiagram
+        if diagram:
+            diagram_builder = PolicyDiagram()
+        else:
+            diagram_builder = NoDiagram()
+        command_runner.run(
+            provider="policy",
+            options=options,
+            diagram_builder=diagram_builder,
+            title="AWS IAM Policies - Region {}".format(region),
+            filename=options.resulting_file_name("policy"),
+        )
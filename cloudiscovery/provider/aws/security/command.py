@@ -1,6 +1,11 @@
 from typing import List
 
-from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
+from provider.aws.common_aws import (
+    BaseAwsOptions,
+    BaseAwsCommand,
+    AwsCommandRunner,
+    DEFAULT_REGION_PARALLELISM,
+)
 from shared.common import (
     ResourceCache,
     Filterable,
@@ -31,7 +36,15 @@ class SecurityParameters:
 
 
 class Security(BaseAwsCommand):
-    def __init__(self, region_names, session, commands, partition_code):
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        region_names,
+        session,
+        commands,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+    ):
         """
         All AWS resources
 
@@ -39,8 +52,9 @@ class Security(BaseAwsCommand):
         :param session:
         :param commands:
         :param partition_code:
+        :param region_parallelism:
         """
-        super().__init__(region_names, session, partition_code)
+        super().__init__(region_names, session, partition_code, region_parallelism)
         self.commands = commands
 
     def run(
@@ -50,22 +64,23 @@ class Security(BaseAwsCommand):
         services: List[str],
         filters: List[Filterable],
     ):
+        self.run_regions(lambda region: self.run_region(region, verbose, filters))
 
-        for region in self.region_names:
-            security_options = SecurityOptions(
-                verbose=verbose,
-                filters=filters,
-                session=self.session,
-                region_name=region,
-                commands=self.commands,
-            )
+    def run_region(self, region: str, verbose: bool, filters: List[Filterable]):
+        security_options = SecurityOptions(
+            verbose=verbose,
+            filters=filters,
+            session=self.session,
+            region_name=region,
+            commands=self.commands,
+        )
 
-            command_runner = AwsCommandRunner()
-            command_runner.run(
-                provider="security",
-                options=security_options,
-                diagram_builder=NoDiagram(),
-                title="AWS Security - Region {}".format(region),
-                # pylint: disable=no-member
-                filename=security_options.resulting_file_name("security"),
-            )
+        command_runner = AwsCommandRunner()
+        command_runner.run(
+            provider="security",
+            options=security_options,
+            diagram_builder=NoDiagram(),
+            title="AWS Security - Region {}".format(region),
+            # pylint: disable=no-member
+            filename=security_options.resulting_file_name("security"),
+        )
@@ -2,7 +2,14 @@ from typing import List
 
 from ipaddress import ip_network
 
-from provider.aws.common_aws import BaseAwsOptions, BaseAwsCommand, AwsCommandRunner
+from provider.aws.common_aws import (
+    BaseAwsOptions,
+    BaseAwsCommand,
+    AwsCommandRunner,
+    DEFAULT_REGION_PARALLELISM,
+    get_client,
+    RegionInventory,
+)
 from provider.aws.vpc.diagram import VpcDiagram
 from shared.common import (
     ResourceDigest,
@@ -10,6 +17,7 @@ from shared.common import (
     SOURCE_IP_ADDRESS_REGEX,
     Filterable,
     BaseOptions,
+    message_handler,
 )
 from shared.diagram import NoDiagram, BaseDiagram
 
@@ -19,9 +27,15 @@ class VpcOptions(BaseAwsOptions, BaseOptions):
 
     # pylint: disable=too-many-arguments
     def __init__(
-        self, verbose: bool, filters: List[Filterable], session, region_name, vpc_id
+        self,
+        verbose: bool,
+        filters: List[Filterable],
+        session,
+        region_name,
+        vpc_id,
+        inventory: RegionInventory = None,
     ):
-        BaseAwsOptions.__init__(self, session, region_name)
+        BaseAwsOptions.__init__(self, session, region_name, inventory)
         BaseOptions.__init__(self, verbose, filters)
         self.vpc_id = vpc_id
 
@@ -31,7 +45,14 @@ class VpcOptions(BaseAwsOptions, BaseOptions):
 
 class Vpc(BaseAwsCommand):
     # pylint: disable=too-many-arguments
-    def __init__(self, vpc_id, region_names, session, partition_code):
+    def __init__(
+        self,
+        vpc_id,
+        region_names,
+        session,
+        partition_code,
+        region_parallelism=DEFAULT_REGION_PARALLELISM,
+    ):
         """
         VPC command
 
@@ -39,8 +60,9 @@ class Vpc(BaseAwsCommand):
         :param region_names:
         :param session:
         :param partition_code:
+        :param region_parallelism:
         """
-        super().__init__(region_names, session, partition_code)
+        super().__init__(region_names, session, partition_code, region_parallelism)
         self.vpc_id = vpc_id
 
     @staticmethod
@@ -69,61 +91,82 @@ class Vpc(BaseAwsCommand):
         services: List[str],
         filters: List[Filterable],
     ):
-        # pylint: disable=too-many-branches
         command_runner = AwsCommandRunner(filters)
 
-        for region in self.region_names:
-            self.init_region_cache(region)
-
-            # if vpc is none, get all vpcs and check
-            if self.vpc_id is None:
-                client = self.session.client("ec2", region_name=region)
-                vpcs = client.describe_vpcs()
-                for data in vpcs["Vpcs"]:
-                    vpc_id = data["VpcId"]
-                    vpc_options = VpcOptions(
-                        verbose=verbose,
-                        filters=filters,
-                        session=self.session,
-                        region_name=region,
-                        vpc_id=vpc_id,
-                    )
-                    self.check_vpc(vpc_options)
-                    diagram_builder: BaseDiagram
-                    if diagram:
-                        diagram_builder = VpcDiagram(vpc_id=vpc_id)
-                    else:
-                        diagram_builder = NoDiagram()
-                    command_runner.run(
-                        provider="vpc",
-                        options=vpc_options,
-                        diagram_builder=diagram_builder,
-                        title="AWS VPC {} Resources - Region {}".format(vpc_id, region),
-                        filename=vpc_options.resulting_file_name(vpc_id + "_vpc"),
-                    )
-            else:
+        self.run_regions(
+            lambda region: self.run_region(
+                region, diagram, verbose, filters, command_runner
+            )
+        )
+
+    # pylint: disable=too-many-arguments
+    def run_region(
+        self,
+        region: str,
+        diagram: bool,
+        verbose: bool,
+        filters: List[Filterable],
+        command_runner: AwsCommandRunner,
+    ):
+        self.init_region_cache(region)
+
+        # if vpc is none, get all vpcs and check
+        if self.vpc_id is None:
+            client = get_client(self.session, "ec2", region)
+            vpcs = client.describe_vpcs()
+            # region-wide listings are made once and shared by every VPC of the region
+            inventory = RegionInventory()
+            for data in vpcs["Vpcs"]:
+                vpc_id = data["VpcId"]
                 vpc_options = VpcOptions(
                     verbose=verbose,
                     filters=filters,
                     session=self.session,
                     region_name=region,
-                    vpc_id=self.vpc_id,
+                    vpc_id=vpc_id,
+                    inventory=inventory,
                 )
-
                 self.check_vpc(vpc_options)
+                diagram_builder: BaseDiagram
                 if diagram:
-                    diagram_builder = VpcDiagram(vpc_id=self.vpc_id)
+                    diagram_builder = VpcDiagram(vpc_id=vpc_id)
                 else:
                     diagram_builder = NoDiagram()
                 command_runner.run(
                     provider="vpc",
                     options=vpc_options,
                     diagram_builder=diagram_builder,
-                    title="AWS VPC {} Resources - Region {}".format(
-                        self.vpc_id, region
+                    title="AWS VPC {} Resources - Region {}".format(vpc_id, region),
+                    filename=vpc_options.resulting_file_name(vpc_id + "_vpc"),
+                )
+            if verbose:
+                message_handler(
+                    "Region {}: {} listing calls made, {} reused across VPCs".format(
+                        region, inventory.calls_made, inventory.calls_reused
                     ),
-                    filename=vpc_options.resulting_file_name(self.vpc_id + "_vpc"),
+                    "HEADER",
                 )
+        else:
+            vpc_options = VpcOptions(
+                verbose=verbose,
+                filters=filters,
+                session=self.session,
+                region_name=region,
+                vpc_id=self.vpc_id,
+            )
+
+            self.check_vpc(vpc_options)
+            if diagram:
+                diagram_builder = VpcDiagram(vpc_id=self.vpc_id)
+            else:
+                diagram_builder = NoDiagram()
+            command_runner.run(
+                provider="vpc",
+                options=vpc_options,
+                diagram_builder=diagram_builder,
+                title="AWS VPC {} Resources - Region {}".format(self.vpc_id, region),
+                filename=vpc_options.resulting_file_name(self.vpc_id + "_vpc"),
+            )
 
 
 # pylint: disable=too-many-branches
@@ -170,7 +170,7 @@ class QUICKSIGHT(ResourceProvider):
         resources_found = []
 
         # Get accountid
-        account_id = self.vpc_options.account_number()
+        account_id = self.vpc_options.account_id
 
         response = client.list_data_sources(AwsAccountId=account_id)
 
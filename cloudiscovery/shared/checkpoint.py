@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from diskcache import Cache
+
+PATH_CHECKPOINT_OUTPUT = "./assets/checkpoints/"
+
+MISSING = object()
+
+# what is checkpointed: nothing, completed regions and services, or completed regions and listing operations
+CHECKPOINT_OFF = "off"
+CHECKPOINT_SERVICES = "services"
+CHECKPOINT_OPERATIONS = "operations"
+
+
+def checkpoint_run_id(*parts) -> str:
+    """
+    Identifies a run by its command, scope and options, resumed runs must have the same
+    """
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+
+def unit_key(unit) -> str:
+    return repr(unit)
+
+
+class Checkpoint:
+    def __init__(
+        self,
+        run_id: str,
+        resume: bool = False,
+        level: str = CHECKPOINT_SERVICES,
+        path: str = PATH_CHECKPOINT_OUTPUT,
+    ):
+        """
+        Completed units of work of a run, e.g. (region, service, operation), with their results
+
+        Kept on disk as they complete, so an interrupted run can be resumed. A run that doesn't resume starts
+        from an empty checkpoint.
+
+        :param run_id:
+        :param resume:
+        :param level: CHECKPOINT_SERVICES or CHECKPOINT_OPERATIONS, units holding the resources found
+        :param path:
+        """
+        self.run_id = run_id
+        self.level = level
+        self.cache = Cache(directory=os.path.join(path, run_id))
+        self.resumed_units = 0
+        self.lock = threading.Lock()
+        if not resume:
+            self.cache.clear()
+
+    def __len__(self):
+        return len(self.cache)
+
+    @property
+    def services(self) -> bool:
+        return self.level == CHECKPOINT_SERVICES
+
+    @property
+    def operations(self) -> bool:
+        return self.level == CHECKPOINT_OPERATIONS
+
+    def completed(self, *unit) -> bool:
+        return unit_key(unit) in self.cache
+
+    def result(self, *unit) -> Optional[object]:
+        """
+        Result of a completed unit, MISSING if the unit has not completed
+        """
+        value = self.cache.get(unit_key(unit), default=MISSING)
+        if value is not MISSING:
+            with self.lock:
+                self.resumed_units = self.resumed_units + 1
+        return value
+
+    def complete(self, *unit, result=None):
+        self.cache.set(unit_key(unit), result)
+
+    def clear(self):
+        self.cache.clear()
+
+    def close(self):
+        self.cache.close()
@@ -1,8 +1,11 @@
+import asyncio
 import importlib
 import inspect
+import queue
+import threading
 from concurrent.futures.thread import ThreadPoolExecutor
 from os.path import dirname
-from typing import List, Dict
+from typing import List, Dict, Set, Iterable, Union, Tuple, Optional
 import os
 
 from shared.common import (
@@ -13,40 +16,71 @@ from shared.common import (
     message_handler,
     ResourceProvider,
     ResourceDigest,
+    CompiledFilters,
+    compile_filters,
+    CompactResource,
+    run_async,
 )
-from shared.diagram import BaseDiagram
+from shared.diagram import BaseDiagram, NoDiagram
 from shared.report import Report
+from shared.snapshot import Snapshot
+from shared.spool import ResourceSpool
+
+STREAM_QUEUE_SIZE = 10000
+PARALLEL_PROVIDER_CALLS = 15
+ASYNC_BLOCKING_CALLS = 80
+
+THREADS_BACKEND = "threads"
+ASYNCIO_BACKEND = "asyncio"
+BACKENDS = [THREADS_BACKEND, ASYNCIO_BACKEND]
+
+
+def resource_sort_key(resource: Resource):
+    return resource.group + resource.digest.type + resource.name
+
+
+def relation_sort_key(relation: ResourceEdge):
+    return (
+        relation.from_node.type
+        + relation.from_node.id
+        + relation.to_node.type
+        + relation.to_node.id
+    )
 
 
 class CommandRunner(object):
-    def __init__(self, provider_name: str, filters: List[Filterable] = None):
+    def __init__(
+        self,
+        provider_name: str,
+        filters: List[Filterable] = None,
+        streaming: bool = False,
+        backend: str = THREADS_BACKEND,
+        snapshot: Optional[Snapshot] = None,
+    ):
         """
         Base class command execution
 
         :param provider_name:
         :param filters:
+        :param streaming: resources flow through dedupe/filter stages to on-disk sorted runs instead of memory
+        :param backend: THREADS_BACKEND or ASYNCIO_BACKEND, how providers are fanned out
+        :param snapshot: when set, reported resources are compared with the previous snapshot and recorded
         """
+        if streaming and backend == ASYNCIO_BACKEND:
+            raise ValueError("The asyncio backend can't be used with streaming")
         self.provider_name: str = provider_name
         self.filters: List[Filterable] = filters
+        self.compiled_filters: CompiledFilters = compile_filters(filters)
+        self.streaming: bool = streaming
+        self.backend: str = backend
+        self.snapshot: Optional[Snapshot] = snapshot
 
-    # pylint: disable=too-many-locals,too-many-arguments
-    def run(
-        self,
-        provider: str,
-        options: BaseOptions,
-        diagram_builder: BaseDiagram,
-        title: str,
-        filename: str,
-    ):
+    def load_providers(self, provider: str):
         """
-        Executes a command.
-
         The project's development pattern is a file with the respective name of the parent
         resource (e.g. compute, network), classes of child resources inside this file and run() method to execute
         respective check. So it makes sense to load dynamically.
         """
-        # Iterate to get all modules
-        message_handler("\nInspecting resources", "HEADER")
         providers = []
         for name in os.listdir(
             dirname(__file__)
@@ -76,20 +110,29 @@ class CommandRunner(object):
                     ):
                         providers.append((nameclass, cls))
         providers.sort(key=lambda x: x[0])
+        return providers
 
-        all_resources: List[Resource] = []
-        resource_relations: List[ResourceEdge] = []
+    # pylint: disable=too-many-locals,too-many-arguments
+    def run(
+        self,
+        provider: str,
+        options: BaseOptions,
+        diagram_builder: BaseDiagram,
+        title: str,
+        filename: str,
+    ):
+        """
+        Executes a command.
+        """
+        # Iterate to get all modules
+        message_handler("\nInspecting resources", "HEADER")
+        providers = self.load_providers(provider)
 
-        with ThreadPoolExecutor(15) as executor:
-            provider_results = executor.map(
-                lambda data: execute_provider(options, data), providers
-            )
+        if self.streaming:
+            self.run_streaming(providers, options, diagram_builder, title, filename)
+            return
 
-            for provider_result in provider_results:
-                if provider_result[0] is not None:
-                    all_resources.extend(provider_result[0])
-                if provider_result[1] is not None:
-                    resource_relations.extend(provider_result[1])
+        all_resources, resource_relations = self.collect(providers, options)
 
         unique_resources_dict: Dict[ResourceDigest, Resource] = dict()
         for resource in all_resources:
@@ -97,26 +140,16 @@ class CommandRunner(object):
 
         unique_resources = list(unique_resources_dict.values())
 
-        unique_resources.sort(key=lambda x: x.group + x.digest.type + x.name)
-        resource_relations.sort(
-            key=lambda x: x.from_node.type
-            + x.from_node.id
-            + x.to_node.type
-            + x.to_node.id
-        )
+        unique_resources.sort(key=resource_sort_key)
+        resource_relations.sort(key=relation_sort_key)
 
         # Resource filtering and sorting
-        filtered_resources = filter_resources(unique_resources, self.filters)
-        filtered_resources.sort(key=lambda x: x.group + x.digest.type + x.name)
+        filtered_resources = filter_resources(unique_resources, self.compiled_filters)
+        filtered_resources.sort(key=resource_sort_key)
 
         # Relationships filtering and sorting
         filtered_relations = filter_relations(filtered_resources, resource_relations)
-        filtered_relations.sort(
-            key=lambda x: x.from_node.type
-            + x.from_node.id
-            + x.to_node.type
-            + x.to_node.id
-        )
+        filtered_relations.sort(key=relation_sort_key)
 
         # Diagram integration
         diagram_builder.build(
@@ -131,16 +164,148 @@ class CommandRunner(object):
         report.general_report(
             resources=filtered_resources, resource_relations=filtered_relations
         )
+        # attributes decoded by a report pass are dropped before the next one
+        release_attributes(filtered_resources)
         report.html_report(
             resources=filtered_resources,
             resource_relations=filtered_relations,
             title=title,
             filename=filename,
         )
+        release_attributes(filtered_resources)
+        self.record_snapshot(report, filtered_resources, filename)
 
         # TODO: Export in csv/json/yaml/tf... future...
         # ....exporttf(checks)....
 
+    def collect(
+        self, providers, options: BaseOptions
+    ) -> (List[Resource], List[ResourceEdge]):
+        all_resources: List[Resource] = []
+        resource_relations: List[ResourceEdge] = []
+
+        if self.backend == ASYNCIO_BACKEND:
+            provider_results = run_async(
+                execute_providers_async(options, providers), ASYNC_BLOCKING_CALLS
+            )
+        else:
+            with ThreadPoolExecutor(PARALLEL_PROVIDER_CALLS) as executor:
+                provider_results = list(
+                    executor.map(
+                        lambda data: execute_provider(options, data), providers
+                    )
+                )
+
+        for provider_result in provider_results:
+            if provider_result[0] is not None:
+                all_resources.extend(
+                    CompactResource.from_resource(resource)
+                    for resource in provider_result[0]
+                )
+            if provider_result[1] is not None:
+                resource_relations.extend(provider_result[1])
+
+        return all_resources, resource_relations
+
+    # pylint: disable=too-many-locals,too-many-arguments
+    def run_streaming(
+        self,
+        providers,
+        options: BaseOptions,
+        diagram_builder: BaseDiagram,
+        title: str,
+        filename: str,
+    ):
+        """
+        Streaming variant of run
+
+        Providers push resources into a bounded queue as they find them. Only digests are kept in memory for
+        dedupe and relation filtering, filtered resources go to a spool sorted with an on-disk merge.
+        As in run, the last occurrence of a duplicated digest in provider order is kept.
+        """
+        resource_queue: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        resource_relations: List[ResourceEdge] = []
+
+        with ThreadPoolExecutor(PARALLEL_PROVIDER_CALLS) as executor, ResourceSpool(
+            sort_key=resource_sort_key, unique_key=lambda resource: resource.digest
+        ) as spool:
+            futures = [
+                executor.submit(
+                    stream_provider, options, data, resource_queue, index, stop
+                )
+                for index, data in enumerate(providers)
+            ]
+
+            finished_providers = 0
+            try:
+                while finished_providers < len(futures):
+                    item = resource_queue.get()
+                    if item is None:
+                        finished_providers = finished_providers + 1
+                        continue
+                    position, resource = item
+                    if (
+                        self.compiled_filters.is_empty()
+                        or self.compiled_filters.matches(resource)
+                    ):
+                        compact_resource = CompactResource.from_resource(resource)
+                        # flattened once, not again by each report reading the spool
+                        compact_resource.flatten_attributes()
+                        spool.append(compact_resource, position)
+                    else:
+                        spool.skip(resource.digest, position)
+            except BaseException:
+                # unblock providers waiting on the full queue, or leaving the executor hangs
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                started_providers = len(
+                    [future for future in futures if not future.cancelled()]
+                )
+                while finished_providers < started_providers:
+                    if resource_queue.get() is None:
+                        finished_providers = finished_providers + 1
+                raise
+            filtered_digests: Set[ResourceDigest] = spool.keys()
+
+            for future in futures:
+                provider_relations = future.result()
+                if provider_relations is not None:
+                    resource_relations.extend(provider_relations)
+
+            filtered_relations = filter_relations_by_digests(
+                filtered_digests, resource_relations
+            )
+            filtered_relations.sort(key=relation_sort_key)
+
+            if not isinstance(diagram_builder, NoDiagram):
+                diagram_builder.build(
+                    resources=list(spool),
+                    resource_relations=filtered_relations,
+                    title=title,
+                    filename=filename,
+                )
+
+            report = Report()
+            report.general_report(
+                resources=spool, resource_relations=filtered_relations
+            )
+            report.html_report(
+                resources=spool,
+                resource_relations=filtered_relations,
+                title=title,
+                filename=filename,
+            )
+            self.record_snapshot(report, spool, filename)
+
+    def record_snapshot(
+        self, report: Report, resources: Iterable[Resource], filename: str
+    ):
+        if self.snapshot is None:
+            return
+        report.diff_report(self.snapshot.record(resources), filename)
+
 
 def execute_provider(options, data) -> (List[Resource], List[ResourceEdge]):
     provider_instance = data[1](options)
@@ -149,44 +314,83 @@ def execute_provider(options, data) -> (List[Resource], List[ResourceEdge]):
     return provider_resources, provider_resource_relations
 
 
+async def execute_providers_async(
+    options, providers
+) -> List[Tuple[List[Resource], List[ResourceEdge]]]:
+    """
+    Runs every provider on the running event loop, at most PARALLEL_PROVIDER_CALLS at the same time
+    """
+    slots = asyncio.Semaphore(PARALLEL_PROVIDER_CALLS)
+
+    async def execute(data):
+        async with slots:
+            provider_instance = data[1](options)
+            provider_resources = await provider_instance.get_resources_async()
+            return provider_resources, provider_instance.get_relations()
+
+    return await asyncio.gather(*[execute(data) for data in providers])
+
+
+def stream_provider(
+    options,
+    data,
+    resource_queue: queue.Queue,
+    index: int = 0,
+    stop: Optional[threading.Event] = None,
+) -> List[ResourceEdge]:
+    """
+    Puts provider resources into resource_queue as they are found, None marks the end of the provider
+
+    Resources are put with their position (provider index, resource index), stop ends the provider early.
+    """
+    try:
+        provider_instance = data[1](options)
+        for resource_index, resource in enumerate(provider_instance.iter_resources()):
+            if stop is not None and stop.is_set():
+                return []
+            resource_queue.put(((index, resource_index), resource))
+        return provider_instance.get_relations()
+    finally:
+        resource_queue.put(None)
+
+
 def filter_resources(
-    resources: List[Resource], filters: List[Filterable]
+    resources: List[Resource], filters: Union[List[Filterable], CompiledFilters]
 ) -> List[Resource]:
-    if not filters:
+    compiled_filters = compile_filters(filters)
+    if compiled_filters.is_empty():
         return resources
 
-    filtered_resources = []
+    return [resource for resource in resources if compiled_filters.matches(resource)]
+
+
+def release_attributes(resources: Iterable[Resource]):
     for resource in resources:
-        matches_filter = False
-        for resource_filter in filters:
-            if resource_filter.is_tag():
-                for resource_tag in resource.tags:
-                    if (
-                        resource_tag.key == resource_filter.key
-                        and resource_tag.value == resource_filter.value
-                    ):
-                        matches_filter = True
-            elif resource_filter.is_type():
-                if resource.digest.type == resource_filter.type:
-                    matches_filter = True
-        if matches_filter:
-            filtered_resources.append(resource)
-    return filtered_resources
+        if isinstance(resource, CompactResource):
+            resource.release_attributes()
+
+
+def resource_digests(resources: Iterable[Resource]) -> Set[ResourceDigest]:
+    return {resource.digest for resource in resources}
+
+
+def filter_relations_by_digests(
+    digests: Set[ResourceDigest], resource_relations: Iterable[ResourceEdge]
+) -> List[ResourceEdge]:
+    """
+    Keeps relations whose both ends are present in digests, linear in the number of relations
+    """
+    return [
+        resource_relation
+        for resource_relation in resource_relations
+        if resource_relation.from_node in digests
+        and resource_relation.to_node in digests
+    ]
 
 
 def filter_relations(
     filtered_resources: List[Resource], resource_relations: List[ResourceEdge]
-):
-    filtered_relations: List[ResourceEdge] = []
-
-    for resource_relation in resource_relations:
-        is_from_present = False
-        is_to_present = False
-        for resource in filtered_resources:
-            if resource_relation.from_node == resource.digest:
-                is_from_present = True
-            if resource_relation.to_node == resource.digest:
-                is_to_present = True
-        if is_from_present and is_to_present:
-            filtered_relations.append(resource_relation)
-    return filtered_relations
+) -> List[ResourceEdge]:
+    return filter_relations_by_digests(
+        resource_digests(filtered_resources), resource_relations
+    )
@@ -1,10 +1,24 @@
+import asyncio
 import datetime
 import functools
 import os.path
+import pickle
 import re
+import sys
 import threading
 from abc import ABC
-from typing import NamedTuple, List, Dict
+from collections.abc import Mapping
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import (
+    NamedTuple,
+    List,
+    Dict,
+    FrozenSet,
+    Set,
+    Union,
+    Iterable,
+    Callable,
+)
 
 from diskcache import Cache
 
@@ -87,6 +101,167 @@ class Resource(NamedTuple):
     attributes: Dict[str, object] = {}
 
 
+class LazyMapping(Mapping):
+    __slots__ = ("source", "decoder", "decoded")
+
+    def __init__(self, source, decoder: Callable[[object], Dict[str, object]]):
+        """
+        Read-only mapping built from source by decoder on first access
+
+        Used to keep raw API items and defer work such as attribute flattening to report time.
+
+        :param source:
+        :param decoder:
+        """
+        self.source = source
+        self.decoder = decoder
+        self.decoded = None
+
+    def mapping(self) -> Dict[str, object]:
+        if self.decoded is None:
+            self.decoded = self.decoder(self.source)
+        return self.decoded
+
+    def __getitem__(self, key):
+        return self.mapping()[key]
+
+    def __iter__(self):
+        return iter(self.mapping())
+
+    def __len__(self):
+        return len(self.mapping())
+
+    def __getstate__(self):
+        return self.source, self.decoder
+
+    def __setstate__(self, state):
+        self.source, self.decoder = state
+        self.decoded = None
+
+
+def intern_string(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class CompactResource:
+    __slots__ = (
+        "digest",
+        "name",
+        "details",
+        "group",
+        "tag_pairs",
+        "limits",
+        "security",
+        "encoded_attributes",
+        "decoded_attributes",
+    )
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        digest: ResourceDigest,
+        name: str = "",
+        details: str = "",
+        group: str = "",
+        tags: List[Filterable] = (),
+        limits: LimitsValues = None,
+        security: SecurityValues = None,
+        attributes: Dict[str, object] = None,
+    ):
+        """
+        Memory-compact resource with the same attribute access as Resource
+
+        Type, group and tag keys are interned, tags are kept as a tuple of pairs and attributes are pickled.
+        Lazy attributes are stored undecoded. Attributes are decoded on first read and kept until
+        release_attributes, lazy attributes are flattened once and stored flattened.
+        """
+        self.digest = ResourceDigest(id=digest.id, type=intern_string(digest.type))
+        self.name = name
+        self.details = details
+        self.group = intern_string(group)
+        self.tag_pairs = tuple((intern_string(tag.key), tag.value) for tag in tags)
+        self.limits = limits
+        self.security = security
+        self.encoded_attributes = None
+        self.decoded_attributes = None
+        # truth test would decode lazy attributes
+        if isinstance(attributes, LazyMapping) or attributes:
+            self.encoded_attributes = pickle.dumps(attributes, pickle.HIGHEST_PROTOCOL)
+
+    @property
+    def tags(self) -> List[Filterable]:
+        return [Filterable(key=key, value=value) for key, value in self.tag_pairs]
+
+    @property
+    def attributes(self) -> Mapping:
+        if self.encoded_attributes is None:
+            return {}
+        if self.decoded_attributes is None:
+            attributes = pickle.loads(self.encoded_attributes)
+            if isinstance(attributes, LazyMapping):
+                attributes = dict(attributes)
+                self.encoded_attributes = pickle.dumps(
+                    attributes, pickle.HIGHEST_PROTOCOL
+                )
+            self.decoded_attributes = attributes
+        return self.decoded_attributes
+
+    def release_attributes(self):
+        """
+        Drops decoded attributes once reports are rendered, they are decoded again if read
+        """
+        self.decoded_attributes = None
+
+    def flatten_attributes(self):
+        """
+        Stores lazy attributes flattened, e.g. before spooling a resource read by several reports
+        """
+        if self.encoded_attributes is not None:
+            self.attributes  # pylint: disable=pointless-statement
+            self.release_attributes()
+
+    def __getstate__(self):
+        return {
+            slot: getattr(self, slot)
+            for slot in self.__slots__
+            if slot != "decoded_attributes"
+        }
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self.decoded_attributes = None
+
+    def to_resource(self) -> Resource:
+        return Resource(
+            digest=self.digest,
+            name=self.name,
+            details=self.details,
+            group=self.group,
+            tags=self.tags,
+            limits=self.limits,
+            security=self.security,
+            attributes=self.attributes,
+        )
+
+    @staticmethod
+    def from_resource(resource) -> "CompactResource":
+        if isinstance(resource, CompactResource):
+            return resource
+        return CompactResource(
+            digest=resource.digest,
+            name=resource.name,
+            details=resource.details,
+            group=resource.group,
+            tags=resource.tags,
+            limits=resource.limits,
+            security=resource.security,
+            attributes=resource.attributes,
+        )
+
+
 class ResourceCache:
     def __init__(self):
         self.cache = Cache(
@@ -162,10 +337,38 @@ class ResourceProvider:
     def get_resources(self) -> List[Resource]:
         return []
 
+    def iter_resources(self) -> Iterable[Resource]:
+        """
+        Resources as they are found, providers able to produce them incrementally should override it
+        """
+        return self.get_resources() or []
+
+    async def get_resources_async(self) -> List[Resource]:
+        """
+        Resources for the asyncio backend, blocking providers run in the default executor of the event loop
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get_resources
+        )
+
     def get_relations(self) -> List[ResourceEdge]:
         return self.relations_found
 
 
+def run_async(coroutine, workers: int):
+    """
+    Runs coroutine on a new event loop, blocking SDK calls share a default executor of workers threads
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(workers)
+    loop.set_default_executor(executor)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        executor.shutdown(wait=True)
+        loop.close()
+
+
 def exit_critical(message):
     log_critical(message)
     raise SystemExit
@@ -238,6 +441,47 @@ def parse_filters(arg_filters) -> List[Filterable]:
     return filters
 
 
+class CompiledFilters(NamedTuple):
+    types: FrozenSet[str] = frozenset()
+    tags: Dict[str, FrozenSet[str]] = {}
+
+    def is_empty(self):
+        return not self.types and not self.tags
+
+    def matches(self, resource: "Resource") -> bool:
+        """
+        True when the resource matches either of the filters, in O(tags) time
+        """
+        if resource.digest.type in self.types:
+            return True
+        for resource_tag in resource.tags:
+            accepted_values = self.tags.get(resource_tag.key)
+            if accepted_values is not None and resource_tag.value in accepted_values:
+                return True
+        return False
+
+
+def compile_filters(
+    filters: Union[List[Filterable], CompiledFilters, None],
+) -> CompiledFilters:
+    if isinstance(filters, CompiledFilters):
+        return filters
+    if not filters:
+        return CompiledFilters()
+
+    types = set()
+    tags: Dict[str, Set[str]] = dict()
+    for resource_filter in filters:
+        if resource_filter.is_tag():
+            tags.setdefault(resource_filter.key, set()).add(resource_filter.value)
+        elif resource_filter.is_type():
+            types.add(resource_filter.type)
+    return CompiledFilters(
+        types=frozenset(types),
+        tags={key: frozenset(values) for key, values in tags.items()},
+    )
+
+
 class BaseCommand(ABC):
     def run(
         self,
@@ -42,6 +42,89 @@ def generate_parser():
     all_parser = subparsers.add_parser("aws-all", help="Analyze all resources")
     add_default_arguments(all_parser, diagram_enabled=False)
     add_services_argument(all_parser)
+    all_parser.add_argument(
+        "--streaming",
+        type=str2bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Stream resources to reports instead of keeping them in memory, sorting them on disk. \
+              Recommended for large accounts (default false)",
+    )
+    all_parser.add_argument(
+        "--operation-parallelism",
+        type=int,
+        required=False,
+        help="Number of listing operations of a single service called at the same time (default 8). \
+              Services share one pool of workers, so large services like EC2 are split across workers.",
+    )
+    all_parser.add_argument(
+        "--backend",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="Execution backend: thread pools or coroutines on one asyncio event loop per region, \
+              both bounded by the same limits (default threads). Not available with --streaming",
+    )
+    all_parser.add_argument(
+        "--incremental",
+        type=str2bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Record a snapshot of the inventory and report what changed since the previous one. \
+              Services without write events in CloudTrail since then are reused from it (default false)",
+    )
+    all_parser.add_argument(
+        "--resume",
+        type=str2bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Continue an interrupted run with the same regions, services and filters from its checkpoint, \
+              skipping completed regions, services and operations (default false)",
+    )
+    all_parser.add_argument(
+        "--checkpoint",
+        choices=["off", "services", "operations"],
+        nargs="?",
+        const="services",
+        default=None,
+        help="Checkpoint work as the run progresses so it can be resumed with --resume: completed services \
+              (default when informed) or completed listing operations (finer, more disk writes). \
+              Off unless informed or resuming, checkpoints add a serialization and a disk write of every result",
+    )
+    all_parser.add_argument(
+        "--plan",
+        required=False,
+        help="Discovery plan generated by aws-all-plan. \
+              If not informed, ./assets/plan/aws_all_plan.json is used when it exists.",
+    )
+
+    plan_parser = subparsers.add_parser(
+        "aws-all-plan", help="Generate, show or compare the aws-all discovery plan"
+    )
+    add_default_arguments(
+        plan_parser, is_global=True, diagram_enabled=False, filters_enabled=False
+    )
+    add_services_argument(plan_parser)
+    plan_parser.add_argument(
+        "--plan-file",
+        required=False,
+        help="Plan file to generate or read (default ./assets/plan/aws_all_plan.json)",
+    )
+    plan_parser.add_argument(
+        "--show",
+        type=str2bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Show the plan file instead of generating it, use --verbose to list operations",
+    )
+    plan_parser.add_argument(
+        "--diff",
+        required=False,
+        help="Older plan file to compare the plan file with, e.g. before a botocore upgrade",
+    )
 
     limit_parser = subparsers.add_parser(
         "aws-limit", help="Analyze aws limit resources."
@@ -55,6 +138,46 @@ def generate_parser():
         help="Select the %% of resource threshold between 0 and 100. \
               For example: --threshold 50 will report all resources with more than 50%% threshold.",
     )
+    limit_parser.add_argument(
+        "--quota-parallelism",
+        type=int,
+        required=False,
+        help="Number of quota listings of a region running at the same time (default 16), \
+              at most 4 of them for the same service",
+    )
+    limit_parser.add_argument(
+        "--monitor",
+        type=str2bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Keep running, re-evaluate quotas on schedule and serve them as OpenMetrics \
+              on http://METRICS_ADDRESS:METRICS_PORT/metrics",
+    )
+    limit_parser.add_argument(
+        "--metrics-address",
+        required=False,
+        help="Address the metrics are served on with --monitor (default 127.0.0.1)",
+    )
+    limit_parser.add_argument(
+        "--metrics-port",
+        type=int,
+        required=False,
+        help="Port the metrics are served on with --monitor (default 9464)",
+    )
+    limit_parser.add_argument(
+        "--interval",
+        type=int,
+        required=False,
+        help="Seconds between two evaluations of a quota with --monitor (default 300)",
+    )
+    limit_parser.add_argument(
+        "--quota-interval",
+        action="append",
+        required=False,
+        help="Seconds between two evaluations of one quota with --monitor, e.g. L-1216C47A=60. \
+              Can be passed several times.",
+    )
 
     security_parser = subparsers.add_parser(
         "aws-security", help="Analyze aws several security checks."
@@ -94,6 +217,13 @@ def add_default_arguments(
             help='Inform REGION NAME to analyze or "all" to check on all regions. \
             If not informed, try to get from config file',
         )
+        parser.add_argument(
+            "--region-parallelism",
+            type=int,
+            required=False,
+            help="Number of regions analyzed at the same time (default 4). \
+            API calls in flight are capped globally, no matter how many regions run in parallel.",
+        )
     parser.add_argument(
         "-p", "--profile-name", required=False, help="Profile to be used"
     )
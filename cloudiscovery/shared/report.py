@@ -1,14 +1,17 @@
 import base64
+import itertools
+import json
 import os
 import os.path
 from pathlib import Path
-from typing import List
+from typing import List, Iterable, Optional
 
 from jinja2 import Environment, FileSystemLoader
 
 from shared.common import Resource, ResourceEdge, message_handler
 from shared.diagram import PATH_DIAGRAM_OUTPUT
 from shared.error_handler import exception
+from shared.snapshot import ResourceDiff, PATH_SNAPSHOT_OUTPUT
 
 PATH_REPORT_HTML_OUTPUT = "./assets/html_report/"
 
@@ -20,7 +23,7 @@ class Report(object):
 
     @exception
     def general_report(
-        self, resources: List[Resource], resource_relations: List[ResourceEdge]
+        self, resources: Iterable[Resource], resource_relations: List[ResourceEdge]
     ):
 
         message_handler("\n\nFound resources", "HEADER")
@@ -97,7 +100,7 @@ class Report(object):
     @exception
     def html_report(
         self,
-        resources: List[Resource],
+        resources: Iterable[Resource],
         resource_relations: List[ResourceEdge],
         title: str,
         filename: str,
@@ -125,15 +128,19 @@ class Report(object):
                 diagramsnet_image = f"..{os.path.sep}..{os.path.sep}" + image_name
 
         group_title = "Group"
-        if resources:
-            if resources[0].limits:
-                html_output = dir_template.get_template("report_limits.html").render(
+        # resources may be a stream, peek the first one and render incrementally
+        resources_iterator = iter(resources)
+        first_resource = next(resources_iterator, None)
+        if first_resource is not None:
+            resources = itertools.chain([first_resource], resources_iterator)
+            if first_resource.limits:
+                html_output = dir_template.get_template("report_limits.html").stream(
                     default_name=title, resources_found=resources
                 )
             else:
-                if resources[0].attributes:
+                if first_resource.attributes:
                     group_title = "Service"
-                html_output = dir_template.get_template("report_html.html").render(
+                html_output = dir_template.get_template("report_html.html").stream(
                     default_name=title,
                     resources_found=resources,
                     resources_relations=resource_relations,
@@ -147,7 +154,48 @@ class Report(object):
             name_output = PATH_REPORT_HTML_OUTPUT + filename + ".html"
 
             with open(name_output, "w") as file_output:
-                file_output.write(html_output)
+                html_output.dump(file_output)
 
             message_handler("\n\nHTML report generated", "HEADER")
             message_handler("Check your HTML report: " + name_output, "OKBLUE")
+
+    @exception
+    def diff_report(self, resource_diff: Optional[ResourceDiff], filename: str):
+        if resource_diff is None:
+            message_handler(
+                "\n\nFirst snapshot recorded, next incremental run will report changes",
+                "HEADER",
+            )
+            return
+
+        message_handler(
+            "\n\nChanges since previous snapshot: {} added, {} removed, {} changed".format(
+                len(resource_diff.added),
+                len(resource_diff.removed),
+                len(resource_diff.changed),
+            ),
+            "HEADER",
+        )
+        for sign, digests, position in [
+            ("+", resource_diff.added, "OKGREEN"),
+            ("-", resource_diff.removed, "FAIL"),
+            ("~", resource_diff.changed, "WARNING"),
+        ]:
+            for digest in digests:
+                message_handler(
+                    "{} type: {} - id: {}".format(sign, digest.type, digest.id),
+                    position,
+                )
+
+        Path(PATH_SNAPSHOT_OUTPUT).mkdir(parents=True, exist_ok=True)
+        name_output = PATH_SNAPSHOT_OUTPUT + filename + "_diff.json"
+        with open(name_output, "w", encoding="utf-8") as file_output:
+            json.dump(
+                {
+                    change: [digest._asdict() for digest in digests]
+                    for change, digests in resource_diff._asdict().items()
+                },
+                file_output,
+                indent=2,
+            )
+        message_handler("Check your diff report: " + name_output, "OKBLUE")
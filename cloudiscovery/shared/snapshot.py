@@ -0,0 +1,248 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Dict, List, Optional, Set, Iterable
+
+from shared.common import (
+    Resource,
+    ResourceDigest,
+    Filterable,
+    CompactResource,
+)
+
+PATH_SNAPSHOT_OUTPUT = "./assets/snapshots/"
+DEFAULT_SNAPSHOT_DB = PATH_SNAPSHOT_OUTPUT + "snapshots.db"
+
+SNAPSHOT_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS snapshots ("
+    "key TEXT PRIMARY KEY, taken_at REAL NOT NULL, groups TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS resources ("
+    "key TEXT NOT NULL, resource_type TEXT NOT NULL, resource_id TEXT NOT NULL, "
+    "resource_group TEXT NOT NULL, fingerprint TEXT NOT NULL, resource BLOB NOT NULL, "
+    "PRIMARY KEY (key, resource_type, resource_id))",
+    "CREATE INDEX IF NOT EXISTS resources_group ON resources (key, resource_group)",
+]
+
+
+class ResourceDiff(NamedTuple):
+    added: List[ResourceDigest]
+    removed: List[ResourceDigest]
+    changed: List[ResourceDigest]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def snapshot_key(name: str, filters: Optional[List[Filterable]] = None) -> str:
+    """
+    Key of the snapshots of a command, e.g. account_region_command
+
+    Filtered runs only see part of the inventory, they are kept apart from unfiltered ones.
+    """
+    if not filters:
+        return name
+    filters_digest = hashlib.sha256(
+        repr(sorted(repr(resource_filter) for resource_filter in filters)).encode()
+    ).hexdigest()
+    return "{}_{}".format(name, filters_digest[:12])
+
+
+def resource_fingerprint(resource: Resource) -> str:
+    attributes = sorted(
+        (key, repr(value)) for key, value in resource.attributes.items()
+    )
+    tags = sorted((tag.key, repr(tag.value)) for tag in resource.tags)
+    content = repr(
+        (
+            resource.name,
+            resource.details,
+            resource.group,
+            tags,
+            attributes,
+            resource.limits,
+            resource.security,
+        )
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def diff_fingerprints(
+    previous: Dict[ResourceDigest, str], current: Dict[ResourceDigest, str]
+) -> ResourceDiff:
+    return ResourceDiff(
+        added=sorted(set(current) - set(previous)),
+        removed=sorted(set(previous) - set(current)),
+        changed=sorted(
+            digest
+            for digest, fingerprint in current.items()
+            if digest in previous and previous[digest] != fingerprint
+        ),
+    )
+
+
+class SnapshotStore:
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_DB):
+        """
+        SQLite store of the last inventory recorded for each snapshot key
+
+        :param path:
+        """
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a connection per call, regions record their snapshots from different threads
+        connection = sqlite3.connect(self.path, timeout=60)
+        for statement in SNAPSHOT_SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def taken_at(self, key: str) -> Optional[float]:
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT taken_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row is not None else None
+
+    def groups(self, key: str) -> Set[str]:
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT groups FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None or not row[0]:
+            return set()
+        return set(row[0].split(","))
+
+    def fingerprints(self, key: str) -> Dict[ResourceDigest, str]:
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                "SELECT resource_type, resource_id, fingerprint FROM resources "
+                "WHERE key = ?",
+                (key,),
+            ).fetchall()
+        finally:
+            connection.close()
+        return {
+            ResourceDigest(id=resource_id, type=resource_type): fingerprint
+            for resource_type, resource_id, fingerprint in rows
+        }
+
+    def load_resources(self, key: str, group: str) -> List[Resource]:
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                "SELECT resource FROM resources WHERE key = ? AND resource_group = ?",
+                (key, group),
+            ).fetchall()
+        finally:
+            connection.close()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def save(
+        self,
+        key: str,
+        resources: Iterable[Resource],
+        groups: Iterable[str],
+        taken_at: float,
+    ) -> Dict[ResourceDigest, str]:
+        """
+        Replaces the snapshot of key, returns fingerprints of the recorded resources
+
+        Resources are streamed to the database. Only the given groups can be reused by the next run.
+        """
+        fingerprints: Dict[ResourceDigest, str] = dict()
+
+        def rows():
+            for resource in resources:
+                fingerprint = resource_fingerprint(resource)
+                fingerprints[resource.digest] = fingerprint
+                yield (
+                    key,
+                    resource.digest.type,
+                    resource.digest.id,
+                    resource.group,
+                    fingerprint,
+                    pickle.dumps(
+                        CompactResource.from_resource(resource),
+                        pickle.HIGHEST_PROTOCOL,
+                    ),
+                )
+
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM resources WHERE key = ?", (key,))
+                connection.executemany(
+                    "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?)",
+                    rows(),
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                    (key, taken_at, ",".join(sorted(groups))),
+                )
+        finally:
+            connection.close()
+        return fingerprints
+
+
+class Snapshot:
+    def __init__(self, store: SnapshotStore, key: str):
+        """
+        Inventory of one run of a command, compared with the previous run of the same key and recorded over it
+
+        Resources of groups known unchanged since the previous run can be reused instead of being discovered.
+
+        :param store:
+        :param key:
+        """
+        self.store = store
+        self.key = key
+        self.taken_at = time.time()
+        self.previous_taken_at = store.taken_at(key)
+        self.previous_groups: Set[str] = set()
+        if self.previous_taken_at is not None:
+            self.previous_groups = store.groups(key)
+        self.groups: Set[str] = set()
+        self.reused_groups: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def add_group(self, group: str):
+        """
+        Marks group as fully discovered by this run
+        """
+        with self.lock:
+            self.groups.add(group)
+
+    def reusable(self, group: str) -> bool:
+        return group in self.previous_groups
+
+    def reuse(self, group: str) -> List[Resource]:
+        resources = self.store.load_resources(self.key, group)
+        with self.lock:
+            self.groups.add(group)
+            self.reused_groups.add(group)
+        return resources
+
+    def record(self, resources: Iterable[Resource]) -> Optional[ResourceDiff]:
+        """
+        Records resources as the new snapshot, returns what changed since the previous one if there was one
+        """
+        previous = None
+        if self.previous_taken_at is not None:
+            previous = self.store.fingerprints(self.key)
+        current = self.store.save(self.key, resources, self.groups, self.taken_at)
+        if previous is None:
+            return None
+        return diff_fingerprints(previous, current)
@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Callable, Iterator, List, Optional, Dict, Tuple, Set
+
+from shared.common import Resource
+
+SPOOL_RUN_SIZE = 10000
+
+
+def read_run(path: str) -> Iterator[Tuple[object, Resource]]:
+    with open(path, "rb") as run_file:
+        while True:
+            try:
+                yield pickle.load(run_file)
+            except EOFError:
+                return
+
+
+class ResourceSpool:
+    def __init__(
+        self,
+        sort_key: Optional[Callable] = None,
+        run_size: int = SPOOL_RUN_SIZE,
+        unique_key: Optional[Callable] = None,
+    ):
+        """
+        On-disk buffer of resources with an external merge sort
+
+        Resources are written in sorted runs of run_size items, so at most one run is kept in memory.
+        Iterating merges the runs back, it can be done more than once.
+        With unique_key, only the occurrence of a key with the highest position is read back.
+
+        :param sort_key:
+        :param run_size:
+        :param unique_key:
+        """
+        self.sort_key = sort_key
+        self.run_size = run_size
+        self.unique_key = unique_key
+        self.directory = tempfile.mkdtemp(prefix="cloudiscovery_")
+        self.runs: List[str] = []
+        self.buffer: List[Tuple[object, Resource]] = []
+        self.count = 0
+        # key -> (position of the latest occurrence, whether it was appended)
+        self.latest: Dict[object, Tuple[object, bool]] = dict()
+
+    def supersedes(self, key, position) -> bool:
+        return key not in self.latest or self.latest[key][0] < position
+
+    def append(self, resource: Resource, position=None):
+        if position is None:
+            position = self.count
+        self.count = self.count + 1
+        if self.unique_key is not None:
+            key = self.unique_key(resource)
+            if not self.supersedes(key, position):
+                return
+            self.latest[key] = (position, True)
+        self.buffer.append((position, resource))
+        if len(self.buffer) >= self.run_size:
+            self.flush()
+
+    def skip(self, key, position):
+        """
+        Records an occurrence of key that is not kept, older occurrences are no longer read back
+        """
+        if self.supersedes(key, position):
+            self.latest[key] = (position, False)
+
+    def keys(self) -> Set[object]:
+        return {key for key, (_, appended) in self.latest.items() if appended}
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.sort_key is not None:
+            self.buffer.sort(key=self.entry_sort_key)
+        path = os.path.join(self.directory, "run_{}".format(len(self.runs)))
+        with open(path, "wb") as run_file:
+            for entry in self.buffer:
+                pickle.dump(entry, run_file, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+
+    def entry_sort_key(self, entry: Tuple[object, Resource]):
+        return self.sort_key(entry[1])
+
+    def is_latest(self, entry: Tuple[object, Resource]) -> bool:
+        if self.unique_key is None:
+            return True
+        position, resource = entry
+        return self.latest.get(self.unique_key(resource)) == (position, True)
+
+    def __len__(self):
+        if self.unique_key is not None:
+            return len(self.keys())
+        return self.count
+
+    def __iter__(self) -> Iterator[Resource]:
+        self.flush()
+        readers = [read_run(path) for path in self.runs]
+        if self.sort_key is not None:
+            entries = heapq.merge(*readers, key=self.entry_sort_key)
+        else:
+            entries = itertools.chain(*readers)
+        return (entry[1] for entry in entries if self.is_latest(entry))
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
@@ -1,14 +1,124 @@
+import tempfile
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 
 from assertpy import assert_that
+from botocore.exceptions import ClientError
 
+from provider.aws.all.command import is_resumable_error
 from provider.aws.all.resource.all import (
     retrieve_resource_name,
     retrieve_resource_id,
     last_singular_name_element,
+    service_may_produce_types,
+    type_pushdown,
+    ec2_tag_pushdown,
+    AllResources,
+    OperationScheduler,
+    build_resource,
+    build_resources,
+    resolve_keys,
+)
+from provider.aws.all.naming import build_resource_type
+from provider.aws.all.plan import (
+    PlannedOperation,
+    ServicePlan,
+    DiscoveryPlan,
     operation_allowed,
-    build_resource_type,
 )
+from shared.checkpoint import Checkpoint, CHECKPOINT_OPERATIONS
+from shared.common import (
+    Filterable,
+    compile_filters,
+    CompactResource,
+    Resource,
+    ResourceDigest,
+    run_async,
+)
+
+ECS_RESOURCE_IDS = [
+    "cluster-1",
+    "cluster-2",
+    "cluster-1/ListServices",
+    "cluster-2/ListServices",
+    "cluster-1/ListTasks",
+    "cluster-2/ListTasks",
+]
+
+ECS_SERVICE_PLAN = ServicePlan(
+    service_name="ecs",
+    service_full_name="Amazon EC2 Container Service",
+    operations={
+        "ListClusters": PlannedOperation(
+            name="ListClusters",
+            snake_name="list_clusters",
+            resource_type="aws_ecs_cluster",
+            has_paginator=True,
+        ),
+        "ListServices": PlannedOperation(
+            name="ListServices",
+            snake_name="list_services",
+            resource_type="aws_ecs_service",
+            has_paginator=True,
+            required_field="cluster",
+            parent_operation="ListClusters",
+        ),
+        "ListTasks": PlannedOperation(
+            name="ListTasks",
+            snake_name="list_tasks",
+            resource_type="aws_ecs_task",
+            has_paginator=True,
+            required_field="cluster",
+            parent_operation="ListClusters",
+        ),
+    },
+)
+
+
+# pylint: disable=unused-argument,too-many-arguments
+def retrieve_ecs_resources(
+    resource_type,
+    operation_name,
+    has_paginator,
+    client,
+    service_full_name,
+    aws_service,
+    operation_parameters,
+):
+    if operation_name == "ListClusters":
+        ids = ["cluster-1", "cluster-2"]
+    else:
+        ids = [operation_parameters["cluster"] + "/" + operation_name]
+    return [
+        Resource(digest=ResourceDigest(id=id, type=resource_type), name=id)
+        for id in ids
+    ]
+
+
+def stubbed_all_resources() -> AllResources:
+    options = MagicMock()
+    options.filters = []
+    options.checkpoint = None
+    options.region_name = "us-east-1"
+    options.services = ["ecs"]
+    options.verbose = False
+    options.operation_parallelism = 2
+    options.snapshot = None
+    options.plan = DiscoveryPlan(
+        botocore_version="1.0.0",
+        policies_digest="",
+        services={"ecs": ECS_SERVICE_PLAN},
+    )
+    all_resources = AllResources(options)
+    all_resources.availabilityCheck = MagicMock()
+    all_resources.availabilityCheck.is_service_available.return_value = True
+    all_resources.retrieve_operation_resources = MagicMock(
+        side_effect=retrieve_ecs_resources
+    )
+    return all_resources
 
 
 class TestAllDiagram(TestCase):
@@ -56,6 +166,27 @@ class TestAllDiagram(TestCase):
             retrieve_resource_id({"someArn": "123"}, "ListValues", "value")
         ).is_equal_to("123")
 
+    def test_retrieve_resource_id_resolved_once_per_shape(self):
+        resolve_keys.cache_clear()
+        for index in range(3):
+            assert_that(
+                retrieve_resource_id(
+                    {"ClusterArn": "arn-{}".format(index), "Status": "ACTIVE"},
+                    "ListClusters",
+                    None,
+                )
+            ).is_equal_to("arn-{}".format(index))
+        assert_that(resolve_keys.cache_info().misses).is_equal_to(1)
+        assert_that(resolve_keys.cache_info().hits).is_equal_to(2)
+
+        # a key found by its suffix is skipped when its value is empty
+        assert_that(
+            retrieve_resource_id(
+                {"someId": "", "someArn": "arn"}, "ListValues", "value"
+            )
+        ).is_equal_to("arn")
+        assert_that(retrieve_resource_name({"SomeName": None}, "ListValues")).is_none()
+
     def test_operation_allowed(self):
         assert_that(operation_allowed(["iam:List*"], "iam", "ListRoles")).is_equal_to(
             True
@@ -68,3 +199,314 @@ class TestAllDiagram(TestCase):
         assert_that(build_resource_type("rds", "DescribeDBParameterGroup")).is_equal_to(
             "aws_rds_db_parameter_group"
         )
+
+    def test_type_pushdown(self):
+        types = type_pushdown(compile_filters([Filterable(type="aws_ec2_instance")]))
+        assert_that(types).contains_only("aws_ec2_instance")
+        assert_that(service_may_produce_types("ec2", types)).is_true()
+        assert_that(service_may_produce_types("lambda", types)).is_false()
+        assert_that(
+            type_pushdown(
+                compile_filters(
+                    [
+                        Filterable(type="aws_ec2_instance"),
+                        Filterable(key="costCenter", value="20000"),
+                    ]
+                )
+            )
+        ).is_none()
+
+    def test_ec2_tag_pushdown(self):
+        assert_that(
+            ec2_tag_pushdown(
+                compile_filters(
+                    [
+                        Filterable(key="costCenter", value="20001"),
+                        Filterable(key="costCenter", value="20000"),
+                    ]
+                )
+            )
+        ).is_equal_to([{"Name": "tag:costCenter", "Values": ["20000", "20001"]}])
+        assert_that(
+            ec2_tag_pushdown(
+                compile_filters(
+                    [
+                        Filterable(key="costCenter", value="20000"),
+                        Filterable(key="owner", value="team"),
+                    ]
+                )
+            )
+        ).is_none()
+
+    def test_run_service_plan_pushdown(self):
+        options = MagicMock()
+        options.checkpoint = None
+        options.filters = [Filterable(key="costCenter", value="20000")]
+        all_resources = AllResources(options)
+        all_resources.retrieve_operation_resources = MagicMock(return_value=[])
+        planned_operation = PlannedOperation(
+            name="DescribeVolumes",
+            snake_name="describe_volumes",
+            resource_type="aws_ec2_volume",
+            has_paginator=False,
+            supports_tag_filters=True,
+        )
+        service_plan = ServicePlan(
+            service_name="ec2",
+            service_full_name="Amazon EC2",
+            operations={"DescribeVolumes": planned_operation},
+        )
+
+        with ThreadPoolExecutor(2) as executor:
+            all_resources.run_service_plan(
+                service_plan, MagicMock(), OperationScheduler(executor, 2)
+            )
+
+        call_parameters = all_resources.retrieve_operation_resources.call_args[0][6]
+        assert_that(call_parameters).is_equal_to(
+            {"Filters": [{"Name": "tag:costCenter", "Values": ["20000"]}]}
+        )
+
+        options.filters = [Filterable(type="aws_ec2_instance")]
+        all_resources = AllResources(options)
+        all_resources.retrieve_operation_resources = MagicMock(return_value=[])
+        with ThreadPoolExecutor(2) as executor:
+            all_resources.run_service_plan(
+                service_plan, MagicMock(), OperationScheduler(executor, 2)
+            )
+        all_resources.retrieve_operation_resources.assert_not_called()
+
+    def test_retrieve_operation_resources_filter_fallback(self):
+        all_resources = AllResources(MagicMock())
+        filters = [{"Name": "tag:costCenter", "Values": ["20000"]}]
+
+        def describe_volumes(**kwargs):
+            if "Filters" in kwargs:
+                raise ClientError(
+                    {"Error": {"Code": "InvalidParameterValue"}}, "DescribeVolumes"
+                )
+            return {"Volumes": [{"VolumeId": "vol-1"}]}
+
+        client = MagicMock()
+        client.describe_volumes.side_effect = describe_volumes
+        with patch("provider.aws.all.exception.log_critical") as log_critical:
+            resources = all_resources.retrieve_operation_resources(
+                "aws_ec2_volume",
+                "DescribeVolumes",
+                False,
+                client,
+                "Amazon EC2",
+                "ec2",
+                {"Filters": filters},
+            )
+        assert_that([resource.digest.id for resource in resources]).is_equal_to(
+            ["vol-1"]
+        )
+        assert_that(client.describe_volumes.call_count).is_equal_to(2)
+        log_critical.assert_not_called()
+
+        client = MagicMock()
+        client.describe_volumes.side_effect = ClientError(
+            {"Error": {"Code": "UnauthorizedOperation"}}, "DescribeVolumes"
+        )
+        with patch("provider.aws.all.exception.log_critical") as log_critical:
+            resources = all_resources.retrieve_operation_resources(
+                "aws_ec2_volume",
+                "DescribeVolumes",
+                False,
+                client,
+                "Amazon EC2",
+                "ec2",
+                {"Filters": filters},
+            )
+        assert_that(resources).is_none()
+        assert_that(client.describe_volumes.call_count).is_equal_to(1)
+        log_critical.assert_called_once()
+
+    def test_run_service_plan_lists_parents_once(self):
+        all_resources = stubbed_all_resources()
+
+        with ThreadPoolExecutor(4) as executor:
+            resources = all_resources.run_service_plan(
+                ECS_SERVICE_PLAN, MagicMock(), OperationScheduler(executor, 2)
+            )
+
+        called_operations = [
+            call[0][1]
+            for call in all_resources.retrieve_operation_resources.call_args_list
+        ]
+        assert_that(called_operations.count("ListClusters")).is_equal_to(1)
+        assert_that(called_operations.count("ListServices")).is_equal_to(2)
+        assert_that(called_operations.count("ListTasks")).is_equal_to(2)
+        assert_that([resource.digest.id for resource in resources]).contains_only(
+            *ECS_RESOURCE_IDS
+        )
+
+    def test_backends_parity(self):
+        threads_resources = stubbed_all_resources().get_resources()
+        asyncio_all_resources = stubbed_all_resources()
+        asyncio_resources = run_async(asyncio_all_resources.get_resources_async(), 4)
+
+        threads_ids = sorted(resource.digest.id for resource in threads_resources)
+        asyncio_ids = sorted(resource.digest.id for resource in asyncio_resources)
+        assert_that(asyncio_ids).is_equal_to(threads_ids)
+        assert_that(asyncio_ids).is_equal_to(sorted(ECS_RESOURCE_IDS))
+        retrieve_calls = (
+            asyncio_all_resources.retrieve_operation_resources.call_args_list
+        )
+        called_operations = [call[0][1] for call in retrieve_calls]
+        assert_that(called_operations.count("ListClusters")).is_equal_to(1)
+        assert_that(asyncio_all_resources.critical_path_service()).is_equal_to("ecs")
+
+    def test_incremental_reuses_unchanged_services(self):
+        reused = [Resource(digest=ResourceDigest(id="cluster-0", type="t"), name="c")]
+        all_resources = stubbed_all_resources()
+        all_resources.options.snapshot = MagicMock()
+        all_resources.options.snapshot.reusable.return_value = True
+        all_resources.options.snapshot.reuse.return_value = reused
+        all_resources.options.event_sources = {"ec2"}
+
+        assert_that(all_resources.get_resources()).is_equal_to(reused)
+        all_resources.retrieve_operation_resources.assert_not_called()
+
+        all_resources.options.event_sources = {"ecs"}
+        resources = all_resources.get_resources()
+        assert_that(resources).is_length(len(ECS_RESOURCE_IDS))
+        all_resources.options.snapshot.add_group.assert_called_once_with("ecs")
+
+    def test_resume_from_checkpoint(self):
+        def interrupted(*args):
+            if args[1] == "ListTasks" and args[6]["cluster"] == "cluster-2":
+                raise ConnectionError("network blip")
+            return retrieve_ecs_resources(*args)
+
+        with tempfile.TemporaryDirectory() as directory:
+            all_resources = stubbed_all_resources()
+            all_resources.options.checkpoint = Checkpoint(
+                "run", level=CHECKPOINT_OPERATIONS, path=directory
+            )
+            all_resources.retrieve_operation_resources.side_effect = interrupted
+            assert_that(all_resources.get_resources()).is_empty()
+            all_resources.options.checkpoint.close()
+
+            resumed_resources = stubbed_all_resources()
+            checkpoint = Checkpoint(
+                "run", resume=True, level=CHECKPOINT_OPERATIONS, path=directory
+            )
+            resumed_resources.options.checkpoint = checkpoint
+            resources = resumed_resources.get_resources()
+            assert_that(
+                sorted(resource.digest.id for resource in resources)
+            ).is_equal_to(sorted(ECS_RESOURCE_IDS))
+            # only the failed operation is called again
+            retrieve_calls = (
+                resumed_resources.retrieve_operation_resources.call_args_list
+            )
+            assert_that(retrieve_calls).is_length(1)
+            assert_that(retrieve_calls[0][0][1]).is_equal_to("ListTasks")
+
+            resources = stubbed_all_resources()
+            resources.options.checkpoint = checkpoint
+            assert_that(resources.get_resources()).is_length(len(ECS_RESOURCE_IDS))
+            resources.retrieve_operation_resources.assert_not_called()
+            checkpoint.close()
+
+    def test_resume_completed_services(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint("run", path=directory)
+            all_resources = stubbed_all_resources()
+            all_resources.options.checkpoint = checkpoint
+            assert_that(all_resources.get_resources()).is_length(len(ECS_RESOURCE_IDS))
+            # only the service is checkpointed, not its operations too
+            assert_that(checkpoint).is_length(1)
+            checkpoint.close()
+
+            checkpoint = Checkpoint("run", resume=True, path=directory)
+            resumed_resources = stubbed_all_resources()
+            resumed_resources.options.checkpoint = checkpoint
+            resources = resumed_resources.get_resources()
+            assert_that(
+                sorted(resource.digest.id for resource in resources)
+            ).is_equal_to(sorted(ECS_RESOURCE_IDS))
+            resumed_resources.retrieve_operation_resources.assert_not_called()
+            checkpoint.close()
+
+    def test_resumable_errors(self):
+        throttled = ClientError({"Error": {"Code": "Throttling"}}, "ListClusters")
+        denied = ClientError({"Error": {"Code": "AccessDenied"}}, "ListClusters")
+
+        assert_that(is_resumable_error(KeyboardInterrupt())).is_true()
+        assert_that(is_resumable_error(throttled)).is_true()
+        assert_that(is_resumable_error(denied)).is_false()
+        assert_that(is_resumable_error(ValueError("bug"))).is_false()
+
+    def test_operation_scheduler_caps_service(self):
+        in_flight = []
+        max_in_flight = []
+        lock = threading.Lock()
+
+        def operation():
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+
+        with ThreadPoolExecutor(8) as executor:
+            scheduler = OperationScheduler(executor, 2)
+            futures = [scheduler.submit(operation) for _ in range(10)]
+            for future in futures:
+                future.result()
+
+        assert_that(max(max_in_flight)).is_less_than_or_equal_to(2)
+
+    def test_critical_path_service(self):
+        options = MagicMock()
+        options.filters = []
+        all_resources = AllResources(options)
+        assert_that(all_resources.critical_path_service()).is_none()
+
+        all_resources.service_durations = {"ec2": 12.0, "iam": 3.0, "sqs": 0.5}
+        assert_that(all_resources.critical_path_service()).is_equal_to("ec2")
+
+    def test_build_resource_lazy_attributes(self):
+        resource = build_resource(
+            {"FunctionName": "name", "VpcConfig": {"VpcId": "vpc-1"}},
+            "ListFunctions",
+            "aws_lambda_function",
+            "lambda",
+        )
+
+        assert_that(resource.attributes.decoded).is_none()
+        compact = CompactResource.from_resource(resource)
+        assert_that(resource.attributes.decoded).is_none()
+
+        assert_that(dict(compact.attributes)).is_equal_to(
+            {"FunctionName": "name", "VpcConfig.VpcId": "vpc-1"}
+        )
+        assert_that(resource.attributes["VpcConfig.VpcId"]).is_equal_to("vpc-1")
+
+    def test_build_resources(self):
+        functions = [
+            {"FunctionName": "function-{}".format(index), "FunctionArn": "arn"}
+            for index in range(25)
+        ] + [{"Unnamed": True}]
+        expected = [
+            build_resource(item, "ListFunctions", "aws_lambda_function", "lambda")
+            for item in functions
+        ]
+        resources = build_resources(
+            functions, "ListFunctions", "aws_lambda_function", "lambda"
+        )
+
+        assert_that(resources).is_length(25)
+        assert_that(
+            [(resource.digest, resource.name) for resource in resources]
+        ).is_equal_to(
+            [
+                (resource.digest, resource.name)
+                for resource in expected
+                if resource is not None
+            ]
+        )
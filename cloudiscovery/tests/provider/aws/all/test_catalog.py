@@ -0,0 +1,48 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from assertpy import assert_that
+from botocore.loaders import Loader
+
+from provider.aws.all.catalog import build_service_catalog, OperationCatalog
+
+
+class TestCatalog(TestCase):
+    def test_build_service_catalog(self):
+        service_catalog = build_service_catalog(Loader(), "sqs")
+
+        assert_that(service_catalog.service_full_name).is_equal_to(
+            "Amazon Simple Queue Service"
+        )
+        assert_that(service_catalog.operations).contains_key("ListQueues")
+        assert_that(service_catalog.operations).does_not_contain_key("CreateQueue")
+        list_queues = service_catalog.operations["ListQueues"]
+        assert_that(list_queues.snake_name).is_equal_to("list_queues")
+        assert_that(list_queues.resource_type).is_equal_to("aws_sqs_queue")
+        assert_that(
+            service_catalog.operations["ListQueueTags"].required_fields
+        ).is_equal_to(["QueueUrl"])
+
+    def test_tag_filter_support(self):
+        service_catalog = build_service_catalog(Loader(), "ec2")
+
+        assert_that(
+            service_catalog.operations["DescribeVolumes"].supports_tag_filters
+        ).is_true()
+        assert_that(
+            service_catalog.operations["DescribeSubnets"].supports_tag_filters
+        ).is_true()
+        assert_that(
+            service_catalog.operations["DescribeAvailabilityZones"].supports_tag_filters
+        ).is_false()
+
+    def test_service_is_built_once(self):
+        catalog = OperationCatalog()
+        catalog.cache = MagicMock()
+        catalog.cache.get_key.return_value = None
+
+        first = catalog.service("sqs")
+        second = catalog.service("sqs")
+
+        assert_that(second).is_same_as(first)
+        catalog.cache.set_key.assert_called_once()
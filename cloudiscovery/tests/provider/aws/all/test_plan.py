@@ -0,0 +1,86 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from provider.aws.all.catalog import ListingOperation, ServiceCatalog
+from provider.aws.all.plan import (
+    plan_service,
+    DiscoveryPlan,
+    save_plan,
+    load_plan,
+    diff_plans,
+    policies_digest,
+)
+
+
+def listing_operation(name, resource_type, required_fields=None):
+    return ListingOperation(
+        name=name,
+        snake_name=name.lower(),
+        resource_type=resource_type,
+        has_paginator=True,
+        required_fields=required_fields or [],
+    )
+
+
+SERVICE_CATALOG = ServiceCatalog(
+    service_name="ecs",
+    service_full_name="Amazon EC2 Container Service",
+    operations={
+        "ListClusters": listing_operation("ListClusters", "aws_ecs_cluster"),
+        "ListServices": listing_operation(
+            "ListServices", "aws_ecs_service", ["cluster"]
+        ),
+        "DescribeTasks": listing_operation(
+            "DescribeTasks", "aws_ecs_task", ["cluster", "tasks"]
+        ),
+        "ListAccountSettings": listing_operation(
+            "ListAccountSettings", "aws_ecs_account_setting"
+        ),
+    },
+)
+
+
+class TestPlan(TestCase):
+    def test_plan_service(self):
+        service_plan = plan_service(SERVICE_CATALOG, ["ecs:List*"])
+
+        assert_that(service_plan.operations).is_length(3)
+        assert_that(service_plan.operations).does_not_contain_key("DescribeTasks")
+        assert_that(service_plan.operations["ListServices"].required_field).is_equal_to(
+            "cluster"
+        )
+        assert_that(
+            service_plan.operations["ListServices"].parent_operation
+        ).is_equal_to("ListClusters")
+
+        service_plan = plan_service(SERVICE_CATALOG, ["ecs:ListServices"])
+        assert_that(service_plan.operations).is_empty()
+
+    def test_save_and_diff_plans(self):
+        old_plan = DiscoveryPlan(
+            botocore_version="1.0.0",
+            policies_digest=policies_digest(["ecs:List*"]),
+            services={"ecs": plan_service(SERVICE_CATALOG, ["ecs:List*"])},
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            plan_file = os.path.join(directory, "plan", "aws_all_plan.json")
+            save_plan(old_plan, plan_file)
+            assert_that(load_plan(plan_file)).is_equal_to(old_plan)
+
+        new_service_plan = plan_service(SERVICE_CATALOG, ["ecs:ListClusters"])
+        new_plan = DiscoveryPlan(
+            botocore_version="1.1.0",
+            policies_digest=old_plan.policies_digest,
+            services={"ecs": new_service_plan, "sqs": new_service_plan},
+        )
+
+        plan_diff = diff_plans(old_plan, new_plan)
+        assert_that(plan_diff.added_services).is_equal_to(["sqs"])
+        assert_that(plan_diff.removed_operations).is_equal_to(
+            ["ecs:ListAccountSettings", "ecs:ListServices"]
+        )
+        assert_that(plan_diff.is_empty()).is_false()
+        assert_that(diff_plans(old_plan, old_plan).is_empty()).is_true()
@@ -0,0 +1,98 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from assertpy import assert_that
+from botocore.exceptions import ClientError
+
+from provider.aws.limit.command import LimitParameters, limits_cache_key
+from provider.aws.limit.resource.all import LimitResources
+
+
+class MemoryCache:
+    def __init__(self):
+        self.values = dict()
+
+    def set_key(self, key, value, expire):
+        self.values[key] = value
+
+    def get_key(self, key):
+        return self.values.get(key)
+
+
+def quota(quota_code, value, adjustable=True):
+    return {
+        "QuotaCode": quota_code,
+        "QuotaName": "Quota " + quota_code,
+        "Value": value,
+        "Adjustable": adjustable,
+    }
+
+
+class NoSuchResourceException(ClientError):
+    pass
+
+
+def quotas_client(pages):
+    client = MagicMock()
+    client.get_paginator.return_value.paginate.return_value = pages
+    return client
+
+
+class TestLimit(TestCase):
+    @patch("provider.aws.limit.command.get_client")
+    def test_default_quotas_listed_once_per_service(self, get_client):
+        client = quotas_client(
+            [
+                {"Quotas": [quota("L-F141DD1D", 2500), quota("L-OTHER", 5)]},
+                {"Quotas": [quota("L-LAST", 10)]},
+            ]
+        )
+        get_client.return_value = client
+        parameters = LimitParameters(
+            session=MagicMock(),
+            region="us-east-1",
+            services=["acm"],
+            options=MagicMock(verbose=False, parallelism=4),
+        )
+        parameters.cache = MemoryCache()
+
+        parameters.init_globalaws_limits_cache()
+
+        client.get_paginator.assert_called_once_with("list_aws_default_service_quotas")
+        assert_that(
+            parameters.cache.get_key(limits_cache_key("acm", "us-east-1"))
+        ).is_equal_to(
+            {
+                "acm": [
+                    {
+                        "value": 2500,
+                        "adjustable": True,
+                        "quota_code": "L-F141DD1D",
+                        "quota_name": "Quota L-F141DD1D",
+                    }
+                ]
+            }
+        )
+
+        # cached services are not listed again
+        parameters.init_globalaws_limits_cache()
+        assert_that(client.get_paginator.call_count).is_equal_to(1)
+
+    def test_applied_quotas(self):
+        client = quotas_client(
+            [{"Quotas": [quota("L-F141DD1D", 5000), {"QuotaCode": "L-NOVALUE"}]}]
+        )
+
+        assert_that(LimitResources.applied_quotas("acm", client)).is_equal_to(
+            {"L-F141DD1D": 5000}
+        )
+        client.get_paginator.assert_called_once_with("list_service_quotas")
+
+    def test_applied_quotas_fall_back_to_defaults(self):
+        client = quotas_client([])
+        client.exceptions.NoSuchResourceException = NoSuchResourceException
+        client.get_paginator.return_value.paginate.side_effect = ClientError(
+            {"Error": {"Code": "TooManyRequestsException"}}, "ListServiceQuotas"
+        )
+
+        assert_that(LimitResources.applied_quotas("acm", client)).is_empty()
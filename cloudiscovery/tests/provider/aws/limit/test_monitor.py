@@ -0,0 +1,127 @@
+import threading
+import urllib.request
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from provider.aws.limit.monitor import (
+    LimitMetrics,
+    MetricsServer,
+    QuotaSchedule,
+    OPENMETRICS_CONTENT_TYPE,
+)
+from shared.common import Resource, ResourceDigest, LimitsValues
+
+
+def limit_resource(quota_code, usage, percent, quota_name="Running instances"):
+    return Resource(
+        digest=ResourceDigest(id=quota_code, type="aws_limit"),
+        name="",
+        group="",
+        limits=LimitsValues(
+            service="ec2",
+            quota_name=quota_name,
+            quota_code=quota_code,
+            aws_limit=5,
+            local_limit=100,
+            usage=usage,
+            percent=percent,
+        ),
+    )
+
+
+class TestMonitor(TestCase):
+    def test_quota_intervals(self):
+        schedule = QuotaSchedule(300, {"L-F141DD1D": 30})
+
+        assert_that(schedule.interval("acm", "L-F141DD1D")).is_equal_to(30)
+        # interval of the quota definition
+        assert_that(schedule.interval("ec2", "L-1216C47A")).is_equal_to(60)
+        assert_that(schedule.interval("ec2", "L-34B43A08")).is_equal_to(300)
+
+        due_quotas = schedule.due("us-east-1", ["acm", "ses"], now=1000)
+        assert_that(due_quotas).is_equal_to(
+            {"acm": {"L-F141DD1D"}, "ses": {"ses-send-quota"}}
+        )
+
+        schedule.evaluated("us-east-1", due_quotas, now=1000)
+        assert_that(schedule.next_evaluation()).is_equal_to(1030)
+        assert_that(schedule.due("us-east-1", ["acm", "ses"], now=1029)).is_empty()
+        assert_that(schedule.due("us-east-1", ["acm", "ses"], now=1030)).is_equal_to(
+            {"acm": {"L-F141DD1D"}}
+        )
+        # regions are scheduled apart
+        assert_that(schedule.due("eu-west-1", ["acm"], now=1000)).is_equal_to(
+            {"acm": {"L-F141DD1D"}}
+        )
+
+    def test_render_openmetrics(self):
+        metrics = LimitMetrics()
+        metrics.update(
+            region="us-east-1",
+            due_quotas={"ec2": {"L-1216C47A", "L-34B43A08"}},
+            resources=[
+                limit_resource(
+                    "L-1216C47A", 12, 12.5, quota_name='Running "On-Demand"'
+                ),
+                limit_resource("L-34B43A08", 3, 3.0),
+            ],
+            evaluated_at=1000,
+            duration=1.5,
+        )
+
+        rendered = metrics.render()
+
+        assert_that(rendered).contains(
+            "# TYPE cloudiscovery_limit_usage gauge\n",
+            'cloudiscovery_limit_usage{region="us-east-1",service="ec2",'
+            'quota_code="L-1216C47A",quota_name="Running \\"On-Demand\\""} 12\n',
+            'cloudiscovery_limit_usage_percent{region="us-east-1",service="ec2",'
+            'quota_code="L-1216C47A",quota_name="Running \\"On-Demand\\""} 12.5\n',
+            'cloudiscovery_limit_applied{region="us-east-1",service="ec2",'
+            'quota_code="L-34B43A08",quota_name="Running instances"} 100\n',
+            'cloudiscovery_limit_default{region="us-east-1",service="ec2",'
+            'quota_code="L-34B43A08",quota_name="Running instances"} 5\n',
+            'cloudiscovery_limit_last_evaluation_timestamp_seconds{region="us-east-1",'
+            'service="ec2",quota_code="L-34B43A08",quota_name="Running instances"} '
+            "1000\n",
+            'cloudiscovery_limit_evaluation_duration_seconds{region="us-east-1"} 1.5\n',
+        )
+        assert_that(rendered).ends_with("# EOF\n")
+
+        # evaluated quotas missing from resources, e.g. under threshold, are dropped
+        metrics.update(
+            region="us-east-1",
+            due_quotas={"ec2": {"L-34B43A08"}},
+            resources=[],
+            evaluated_at=1060,
+            duration=0.5,
+        )
+        rendered = metrics.render()
+        assert_that(rendered).contains('quota_code="L-1216C47A"')
+        assert_that(rendered).does_not_contain('quota_code="L-34B43A08"')
+
+    def test_metrics_endpoint(self):
+        metrics = LimitMetrics()
+        metrics.update(
+            region="us-east-1",
+            due_quotas={"ec2": {"L-1216C47A"}},
+            resources=[limit_resource("L-1216C47A", 12, 12.0)],
+            evaluated_at=1000,
+            duration=1.0,
+        )
+        server = MetricsServer("127.0.0.1", 0, metrics)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            with urllib.request.urlopen(url) as response:
+                assert_that(response.headers["Content-Type"]).is_equal_to(
+                    OPENMETRICS_CONTENT_TYPE
+                )
+                assert_that(response.read().decode("utf-8")).is_equal_to(
+                    metrics.render()
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,50 @@
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from provider.aws.limit.scheduler import ServiceScheduler
+
+
+class TestServiceScheduler(TestCase):
+    def test_caps_tasks_per_service(self):
+        lock = threading.Lock()
+        in_flight = {"ec2": 0, "iam": 0}
+        max_in_flight = {"ec2": 0, "iam": 0}
+
+        def task(service, value):
+            with lock:
+                in_flight[service] = in_flight[service] + 1
+                max_in_flight[service] = max(max_in_flight[service], in_flight[service])
+            time.sleep(0.01)
+            with lock:
+                in_flight[service] = in_flight[service] - 1
+            return value
+
+        with ThreadPoolExecutor(8) as executor:
+            scheduler = ServiceScheduler(executor, 2)
+            futures = [
+                scheduler.submit(service, task, service, index)
+                for index in range(10)
+                for service in ["ec2", "iam"]
+            ]
+            results = [future.result() for future in futures]
+
+        assert_that(results).is_equal_to(
+            [index for index in range(10) for _ in range(2)]
+        )
+        assert_that(max_in_flight["ec2"]).is_less_than_or_equal_to(2)
+        assert_that(max_in_flight["iam"]).is_less_than_or_equal_to(2)
+        assert_that(
+            [service for service, _ in scheduler.slowest_services(5)]
+        ).is_length(2)
+
+    def test_propagates_exceptions(self):
+        def failing():
+            raise ValueError("failed")
+
+        with ThreadPoolExecutor(2) as executor:
+            future = ServiceScheduler(executor, 1).submit("ec2", failing)
+            assert_that(future.exception()).is_instance_of(ValueError)
@@ -0,0 +1,115 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from assertpy import assert_that
+
+from provider.aws.limit.data.allowed_resources import ALLOWED_SERVICES_CODES
+from provider.aws.limit.usage import QuotaUsage, group_listings, collect_listing
+
+
+def quota_usage(service, quota_code, value=100):
+    return QuotaUsage(
+        data_quota_code={"quota_code": quota_code, "quota_name": quota_code},
+        quota_data=ALLOWED_SERVICES_CODES[service][quota_code],
+        service="ec2",
+        region="us-east-1",
+        value_aws=value,
+        value=value,
+        quota_service=service,
+    )
+
+
+def volumes_client(pages):
+    client = MagicMock()
+    client.can_paginate.return_value = True
+    client.get_paginator.return_value.paginate.return_value = pages
+    return client
+
+
+class TestUsage(TestCase):
+    def test_quotas_share_listing(self):
+        # io1 storage and io1 IOPS both list io1 volumes
+        storage = quota_usage("ebs", "L-FD252861")
+        iops = quota_usage("ebs", "L-B3A130E6")
+        gp2_storage = quota_usage("ebs", "L-D18FCD1D")
+
+        shared_listings = group_listings([storage, iops, gp2_storage])
+        assert_that(shared_listings).is_length(2)
+        # listed by ec2, scheduled under the quota service code
+        assert_that(
+            {
+                shared_listing.quota_service
+                for shared_listing in shared_listings.values()
+            }
+        ).is_equal_to({"ebs"})
+
+        io1_listing = [
+            listing for listing in shared_listings if "io1" in listing.filters_key
+        ][0]
+        client = volumes_client(
+            [{"Volumes": [{"Size": 2000, "Iops": 100}]}, {"Volumes": []}]
+        )
+        collect_listing(client, io1_listing, shared_listings[io1_listing])
+
+        client.get_paginator.assert_called_once_with("describe_volumes")
+        assert_that(storage.resource(0).limits.usage).is_equal_to(2)
+        assert_that(iops.resource(0).limits.usage).is_equal_to(100)
+        # not collected yet
+        assert_that(gp2_storage.resource(0)).is_none()
+
+    def test_additional_filters_are_summed(self):
+        instances = quota_usage("ec2", "L-1216C47A")
+        shared_listings = group_listings([instances])
+        assert_that(shared_listings).is_length(2)
+
+        for listing, shared_listing in shared_listings.items():
+            collect_listing(
+                volumes_client([{"Reservations": [{}, {}]}]), listing, shared_listing
+            )
+        assert_that(instances.resource(0).limits.usage).is_equal_to(4)
+        assert_that(instances.resource(5)).is_none()
+
+    def test_fields_summed_over_all_items(self):
+        storage = quota_usage("ebs", "L-FD252861", value=1000000)
+        iops = quota_usage("ebs", "L-B3A130E6", value=1000000)
+        shared_listings = group_listings([storage, iops])
+        listing, shared_listing = list(shared_listings.items())[0]
+
+        # 100k volumes over 100 pages, a few without Iops
+        pages = [
+            {
+                "Volumes": [
+                    (
+                        {"Size": 1 + (page + item) % 16, "Iops": 100}
+                        if item % 10
+                        else {"Size": 1 + (page + item) % 16}
+                    )
+                    for item in range(1000)
+                ]
+            }
+            for page in range(100)
+        ]
+        expected_size = sum(
+            volume["Size"] for page in pages for volume in page["Volumes"]
+        )
+        collect_listing(volumes_client(pages), listing, shared_listing)
+
+        assert_that(storage.usage).is_equal_to(expected_size)
+        assert_that(storage.resource(0).limits.usage).is_equal_to(
+            int(expected_size / 1000)
+        )
+        assert_that(iops.resource(0).limits.usage).is_equal_to(90000 * 100)
+
+    def test_fields_summed_without_paginator(self):
+        storage = quota_usage("rds", "L-7ADDB58A")
+        shared_listings = group_listings([storage])
+        listing, shared_listing = list(shared_listings.items())[0]
+        client = MagicMock()
+        client.can_paginate.return_value = False
+        client.describe_db_instances.return_value = {
+            "DBInstances": [{"AllocatedStorage": 20}, {"AllocatedStorage": 30}]
+        }
+
+        collect_listing(client, listing, shared_listing)
+
+        assert_that(storage.resource(0).limits.usage).is_equal_to(50)
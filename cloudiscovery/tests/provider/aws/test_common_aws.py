@@ -0,0 +1,297 @@
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import boto3
+from assertpy import assert_that
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from provider.aws.common_aws import (
+    AdaptiveRateLimiter,
+    ApiCallBudget,
+    BaseAwsCommand,
+    BaseAwsOptions,
+    ClientPool,
+    CLIENT_POOL,
+    InventoryClient,
+    RegionInventory,
+)
+
+
+def aws_session():
+    return boto3.Session(
+        aws_access_key_id="key",
+        aws_secret_access_key="secret",
+        region_name="us-east-1",
+    )
+
+
+class RawResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self):
+        yield self.body
+
+
+def aws_response(status_code: int, body: bytes) -> AWSResponse:
+    return AWSResponse(
+        "https://dynamodb.us-east-1.amazonaws.com/",
+        status_code,
+        {"Content-Type": "application/x-amz-json-1.0"},
+        RawResponse(body),
+    )
+
+
+class TestCommonAws(TestCase):
+    def test_run_regions_parallel(self):
+        regions = ["us-east-1", "eu-west-1", "sa-east-1", "ap-south-1"]
+        command = BaseAwsCommand(
+            region_names=regions,
+            session=MagicMock(),
+            partition_code="aws",
+            region_parallelism=2,
+        )
+        visited = []
+        lock = threading.Lock()
+
+        def runner(region):
+            with lock:
+                visited.append(region)
+
+        command.run_regions(runner)
+
+        assert_that(visited).is_length(4).contains_only(*regions)
+
+    def test_run_regions_propagates_errors(self):
+        command = BaseAwsCommand(
+            region_names=["us-east-1", "eu-west-1"],
+            session=MagicMock(),
+            partition_code="aws",
+        )
+
+        def runner(region):
+            raise ValueError(region)
+
+        assert_that(command.run_regions).raises(ValueError).when_called_with(runner)
+
+    def test_api_call_budget_nested_call(self):
+        budget = ApiCallBudget(1)
+        budget.acquire()
+        # credential refresh inside a call must not wait for its own slot
+        budget.acquire()
+        budget.release()
+        budget.release()
+        budget.release()
+
+        assert_that(budget.semaphore.acquire(blocking=False)).is_true()
+        assert_that(budget.semaphore.acquire(blocking=False)).is_false()
+
+    def test_api_call_budget_released_on_failure(self):
+        budget = ApiCallBudget(1)
+        session = aws_session()
+        budget.register(session)
+        client = session.client("dynamodb")
+        budget.guard(client)
+
+        def fail_after_acquire(**_):
+            raise ValueError("handler failure")
+
+        client.meta.events.register("before-send", fail_after_acquire)
+
+        with self.assertRaises(ValueError):
+            client.list_tables()
+        # the slot is released when the call unwinds
+        assert_that(budget.semaphore.acquire(blocking=False)).is_true()
+
+    def test_api_call_budget_not_held_while_throttled(self):
+        budget = ApiCallBudget(1)
+        session = aws_session()
+        budget.register(session)
+        throttled_client = session.client("dynamodb")
+        throttled_limiter = AdaptiveRateLimiter(rate=4.0)
+        throttled_limiter.tokens = -1
+        throttled_limiter.register(throttled_client)
+        other_client = session.client("dynamodb", region_name="eu-west-1")
+        AdaptiveRateLimiter().register(other_client)
+        for client in (throttled_client, other_client):
+            budget.guard(client)
+            client.meta.events.register(
+                "before-send", lambda **_: aws_response(200, b'{"TableNames": []}')
+            )
+
+        throttled_call = threading.Thread(target=throttled_client.list_tables)
+        throttled_call.start()
+        while throttled_limiter.calls == 0:
+            time.sleep(0.01)
+        # the throttled call waits about 0.5s for its token, without the only slot
+        started = time.monotonic()
+        assert_that(other_client.list_tables()["TableNames"]).is_empty()
+        elapsed = time.monotonic() - started
+        still_waiting = throttled_call.is_alive()
+        throttled_call.join()
+
+        assert_that(still_waiting).is_true()
+        assert_that(elapsed).is_less_than(0.4)
+        assert_that(budget.semaphore.acquire(blocking=False)).is_true()
+
+    def test_adaptive_rate_limiter_limits_retries(self):
+        limiter = AdaptiveRateLimiter(rate=100.0)
+        client = aws_session().client(
+            "dynamodb", config=Config(retries={"mode": "standard", "max_attempts": 3})
+        )
+        limiter.register(client)
+        attempts = []
+
+        def send(request, **_):
+            attempts.append(request)
+            if len(attempts) < 3:
+                return aws_response(
+                    400, b'{"__type": "ThrottlingException", "message": "Rate"}'
+                )
+            return aws_response(200, b'{"TableNames": []}')
+
+        client.meta.events.register("before-send", send)
+
+        with patch("time.sleep"):
+            assert_that(client.list_tables()["TableNames"]).is_empty()
+        # every attempt takes a token, not only the first one
+        assert_that(limiter.calls).is_equal_to(3)
+        assert_that(limiter.throttled).is_equal_to(2)
+
+    def test_adaptive_rate_limiter(self):
+        limiter = AdaptiveRateLimiter(rate=10.0)
+        throttled = (
+            MagicMock(status_code=400),
+            {"Error": {"Code": "ThrottlingException"}},
+        )
+        succeeded = (MagicMock(status_code=200), {})
+
+        limiter.observe(response=throttled, attempts=1)
+        limiter.observe(response=throttled, attempts=1)
+        assert_that(limiter.rate).is_equal_to(5.0)
+        assert_that(limiter.throttled).is_equal_to(2)
+        assert_that(limiter.retried).is_equal_to(2)
+
+        limiter.observe(response=succeeded, attempts=2)
+        assert_that(limiter.rate).is_equal_to(5.5)
+        limiter.observe(response=throttled, attempts=10)
+        assert_that(limiter.failed).is_equal_to(1)
+
+    def test_adaptive_rate_limiter_delays_bursts(self):
+        limiter = AdaptiveRateLimiter(rate=10.0)
+        delays = [limiter.delay() for _ in range(12)]
+
+        assert_that(delays[:9]).contains_only(0.0)
+        assert_that(delays[-1]).is_greater_than(0.1)
+        assert_that(limiter.calls).is_equal_to(12)
+
+    def test_client_pool_reuses_clients(self):
+        pool = ClientPool()
+        session = MagicMock()
+        session.client.side_effect = lambda service_name, region_name, config: (
+            MagicMock()
+        )
+
+        with ThreadPoolExecutor(8) as executor:
+            clients = list(
+                executor.map(
+                    lambda _: pool.client(session, "ec2", "us-east-1"), range(32)
+                )
+            )
+        other_region = pool.client(session, "ec2", "eu-west-1")
+
+        assert_that(set(map(id, clients))).is_length(1)
+        assert_that(other_region).is_not_same_as(clients[0])
+        assert_that(pool.clients_created).is_equal_to(2)
+
+    def test_account_id_resolved_once_per_session(self):
+        session = MagicMock()
+        session.client.return_value.get_caller_identity.return_value = {
+            "Account": "123456789012"
+        }
+        file_names = [
+            BaseAwsOptions(session, region).resulting_file_name("all")
+            for region in ["us-east-1", "eu-west-1", "us-east-1"]
+        ]
+        CLIENT_POOL.clear()
+
+        assert_that(file_names).contains(
+            "123456789012_us-east-1_all", "123456789012_eu-west-1_all"
+        )
+        session.client.return_value.get_caller_identity.assert_called_once()
+
+    def test_inventory_client_lists_region_once(self):
+        inventory = RegionInventory()
+        client = MagicMock()
+        client.meta.method_to_api_mapping = {
+            "describe_instances": "DescribeInstances",
+            "list_functions": "ListFunctions",
+            "get_bucket_policy": "GetBucketPolicy",
+        }
+        client.describe_instances.return_value = {"Reservations": []}
+        client.get_paginator.return_value.paginate.return_value = iter(
+            [{"Functions": [{"FunctionName": "f1"}]}]
+        )
+        client.get_bucket_policy.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchBucketPolicy"}}, "GetBucketPolicy"
+        )
+
+        for _ in range(3):
+            vpc_client = InventoryClient(client, "ec2", inventory)
+            vpc_client.describe_instances()
+            pages = vpc_client.get_paginator("list_functions").paginate()
+            assert_that(pages).is_length(1)
+            assert_that(vpc_client.get_bucket_policy).raises(
+                ClientError
+            ).when_called_with(Bucket="bucket")
+            # helpers are not operations, their results are not kept
+            vpc_client.get_waiter("instance_running")
+
+        assert_that(client.get_waiter.call_count).is_equal_to(3)
+        client.describe_instances.assert_called_once()
+        client.get_paginator.return_value.paginate.assert_called_once()
+        client.get_bucket_policy.assert_called_once()
+        assert_that(inventory.calls_made).is_equal_to(3)
+        assert_that(inventory.calls_reused).is_equal_to(6)
+
+    def test_inventory_client_partitions_region_by_vpc(self):
+        inventory = RegionInventory()
+        client = MagicMock()
+        client.meta.method_to_api_mapping = {"describe_subnets": "DescribeSubnets"}
+        client.can_paginate.return_value = True
+        client.get_paginator.return_value.paginate.return_value = iter(
+            [
+                {"Subnets": [{"SubnetId": "s1", "VpcId": "vpc-a"}]},
+                {"Subnets": [{"SubnetId": "s2", "VpcId": "vpc-b"}]},
+            ]
+        )
+        client.describe_subnets.return_value = {"Subnets": []}
+
+        subnets = dict()
+        for vpc_id in ["vpc-a", "vpc-b", "vpc-c"]:
+            vpc_client = InventoryClient(client, "ec2", inventory)
+            subnets[vpc_id] = vpc_client.describe_subnets(
+                Filters=[{"Name": "vpc-id", "Values": [vpc_id]}]
+            )["Subnets"]
+
+        assert_that(subnets).is_equal_to(
+            {
+                "vpc-a": [{"SubnetId": "s1", "VpcId": "vpc-a"}],
+                "vpc-b": [{"SubnetId": "s2", "VpcId": "vpc-b"}],
+                "vpc-c": [],
+            }
+        )
+        # one region-wide listing for every VPC
+        client.get_paginator.return_value.paginate.assert_called_once_with()
+        client.describe_subnets.assert_not_called()
+
+        # other filters are not served from the partition
+        InventoryClient(client, "ec2", inventory).describe_subnets(
+            Filters=[{"Name": "vpc-id", "Values": ["vpc-a", "vpc-b"]}]
+        )
+        client.describe_subnets.assert_called_once()
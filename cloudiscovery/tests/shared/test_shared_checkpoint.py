@@ -0,0 +1,38 @@
+import tempfile
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from shared.checkpoint import Checkpoint, MISSING, checkpoint_run_id
+
+
+class TestCheckpoint(TestCase):
+    def test_resume_keeps_completed_units(self):
+        run_id = checkpoint_run_id("aws-all", "123", ["us-east-1"])
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint(run_id, path=directory)
+            checkpoint.complete("region", "us-east-1")
+            checkpoint.complete("service", "us-east-1", "ecs", result=["cluster"])
+            checkpoint.close()
+
+            checkpoint = Checkpoint(run_id, resume=True, path=directory)
+            assert_that(checkpoint).is_length(2)
+            assert_that(checkpoint.completed("region", "us-east-1")).is_true()
+            assert_that(checkpoint.result("service", "us-east-1", "ecs")).is_equal_to(
+                ["cluster"]
+            )
+            assert_that(checkpoint.result("service", "us-east-1", "sqs")).is_same_as(
+                MISSING
+            )
+            assert_that(checkpoint.resumed_units).is_equal_to(1)
+            checkpoint.close()
+
+            # a run that doesn't resume starts again
+            checkpoint = Checkpoint(run_id, path=directory)
+            assert_that(checkpoint).is_length(0)
+            checkpoint.close()
+
+    def test_run_id(self):
+        assert_that(checkpoint_run_id("aws-all", "123", ["us-east-1"])).is_not_equal_to(
+            checkpoint_run_id("aws-all", "123", ["eu-west-1"])
+        )
@@ -1,14 +1,104 @@
 from unittest import TestCase
+from unittest.mock import patch, MagicMock
 
 from assertpy import assert_that
 
-from shared.command import filter_resources, filter_relations
+from shared.command import (
+    filter_resources,
+    filter_relations,
+    CommandRunner,
+    THREADS_BACKEND,
+    ASYNCIO_BACKEND,
+)
 from shared.common import (
     Resource,
     ResourceDigest,
     ResourceEdge,
     Filterable,
+    ResourceProvider,
 )
+from shared.diagram import NoDiagram
+
+
+class FirstProvider(ResourceProvider):
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+    def iter_resources(self):
+        for resource_id in ["2", "1"]:
+            yield Resource(
+                digest=ResourceDigest(id=resource_id, type="type"),
+                name="name" + resource_id,
+                tags=[Filterable(key="key", value="value")],
+            )
+        self.relations_found.append(
+            ResourceEdge(
+                from_node=ResourceDigest(id="1", type="type"),
+                to_node=ResourceDigest(id="2", type="type"),
+            )
+        )
+
+
+class BlockingProvider(ResourceProvider):
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+    def get_resources(self):
+        self.relations_found.append(
+            ResourceEdge(
+                from_node=ResourceDigest(id="3", type="type"),
+                to_node=ResourceDigest(id="4", type="type"),
+            )
+        )
+        return [
+            Resource(digest=ResourceDigest(id=resource_id, type="type"), name="name")
+            for resource_id in ["3", "4"]
+        ]
+
+
+class SecondProvider(ResourceProvider):
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+    def get_resources(self):
+        return [
+            Resource(
+                digest=ResourceDigest(id="1", type="type"),
+                name="name1",
+                tags=[Filterable(key="key", value="value")],
+            ),
+            Resource(digest=ResourceDigest(id="3", type="type"), name="name3"),
+        ]
+
+
+class RenamingProvider(ResourceProvider):
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+    def get_resources(self):
+        return [
+            Resource(
+                digest=ResourceDigest(id="2", type="type"),
+                name="renamed",
+                tags=[Filterable(key="key", value="value")],
+            )
+        ]
+
+
+class ManyProvider(ResourceProvider):
+    def __init__(self, options):
+        super().__init__()
+        self.options = options
+
+    def iter_resources(self):
+        for resource_id in range(100):
+            yield Resource(
+                digest=ResourceDigest(id=str(resource_id), type="type"), name="name"
+            )
 
 
 class TestCommand(TestCase):
@@ -125,3 +215,90 @@ class TestCommand(TestCase):
         )
 
         assert_that(relations).is_length(0)
+
+    @patch("shared.command.Report")
+    def test_streaming_run(self, report_class):
+        reported = dict()
+
+        def general_report(resources, resource_relations):
+            reported["resources"] = list(resources)
+            reported["relations"] = resource_relations
+
+        report_class.return_value.general_report.side_effect = general_report
+        command_runner = CommandRunner(
+            "aws", [Filterable(key="key", value="value")], streaming=True
+        )
+        command_runner.run_streaming(
+            [("FirstProvider", FirstProvider), ("SecondProvider", SecondProvider)],
+            MagicMock(),
+            NoDiagram(),
+            "title",
+            "filename",
+        )
+
+        assert_that(reported["resources"]).extracting("digest").is_equal_to(
+            [ResourceDigest(id="1", type="type"), ResourceDigest(id="2", type="type")]
+        )
+        assert_that(reported["relations"]).is_length(1)
+
+    @patch("shared.command.Report")
+    def test_streaming_keeps_last_duplicate(self, report_class):
+        providers = [("FirstProvider", FirstProvider), ("Renaming", RenamingProvider)]
+        reported = dict()
+
+        def general_report(resources, resource_relations):
+            reported["resources"] = list(resources)
+
+        report_class.return_value.general_report.side_effect = general_report
+        CommandRunner("aws", streaming=True).run_streaming(
+            providers, MagicMock(), NoDiagram(), "title", "filename"
+        )
+        streamed = {
+            resource.digest.id: resource.name for resource in reported["resources"]
+        }
+        all_resources, _ = CommandRunner("aws").collect(providers, MagicMock())
+        batch = {resource.digest.id: resource.name for resource in all_resources}
+
+        assert_that(streamed).is_equal_to({"1": "name1", "2": "renamed"})
+        assert_that(batch["2"]).is_equal_to(streamed["2"])
+
+    @patch("shared.command.Report")
+    @patch("shared.command.STREAM_QUEUE_SIZE", 1)
+    def test_streaming_failure_releases_providers(self, _):
+        command_runner = CommandRunner(
+            "aws", [Filterable(key="key", value="value")], streaming=True
+        )
+        command_runner.compiled_filters = MagicMock()
+        command_runner.compiled_filters.is_empty.return_value = False
+        command_runner.compiled_filters.matches.side_effect = OSError("disk full")
+
+        assert_that(command_runner.run_streaming).raises(OSError).when_called_with(
+            [("ManyProvider", ManyProvider), ("Second", ManyProvider)],
+            MagicMock(),
+            NoDiagram(),
+            "title",
+            "filename",
+        )
+
+    def test_streaming_rejects_asyncio_backend(self):
+        assert_that(CommandRunner).raises(ValueError).when_called_with(
+            "aws", streaming=True, backend=ASYNCIO_BACKEND
+        )
+
+    def test_collect_backends_parity(self):
+        providers = [
+            ("FirstProvider", FirstProvider),
+            ("BlockingProvider", BlockingProvider),
+        ]
+        threads_resources, threads_relations = CommandRunner(
+            "aws", backend=THREADS_BACKEND
+        ).collect(providers, MagicMock())
+        asyncio_resources, asyncio_relations = CommandRunner(
+            "aws", backend=ASYNCIO_BACKEND
+        ).collect(providers, MagicMock())
+
+        assert_that(asyncio_resources).extracting("digest").is_equal_to(
+            [resource.digest for resource in threads_resources]
+        )
+        assert_that(asyncio_resources).is_length(2)
+        assert_that(asyncio_relations).is_equal_to(threads_relations)
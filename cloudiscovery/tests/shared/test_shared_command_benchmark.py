@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from shared.command import filter_relations, filter_relations_by_digests
+from shared.common import (
+    Resource,
+    ResourceDigest,
+    ResourceEdge,
+)
+
+
+def synthetic_graph(nodes: int):
+    digests = [ResourceDigest(id=str(i), type="aws_type") for i in range(nodes)]
+    resources = [Resource(digest=digest, name=digest.id) for digest in digests]
+    relations = [
+        ResourceEdge(from_node=digests[i], to_node=digests[(i * 7 + 1) % nodes])
+        for i in range(nodes)
+    ] + [
+        ResourceEdge(
+            from_node=digests[i],
+            to_node=ResourceDigest(id="missing" + str(i), type="aws_type"),
+        )
+        for i in range(nodes)
+    ]
+    return resources, relations
+
+
+class CountingSet(set):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lookups = 0
+
+    def __contains__(self, item):
+        self.lookups = self.lookups + 1
+        return super().__contains__(item)
+
+
+def lookups(resources, relations) -> int:
+    digests = CountingSet(resource.digest for resource in resources)
+    filter_relations_by_digests(digests, relations)
+    return digests.lookups
+
+
+class TestCommandBenchmark(TestCase):
+    def test_filter_relations_scales_linearly(self):
+        small_resources, small_relations = synthetic_graph(10000)
+        large_resources, large_relations = synthetic_graph(100000)
+
+        assert_that(filter_relations(small_resources, small_relations)).is_length(10000)
+        assert_that(filter_relations(large_resources, large_relations)).is_length(
+            100000
+        )
+
+        # at most two set lookups per relation, whatever the number of resources
+        small_lookups = lookups(small_resources, small_relations)
+        large_lookups = lookups(large_resources, large_relations)
+        assert_that(small_lookups).is_less_than_or_equal_to(2 * len(small_relations))
+        assert_that(large_lookups).is_less_than_or_equal_to(2 * len(large_relations))
+        # 10x more nodes and edges, 10x more lookups
+        assert_that(large_lookups).is_equal_to(small_lookups * 10)
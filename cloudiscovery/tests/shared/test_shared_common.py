@@ -1,8 +1,40 @@
+import pickle
 from unittest import TestCase
+from unittest.mock import patch
 
 from assertpy import assert_that
 
-from shared.common import parse_filters, Filterable
+from shared.common import (
+    parse_filters,
+    Filterable,
+    compile_filters,
+    Resource,
+    ResourceDigest,
+    CompactResource,
+    LazyMapping,
+)
+from shared.report import Report
+from shared.snapshot import resource_fingerprint
+
+FLATTENED = []
+
+
+def counting_flatten(source):
+    FLATTENED.append(source)
+    return {"Name": source}
+
+
+def lazy_resources(count):
+    return [
+        CompactResource.from_resource(
+            Resource(
+                digest=ResourceDigest(id=str(i), type="type"),
+                name=str(i),
+                attributes=LazyMapping(str(i), counting_flatten),
+            )
+        )
+        for i in range(count)
+    ]
 
 
 class TestCommon(TestCase):
@@ -43,3 +75,89 @@ class TestCommon(TestCase):
     def test_parse_filters_invalid_tag_value_filter(self):
         filters = parse_filters(["Name=tags.costCenter;vvv20000"])
         assert_that(filters).is_length(0)
+
+    def test_compile_filters(self):
+        compiled_filters = compile_filters(
+            parse_filters(
+                [
+                    "Name=tags.costCenter;Value=20000:20001",
+                    "Name=type;Value=aws_lambda_function",
+                ]
+            )
+        )
+        assert_that(compiled_filters.types).contains_only("aws_lambda_function")
+        assert_that(compiled_filters.tags).is_equal_to(
+            {"costCenter": frozenset(["20000", "20001"])}
+        )
+        assert_that(
+            compiled_filters.matches(
+                Resource(
+                    digest=ResourceDigest(id="1", type="aws_instance"),
+                    tags=[Filterable(key="costCenter", value="20001")],
+                )
+            )
+        ).is_true()
+        assert_that(
+            compiled_filters.matches(
+                Resource(
+                    digest=ResourceDigest(id="2", type="aws_instance"),
+                    tags=[Filterable(key="other", value="20001")],
+                )
+            )
+        ).is_false()
+
+    def test_compact_resource(self):
+        resource = Resource(
+            digest=ResourceDigest(id="i-1", type="aws_ec2_instance"),
+            name="instance",
+            group="ec2",
+            tags=[Filterable(key="costCenter", value="20000")],
+            attributes={"InstanceId": "i-1", "State.Name": "running"},
+        )
+        compact = CompactResource.from_resource(resource)
+        other = CompactResource.from_resource(
+            resource._replace(
+                digest=ResourceDigest(id="i-2", type="".join(["aws_ec2_", "instance"]))
+            )
+        )
+
+        assert_that(compact.to_resource()).is_equal_to(resource)
+        assert_that(compact.tags).is_equal_to(resource.tags)
+        assert_that(compact.attributes).is_equal_to(resource.attributes)
+        assert_that(other.digest.type).is_same_as(compact.digest.type)
+        assert_that(pickle.loads(pickle.dumps(compact)).to_resource()).is_equal_to(
+            resource
+        )
+        assert_that(
+            CompactResource(digest=ResourceDigest(id="1", type="type")).attributes
+        ).is_equal_to({})
+
+    @patch("shared.report.message_handler")
+    def test_compact_attributes_decoded_once_per_pass(self, _):
+        FLATTENED.clear()
+        resources = lazy_resources(10)
+
+        with patch("shared.common.pickle.loads", wraps=pickle.loads) as loads:
+            Report().general_report(resources=resources, resource_relations=[])
+            for resource in resources:
+                resource_fingerprint(resource)
+                assert_that(resource.attributes).is_equal_to({"Name": resource.name})
+            assert_that(loads.call_count).is_equal_to(10)
+            assert_that(FLATTENED).is_length(10)
+
+            for resource in resources:
+                resource.release_attributes()
+                assert_that(resource.attributes).is_equal_to({"Name": resource.name})
+            # decoded again, but kept flattened
+            assert_that(loads.call_count).is_equal_to(20)
+            assert_that(FLATTENED).is_length(10)
+
+    def test_compact_attributes_flattened_before_pickling(self):
+        FLATTENED.clear()
+        resource = lazy_resources(1)[0]
+        resource.flatten_attributes()
+
+        for _ in range(3):
+            copy = pickle.loads(pickle.dumps(resource))
+            assert_that(copy.attributes).is_equal_to({"Name": "0"})
+        assert_that(FLATTENED).is_length(1)
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from shared.common import Resource, ResourceDigest, Filterable
+from shared.snapshot import SnapshotStore, Snapshot, snapshot_key
+
+
+def resource(resource_id, group="ecs", name=None):
+    return Resource(
+        digest=ResourceDigest(id=resource_id, type="aws_ecs_cluster"),
+        name=name or resource_id,
+        group=group,
+        attributes={"Status": "ACTIVE"},
+    )
+
+
+class TestSnapshot(TestCase):
+    def test_record_and_diff(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SnapshotStore(os.path.join(directory, "snapshots.db"))
+
+            snapshot = Snapshot(store, "123_us-east-1_all")
+            assert_that(snapshot.previous_taken_at).is_none()
+            snapshot.add_group("ecs")
+            first_diff = snapshot.record(
+                [resource("cluster-1"), resource("cluster-2"), resource("bucket", "s3")]
+            )
+            assert_that(first_diff).is_none()
+
+            snapshot = Snapshot(store, "123_us-east-1_all")
+            assert_that(snapshot.reusable("ecs")).is_true()
+            # only groups fully discovered by the previous run can be reused
+            assert_that(snapshot.reusable("s3")).is_false()
+            assert_that(
+                [reused.name for reused in snapshot.reuse("ecs")]
+            ).contains_only("cluster-1", "cluster-2")
+
+            resource_diff = snapshot.record(
+                [
+                    resource("cluster-1", name="renamed"),
+                    resource("cluster-3"),
+                    resource("bucket", "s3"),
+                ]
+            )
+            assert_that(resource_diff.added).is_equal_to(
+                [ResourceDigest(id="cluster-3", type="aws_ecs_cluster")]
+            )
+            assert_that(resource_diff.removed).is_equal_to(
+                [ResourceDigest(id="cluster-2", type="aws_ecs_cluster")]
+            )
+            assert_that(resource_diff.changed).is_equal_to(
+                [ResourceDigest(id="cluster-1", type="aws_ecs_cluster")]
+            )
+
+    def test_snapshot_key(self):
+        assert_that(snapshot_key("123_us-east-1_all")).is_equal_to("123_us-east-1_all")
+        assert_that(
+            snapshot_key("123_us-east-1_all", [Filterable(type="aws_ecs_cluster")])
+        ).is_not_equal_to("123_us-east-1_all")
@@ -0,0 +1,70 @@
+import random
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from shared.command import resource_sort_key
+from shared.common import Resource, ResourceDigest
+from shared.spool import ResourceSpool
+
+
+class TestSpool(TestCase):
+    def test_external_merge_sort(self):
+        names = [str(i).zfill(5) for i in range(1000)]
+        random.shuffle(names)
+
+        with ResourceSpool(sort_key=resource_sort_key, run_size=64) as spool:
+            for name in names:
+                spool.append(
+                    Resource(digest=ResourceDigest(id=name, type="type"), name=name)
+                )
+
+            assert_that(spool).is_length(1000)
+            assert_that([resource.name for resource in spool]).is_equal_to(
+                sorted(names)
+            )
+            assert_that(spool.runs).is_length(16)
+            # spool can be read again by another sink
+            assert_that(list(spool)).is_length(1000)
+
+    def test_unsorted_spool_keeps_order(self):
+        with ResourceSpool(run_size=2) as spool:
+            for name in ["b", "a", "c"]:
+                spool.append(
+                    Resource(digest=ResourceDigest(id=name, type="type"), name=name)
+                )
+
+            assert_that([resource.name for resource in spool]).is_equal_to(
+                ["b", "a", "c"]
+            )
+
+    def test_unique_key_keeps_latest_position(self):
+        with ResourceSpool(
+            sort_key=resource_sort_key,
+            run_size=2,
+            unique_key=lambda resource: resource.digest,
+        ) as spool:
+            for position, (resource_id, name) in [
+                ((1, 0), ("1", "last")),
+                ((0, 0), ("1", "first")),
+                ((0, 1), ("2", "kept")),
+                ((0, 2), ("3", "skipped later")),
+            ]:
+                spool.append(
+                    Resource(
+                        digest=ResourceDigest(id=resource_id, type="type"), name=name
+                    ),
+                    position,
+                )
+            spool.skip(ResourceDigest(id="3", type="type"), (1, 1))
+
+            assert_that(spool).is_length(2)
+            assert_that([resource.name for resource in spool]).is_equal_to(
+                ["kept", "last"]
+            )
+            assert_that(spool.keys()).is_equal_to(
+                {
+                    ResourceDigest(id="1", type="type"),
+                    ResourceDigest(id="2", type="type"),
+                }
+            )